@@ -0,0 +1,160 @@
+#
+#   Copyright Juha Lintula (juha.v.lintula@gmail.com), 2017
+#
+#
+#
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+#
+
+import sys
+import os
+import time
+import argparse
+import configparser
+import DamScan
+from Daminion.SessionParams import SessionParams
+
+__version__ = "1.6.0"
+__doc__ = "This program runs DamScan for several Daminion catalogs in parallel processes."
+
+#   Version history
+#   1.6.0   – first version: catalogs or INI files scanned over a process pool, one report per catalog,
+#             the filter and acknowledged pair files are read once per process
+
+
+def create_parser():
+    parser = argparse.ArgumentParser(
+        description="Run DamScan for several catalogs. The options after -- are given to every DamScan run, "
+                    "e.g. DamBatch.py -d reports a.dmc b.dmc scan.ini -- -t Keywords -a acknowledged.txt")
+    parser.add_argument("catalogs", nargs='+', metavar="CATALOG",
+                        help="Standalone catalog file, INI file (*.ini) for DamScan or server catalog name")
+    parser.add_argument("-j", "--jobs", dest="jobs", type=int, default=os.cpu_count(),
+                        help="Number of catalogs scanned at the same time [number of processors]")
+    parser.add_argument("-d", "--outdir", dest="outdir", default=".",
+                        help="Folder for the reports, one CATALOG.txt for each catalog [.]")
+    parser.add_argument("--version", action="version", version="%(prog)s " + __version__)
+    return parser
+
+
+def _size(argv):
+    # size of the catalog file for scheduling the largest catalogs first; server catalogs are assumed large
+    if argv[0] == "--ini":
+        conf = configparser.ConfigParser(allow_no_value=True)
+        conf.read(argv[1], encoding='utf-8')
+        name = conf.get('Database', 'Catalog', fallback=None)
+    else:
+        name = argv[-1]
+    if name is not None and os.path.isfile(name):
+        return os.path.getsize(name)
+    return float("inf")
+
+
+def make_jobs(catalogs, common, outdir):
+    # (catalog, DamScan arguments, report) for each catalog, the largest first
+    jobs = []
+    names = set()
+    for catalog in catalogs:
+        if catalog.lower().endswith(".ini"):
+            argv = ["--ini", catalog]
+        elif os.path.isfile(catalog):
+            argv = ["-l", "-c", catalog]
+        else:
+            argv = ["-c", catalog]
+        stem = os.path.splitext(os.path.basename(catalog))[0]
+        name = stem
+        i = 2
+        while name in names:
+            name = stem + "_" + str(i)
+            i += 1
+        names.add(name)
+        report = os.path.join(outdir, name + ".txt")
+        jobs.append((catalog, argv + common + ["-o", report], report, _size(argv)))
+    jobs.sort(key=lambda job: job[3], reverse=True)
+    return [job[:3] for job in jobs]
+
+
+def shared_files(args):
+    # the filter and acknowledged pair files given with the common options, as DamScan.run reads them
+    if args.onlyfile is None:
+        file = args.exfile
+    else:
+        file = args.onlyfile
+    return file, args.onlyfile == file, args.ack_pairs
+
+
+def init_worker(tagvaluefile, only_tags, filter_pairs):
+    # read once per process; forked processes get them already read by the parent
+    SessionParams.share_resources()
+    SessionParams.filter_tags(tagvaluefile, only_tags)
+    SessionParams.filter_pairs_of(filter_pairs)
+
+
+def run_job(argv):
+    # one DamScan run, returns the run time and the error (or None)
+    start = time.perf_counter()
+    try:
+        parser, conf = DamScan.create_parser()
+        args = parser.parse_args(argv)
+        DamScan.read_ini(args, conf)
+        DamScan.run(args, ["DamScan.py"] + argv)
+        error = None
+    except SystemExit as e:
+        error = "exit code {}".format(e.code)
+    except Exception as e:
+        error = "{}: {}".format(type(e).__name__, e)
+    return time.perf_counter() - start, error
+
+
+def run_batch(jobs, workers, shared=(None, False, None), outfile=sys.stdout):
+    # the jobs of make_jobs over a pool of worker processes, returns the number of failed scans
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+
+    init_worker(*shared)
+    failed = 0
+    with ProcessPoolExecutor(max_workers=max(1, min(workers, len(jobs))), initializer=init_worker,
+                             initargs=shared) as pool:
+        futures = dict((pool.submit(run_job, argv), (catalog, report)) for catalog, argv, report in jobs)
+        for future in as_completed(futures):
+            catalog, report = futures[future]
+            seconds, error = future.result()
+            if error is None:
+                outfile.write("{}\t{:.1f} s\t{}\n".format(catalog, seconds, report))
+            else:
+                failed += 1
+                outfile.write("{}\t{:.1f} s\tFAILED: {}\n".format(catalog, seconds, error))
+            outfile.flush()
+    return failed
+
+
+def main():
+    if "--" in sys.argv:
+        i = sys.argv.index("--")
+        argv, common = sys.argv[1:i], sys.argv[i + 1:]
+    else:
+        argv, common = sys.argv[1:], []
+    args = create_parser().parse_args(argv)
+    scan_args = DamScan.create_parser()[0].parse_args(common)       # bad options are reported before the runs
+
+    if not os.path.isdir(args.outdir):
+        os.makedirs(args.outdir)
+    start = time.perf_counter()
+    failed = run_batch(make_jobs(args.catalogs, common, args.outdir), args.jobs, shared_files(scan_args))
+    print("{} catalogs scanned in {:.1f} s, {} failed".format(len(args.catalogs), time.perf_counter() - start,
+                                                              failed))
+    return 1 if failed > 0 else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
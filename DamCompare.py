@@ -18,16 +18,19 @@
 #
 #
 
+import io
 import sys
 import datetime
 import argparse
 import configparser
 import shlex
+import queue
+import threading
+from collections import Counter
 from Daminion.SessionParams import SessionParams
-from Daminion.DamCatalog import DamCatalog
-from Daminion.DamImage import DamImage, get_image_by_name
+# the catalog modules and the database drivers are imported only when they are used
 
-__version__ = "1.5.2"
+__version__ = "1.6.0"
 __doc__ = "This program compares metadata of items in two Daminion catalogs."
 
 #   Version history
@@ -44,16 +47,36 @@ __doc__ = "This program compares metadata of items in two Daminion catalogs."
 #   1.5.0   - added support to GPS precision (based on Wilfried's changes
 #   1.5.1   - ignore milliseconds in creation time comparison
 #   1.5.2   - fixed the different datetime representation in SQLite
+#   1.6.0   - added -m/--columnar option to compare in-memory columnar copies of the catalogs
+#           - the catalogs are opened and initialized concurrently
+#           - added -j/--concurrent option to fetch, look up and compare the items in a pipeline
+#           - added -w/--workers option to hydrate the items asynchronously over a connection pool
+#           - the catalog modules and database drivers are imported only when needed (faster startup)
+#           - added --baseline option to report only the findings added or resolved since a previous report
+#           - added --summary option to count the differences per folder and tag category
+#           - added --sample/--sample-fraction options to estimate the difference rates from a random sample
+#           - added --moves and --move-size options to match the items moved to another folder
+#           - added --catalogs option to compare catalog 1 with several catalogs in one pass
+#           - added --memory option to report the memory use by subsystem (tracemalloc)
+#           - a snapshot file written by DamScan.py --export-snapshot can be compared in place of a catalog
+#           - creation times are compared as seconds converted in SQL, invalid ones are reported once
+#           - the place strings are memoized per combination of places and compared as interned strings
+#           - added --merge option to compare catalogs larger than memory with a sorted merge join
+#           - the missing file entries and invalid ids are not reported item by item, see DamScan.py --integrity
 
 alltags = ["Event", "Place", "GPS", "Title", "Description", "Comments", "People", "Keywords", "Categories",
            "Collections"]
 
 
 def check_conf(conf):
-    valid_config = {'Database': { 'sqlite': None, 'catalog1': None, 'catalog2': None, 'port': None, 'server': None,
-                                  'user': None },
+    valid_config = {'Database': { 'sqlite': None, 'catalog1': None, 'catalog2': None, 'catalogs': None,
+                                  'port': None, 'server': None, 'user': None },
                   'Session': { 'fullpath': None, 'id': None, 'excludepaths': None, 'onlypaths': None,'outfile': None,
-                               'gps_dist': None, 'gps_alt': None, 'verbose': None, 'exclude': None, 'only': None}}
+                               'gps_dist': None, 'gps_alt': None, 'verbose': None, 'columnar': None,
+                               'concurrent': None, 'workers': None, 'baseline': None, 'summary': None,
+                               'sample': None, 'sample_fraction': None, 'seed': None, 'moves': None,
+                               'move_size': None, 'memory': None, 'merge': None,
+                               'exclude': None, 'only': None}}
 
     valid_conf = configparser.ConfigParser(allow_no_value=True)
     valid_conf.read_dict(valid_config)
@@ -75,6 +98,8 @@ def read_ini(args, conf):
         args.dbname1 = conf.get('Database', 'Catalog1', fallback=None)
     if args.dbname2 is None:
         args.dbname2 = conf.get('Database', 'Catalog2', fallback=None)
+    if args.others is None:
+        args.others = shlex.split(conf.get('Database', 'Catalogs', fallback=""))
     if args.port is None:
         args.port = conf.getint('Database', 'Port', fallback=5432)
     if args.server is None:
@@ -134,6 +159,31 @@ def read_ini(args, conf):
         args.outfile = open(file, 'w', encoding='utf-8')
     if args.verbose is None:
         args.verbose = conf.getint('Session', 'Verbose', fallback=0)
+    if args.baseline is None:
+        args.baseline = conf.get('Session', 'Baseline', fallback=None)
+    if args.summary is None:
+        args.summary = conf.get('Session', 'Summary', fallback=None)
+    if args.columnar is None:
+        args.columnar = conf.getboolean('Session', 'Columnar', fallback=False)
+    if args.workers is None:
+        args.workers = conf.getint('Session', 'Workers', fallback=0)
+    if args.concurrent is None:
+        args.concurrent = conf.getboolean('Session', 'Concurrent', fallback=False)
+    if args.moves is None:
+        args.moves = conf.getboolean('Session', 'Moves', fallback=False)
+    if args.move_size is None:
+        args.move_size = conf.getboolean('Session', 'Move_size', fallback=False)
+    if args.merge is None:
+        args.merge = conf.getboolean('Session', 'Merge', fallback=False)
+    args.moves = args.moves or args.move_size
+    if args.memory is None:
+        args.memory = conf.getboolean('Session', 'Memory', fallback=False)
+    if args.sample is None:
+        args.sample = conf.getint('Session', 'Sample', fallback=None)
+    if args.sample_fraction is None:
+        args.sample_fraction = conf.getfloat('Session', 'Sample_fraction', fallback=None)
+    if args.seed is None:
+        args.seed = conf.getint('Session', 'Seed', fallback=None)
 
 def create_parser():
     global alltags
@@ -162,15 +212,29 @@ def create_parser():
                         help="List of folder paths that are excluded from comparison.")
     group.add_argument("-y", "--onlypaths", "--only", dest="onlydir", nargs='+',
                         help="List of folder paths that are included for comparison.")
-    group = parser.add_mutually_exclusive_group()
 
+    parser.add_argument("-m", "--columnar", dest="columnar", #default=False,
+                        action="store_const", const=True, default=None,
+                        help="Read the catalog into memory with bulk queries and compare the columnar copy")
+    parser.add_argument("-j", "--concurrent", dest="concurrent", #default=False,
+                        action="store_const", const=True, default=None,
+                        help="Fetch items from catalog 1, look them up in catalog 2 and compare them concurrently")
+    parser.add_argument("-w", "--workers", dest="workers", type=int, #default=0,
+                        help="Hydrate the items asynchronously over a pool of WORKERS connections [0 = off]")
+    parser.add_argument("--merge", dest="merge", #default=False,
+                        action="store_const", const=True, default=None,
+                        help="Stream both catalogs sorted by folder and file name and merge join them, for "
+                             "catalogs larger than memory. Standalone catalogs are sorted in temporary files.")
     parser.add_argument("-l", "--sqlite", dest="sqlite", #default=False,
                         action="store_const", const=True, default=None,
                         help="Use Sqlite (= standalone) instead of Postgresql (=server)")
     parser.add_argument("-c1", "--catalog1", dest="dbname1", # nargs=1,  # default="NetCatalog",
-                        help="Daminion catalog name [NetCatalog]")
+                        help="Daminion catalog name [NetCatalog], or a snapshot file of DamScan.py --export-snapshot")
     parser.add_argument("-c2", "--catalog2", dest="dbname2", # nargs=1,  # default="NetCatalog",
-                        help="Daminion catalog name [NetCatalog]")
+                        help="Daminion catalog name [NetCatalog], or a snapshot file of DamScan.py --export-snapshot")
+    parser.add_argument("-cn", "--catalogs", dest="others", nargs='+',
+                        help="Further catalogs to compare with catalog 1. Catalog 1 is read once and each item is "
+                             "looked up in all the other catalogs, which are read into memory as with -m.")
     parser.add_argument("-s", "--server", dest="server", #default="localhost",
                         help="Postgres server [localhost]")
     parser.add_argument("-p", "--port", dest="port", type=int, #default=5432,
@@ -180,6 +244,31 @@ def create_parser():
 
     parser.add_argument("-v", "--verbose", action="count", dest="verbose", #default=0,
                         help="verbose output (always into stdout)")
+    parser.add_argument("--summary", dest="summary", nargs='?', const="table", choices=["table", "json"],
+                        help="Report only the number of differences per folder and tag category, as a table "
+                             "[default] or JSON. The catalogs are read with bulk queries as with -m.")
+    parser.add_argument("--moves", dest="moves", #default=False,
+                        action="store_const", const=True, default=None,
+                        help="Match the items missing from catalog 2 by file name and creation time, and report "
+                             "them as moved with their differences")
+    parser.add_argument("--move-size", dest="move_size", #default=False,
+                        action="store_const", const=True, default=None,
+                        help="As --moves, but the file size must match too")
+    sample = parser.add_mutually_exclusive_group()
+    sample.add_argument("--sample", dest="sample", type=int, metavar="N",
+                        help="Compare a random sample of N items of catalog 1 and report the estimated share of "
+                             "differing items per tag category, with 95%% confidence intervals")
+    sample.add_argument("--sample-fraction", dest="sample_fraction", type=float, metavar="F",
+                        help="As --sample, but compare the fraction F (0-1) of the items")
+    parser.add_argument("--seed", dest="seed", type=int,
+                        help="Seed of the random sample, the same seed gives the same sample [random]")
+    parser.add_argument("--memory", dest="memory", #default=False,
+                        action="store_const", const=True, default=None,
+                        help="Trace the memory allocations and report the peak and the memory used by the "
+                             "catalog constants, filters, items and output into stderr (slows down the comparison)")
+    parser.add_argument("--baseline", dest="baseline",
+                        help="Previous (full) report; only the findings added or resolved since it are reported. "
+                             "Use the same options as for the previous report.")
     parser.add_argument("-o", "--output", dest="outfilename", # type=argparse.FileType('w', encoding='utf-8'),
                         # default=sys.stdout,
                         help="Output file for report [stdout]")
@@ -223,15 +312,222 @@ def valid_path(path, session):
             break
     return (match and session.onlydir != []) or (not match and session.exdir != [])
 
-def ScanCatalog(catalog1, catalog2, session, verbose=0):
+def compare_moved(img1, img2, session):
+    # the item was found in another folder of catalog 2
+    same, tags = img1.image_eq(img2, session.dist_tolerance, session.alt_tolerance)
+    session.outfile.write(img1.ImageName + "\t->\t" + img2.ImageName + "\tMoved " + img1._ImagePath + " -> " +
+                          img2._ImagePath)
+    for t in tags:
+        session.outfile.write(", " + t)
+    session.outfile.write("\n")
+
+def compare_moves(unmatched, catalog2, matched, session, size=False):
+    # second pass for the items that were not found by path
+    if unmatched == []:
+        return
+    from Daminion.DamMoves import MoveIndex
+    index = MoveIndex(catalog2, size, matched)
+    for img1 in unmatched:
+        img2 = index.find(img1, session)
+        if img2 is None:
+            compare_image(img1, None, session)
+        else:
+            compare_moved(img1, img2, session)
+
+def lookup(img, catalog2, session):
+    # the item of catalog 2 with the path and name of img, the hydration pipeline of DamAsync may have it
+    match = getattr(img, "match", None)
+    if match is not None and match[0] is catalog2:
+        return match[1]
+    return catalog2.image_by_name(img._ImagePath, img._ImageName, session)
+
+def ScanCatalog(catalog1, catalog2, session, verbose=0, moves=False, move_size=False):
+    # with moves the items missing from catalog 2 are reported after the others
     session.outfile.write("{}\tDir\t{}\tTags\n".format(catalog1._dbname, catalog2._dbname))
     taglist = session.tag_cat_list
-    for curr_img in DamCatalog.NextImage(catalog1, session, verbose):
+    unmatched = []
+    matched = set()
+    for curr_img in catalog1.NextImage(catalog1, session, verbose):
         if curr_img.isvalid:
             comp = valid_path(curr_img._ImagePath, session)
             if comp:
-                img2 = get_image_by_name(curr_img._ImagePath, curr_img._ImageName, catalog2, session)
-                compare_image(curr_img, img2, session)
+                img2 = lookup(curr_img, catalog2, session)
+                if not moves:
+                    compare_image(curr_img, img2, session)
+                elif img2 is None:
+                    unmatched.append(curr_img)
+                else:
+                    matched.add(img2._id)
+                    compare_image(curr_img, img2, session)
+    compare_moves(unmatched, catalog2, matched, session, move_size)
+
+def ScanMerge(catalog1, catalog2, session, verbose=0, run_size=None):
+    # ScanCatalog in bounded memory: both catalogs are read in (relativepath, filename) order and merge
+    # joined, so only the current pair of items is in memory. The report lines are sorted back into the
+    # order of catalog 1 with the same external sort, so the report is the same as from ScanCatalog.
+    from Daminion.DamImage import DamImage
+    from Daminion.DamMerge import RUN_SIZE, items, files, merge_join, external_sort
+
+    if run_size is None:
+        run_size = RUN_SIZE
+    session.outfile.write("{}\tDir\t{}\tTags\n".format(catalog1._dbname, catalog2._dbname))
+    outfile = session.outfile
+
+    def compared():
+        # (id of the item of catalog 1, its report lines)
+        session.outfile = io.StringIO()
+        try:
+            for path, name, id1, id2 in merge_join(items(catalog1, run_size), files(catalog2, run_size)):
+                if not valid_path(path, session):
+                    continue
+                img1 = DamImage(id1, catalog1, session)
+                if not img1.isvalid or img1._ImagePath != path or img1._ImageName != name:
+                    continue        # another file row of the item
+                catalog1._counter += 1
+                if verbose > 0:
+                    print("\r", "{:7} {:7}: {:60}".format(catalog1._counter, id1, name), end="", flush=True)
+                compare_image(img1, None if id2 is None else DamImage(id2, catalog2, session), session)
+                if session.outfile.tell() > 0:
+                    yield id1, session.outfile.getvalue()
+                    session.outfile.seek(0)
+                    session.outfile.truncate()
+        finally:
+            session.outfile = outfile
+
+    for img_id, lines in external_sort(compared(), run_size):
+        outfile.write(lines)
+
+def compare_many(img1, others, session):
+    # one line for an item of catalog 1 with the differences to each of the other catalogs
+    diffs = []
+    for catalog2 in others:
+        img2 = catalog2.image_by_name(img1._ImagePath, img1._ImageName, session)
+        same, tags = img1.image_eq(img2, session.dist_tolerance, session.alt_tolerance)
+        if img2 is None or not same:
+            diffs.append(catalog2._dbname + ": " + ", ".join(tags))
+    if diffs != []:
+        session.outfile.write(img1.ImageName + "\t<>\t" + "; ".join(diffs) + "\n")
+
+def ScanMany(catalog1, others, session, verbose=0):
+    # N-way ScanCatalog: catalog 1 is streamed once and the other catalogs are looked up in their hashed
+    # (path, name) indexes, so the cost is one pass per catalog
+    session.outfile.write("{}\tDir\t{}\tTags\n".format(catalog1._dbname, ", ".join(c._dbname for c in others)))
+    for curr_img in catalog1.NextImage(catalog1, session, verbose):
+        if curr_img.isvalid and valid_path(curr_img._ImagePath, session):
+            compare_many(curr_img, others, session)
+
+def CompareSummary(catalog1, catalog2, session, verbose=0):
+    # ScanCatalog that counts the differing tags by folder instead of writing the report lines
+    counts = Counter()
+    for curr_img in catalog1.NextImage(catalog1, session, verbose):
+        if curr_img.isvalid and valid_path(curr_img._ImagePath, session):
+            img2 = catalog2.image_by_name(curr_img._ImagePath, curr_img._ImageName, session)
+            same, tags = curr_img.image_eq(img2, session.dist_tolerance, session.alt_tolerance)
+            if img2 is None or not same:
+                for t in tags:
+                    counts[(curr_img._ImagePath, t)] += 1
+    return counts
+
+def CompareSample(catalog1, catalog2, session, verbose=0):
+    # the compared items of a DamSample with differences, by tag
+    counts = Counter()
+    checked = 0
+    for curr_img in catalog1.NextImage(catalog1, session, verbose):
+        if curr_img.isvalid and valid_path(curr_img._ImagePath, session):
+            checked += 1
+            img2 = catalog2.image_by_name(curr_img._ImagePath, curr_img._ImageName, session)
+            same, tags = curr_img.image_eq(img2, session.dist_tolerance, session.alt_tolerance)
+            if img2 is None or not same:
+                counts.update(set(tags))
+    return counts, checked
+
+def ScanPipeline(catalog1, catalog2, session, verbose=0, depth=256, moves=False, move_size=False):
+    # Producer-consumer version of ScanCatalog: one thread hydrates the items of catalog 1, another looks them
+    # up in catalog 2 and the calling thread compares and writes the report, so both databases work at the
+    # same time. The bounded queues keep the order of the items and the memory use constant.
+    session.outfile.write("{}\tDir\t{}\tTags\n".format(catalog1._dbname, catalog2._dbname))
+    items = queue.Queue(depth)
+    pairs = queue.Queue(depth)
+    stop = threading.Event()
+
+    def put(q, item):
+        # False when the scan has stopped, so that a worker does not wait on a queue that is no longer read
+        while not stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def get(q):
+        while not stop.is_set():
+            try:
+                return q.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        return None
+
+    def fetch():
+        try:
+            for curr_img in catalog1.NextImage(catalog1, session, verbose):
+                if curr_img.isvalid and valid_path(curr_img._ImagePath, session):
+                    if not put(items, curr_img):
+                        return
+            put(items, None)
+        except BaseException as error:
+            put(items, error)
+
+    def lookup():
+        try:
+            img1 = get(items)
+            while img1 is not None and not isinstance(img1, BaseException):
+                if not put(pairs, (img1, catalog2.image_by_name(img1._ImagePath, img1._ImageName, session))):
+                    return
+                img1 = get(items)
+            put(pairs, img1)
+        except BaseException as error:
+            put(pairs, error)
+            stop.set()      # fetch() has nobody to read its items any more
+
+    for worker in [fetch, lookup]:
+        threading.Thread(target=worker, daemon=True).start()
+    unmatched = []
+    matched = set()
+    try:
+        pair = pairs.get()
+        while pair is not None:
+            if isinstance(pair, BaseException):
+                raise pair
+            if not moves:
+                compare_image(pair[0], pair[1], session)
+            elif pair[1] is None:
+                unmatched.append(pair[0])
+            else:
+                matched.add(pair[1]._id)
+                compare_image(pair[0], pair[1], session)
+            pair = pairs.get()
+        compare_moves(unmatched, catalog2, matched, session, move_size)
+    finally:
+        stop.set()      # release the workers, if they are blocked on a full queue
+        for q in [items, pairs]:
+            while not q.empty():
+                q.get_nowait()
+
+def open_catalog(args, dbname, user, password, columnar=False):
+    from Daminion.DamSnapshot import DamSnapshot
+    if DamSnapshot.is_snapshot(dbname):
+        return DamSnapshot(dbname)
+    from Daminion.DamCatalog import DamCatalog
+    catalog = DamCatalog(args.server, args.port, dbname, user, password, args.sqlite)
+    catalog.initCatalogConstants()
+    if columnar or args.columnar or args.summary is not None:
+        from Daminion.DamColumns import DamColumns
+        catalog = DamColumns(catalog)
+    elif args.workers > 0:
+        from Daminion.DamAsync import DamAsync
+        catalog = DamAsync(catalog, args.workers, neighbours=False)
+    return catalog
 
 def main():
     parser, conf = create_parser()
@@ -247,38 +543,111 @@ def main():
         else:
             sys.exit(0)
 
+    others = ([] if args.dbname2 is None else [args.dbname2]) + args.others
+    if args.others != [] and args.dbname2 is None:
+        args.dbname2 = others[0]
     if args.dbname1 is None or args.dbname2 is None:
         sys.stderr.write("dbname 1 ({}) and/or dbname2 ({}) cannot be empty.\n".format(args.dbname1, args.dbname2))
         sys.exit(-1)
     if args.dbname1 == args.dbname2:
         sys.stderr.write("dbname 1 ({}) is the same as dbname2\n".format(args.dbname1[0]))
         sys.exit(-1)
-
+    if args.dbname1 in others or len(set(others)) < len(others):
+        sys.stderr.write("The same catalog is given more than once: {} {}\n".format(args.dbname1, " ".join(others)))
+        sys.exit(-1)
+    many = len(others) > 1
+
+    sampling = args.sample is not None or args.sample_fraction is not None
+    from Daminion.DamSnapshot import DamSnapshot
+    snapshot = any(DamSnapshot.is_snapshot(dbname) for dbname in [args.dbname1] + others)
+    if snapshot:
+        if sampling or args.moves:
+            sys.stderr.write("* Warning: --sample and --moves need the database and are ignored with a snapshot\n")
+        args.sample = args.sample_fraction = None
+        args.moves = args.move_size = False
+        sampling = False
+        args.columnar = True        # a snapshot is compared with columnar catalogs
+    if args.merge and (args.columnar or many or snapshot):
+        sys.stderr.write("* Warning: --merge is ignored with -m, --catalogs and snapshots\n")
+        args.merge = False
+    if many and (args.concurrent or args.workers > 0 or args.summary is not None or sampling or args.moves):
+        sys.stderr.write("* Warning: -j, -w, --summary, --sample and --moves are ignored with --catalogs\n")
+    if args.merge and (args.concurrent or args.workers > 0 or args.summary is not None or sampling or args.moves):
+        sys.stderr.write("* Warning: -j, -w, --summary, --sample and --moves are ignored with --merge\n")
+    if many or args.merge:
+        args.concurrent = args.moves = False
+        args.workers = 0
+        args.summary = args.sample = args.sample_fraction = None
+        sampling = False
+    if sampling and (args.columnar or args.concurrent or args.workers > 0 or args.summary is not None or
+                     args.baseline is not None):
+        sys.stderr.write("* Warning: -m, -j, -w, --summary and --baseline are ignored when sampling\n")
+    if sampling:            # only the sampled items are read
+        args.columnar = args.concurrent = False
+        args.workers = 0
+        args.summary = None
+        args.baseline = None
+
+    memory = None
+    if args.memory:
+        from Daminion.DamMemory import DamMemory
+        memory = DamMemory()
+    from concurrent.futures import ThreadPoolExecutor
     user = args.user.split('/')[0]
     password = args.user.split('/')[1]
-    catalog1 = DamCatalog(args.server, args.port, args.dbname1, user, password, args.sqlite)
-    catalog1.initCatalogConstants()
-    if VerboseOutput > 0:
-        print("Database", args.dbname1, "opened and datastructures initialized.")
-    catalog2 = DamCatalog(args.server, args.port, args.dbname2, user, password, args.sqlite)
-    catalog2.initCatalogConstants()
-    if VerboseOutput > 0:
-        print("Database", args.dbname2, "opened and datastructures initialized.")
+    with ThreadPoolExecutor(max_workers=1 + len(others)) as pool:      # one connection and thread per catalog
+        future1 = pool.submit(open_catalog, args, args.dbname1, user, password)
+        futures = [pool.submit(open_catalog, args, dbname, user, password, many) for dbname in others]
+        catalog1 = future1.result()
+        if VerboseOutput > 0:
+            print("Database", args.dbname1, "opened and datastructures initialized.")
+        catalogs = []
+        for dbname, future in zip(others, futures):
+            catalogs.append(future.result())
+            if VerboseOutput > 0:
+                print("Database", dbname, "opened and datastructures initialized.")
+        catalog2 = catalogs[0]
+    if memory is not None:
+        memory.checkpoint("catalogs")
 
     # document the call parameters in the output file
     line = sys.argv[0]
     for s in sys.argv[1:]:
         line += ' ' + s
     line += '\n'
-    args.outfile.write(line)
+    if args.summary != "json":
+        args.outfile.write(line)
 
     session = SessionParams(None, args.fullpath, args.id,
                             dist_tolerance=args.dist_tolerance, alt_tolerance=args.alt_tolerance,
                             exdir=args.exdir, onlydir=args.onlydir,
-                            outfile=args.outfile)
-
-    ScanCatalog(catalog1, catalog2, session, VerboseOutput)
-
+                            outfile=args.outfile, baseline=args.baseline)
+    if memory is not None:
+        memory.checkpoint("session")
+
+    if many:
+        ScanMany(catalog1, catalogs, session, VerboseOutput)
+    elif args.merge:
+        ScanMerge(catalog1, catalog2, session, VerboseOutput)
+    elif sampling:
+        from Daminion.DamSample import DamSample, write_estimates
+        sample = DamSample(catalog1, args.sample, args.sample_fraction, args.seed)
+        counts, checked = CompareSample(sample, catalog2, session, VerboseOutput)
+        write_estimates(counts, checked, sample, session.outfile, alltags)
+    elif args.summary is not None:
+        from Daminion.DamSummary import write_summary
+        write_summary(CompareSummary(catalog1, catalog2, session, VerboseOutput), session.outfile, [], args.summary)
+    elif args.concurrent:
+        ScanPipeline(catalog1, catalog2, session, VerboseOutput, moves=args.moves, move_size=args.move_size)
+    else:
+        if args.workers > 0 and hasattr(catalog1, "partner") and hasattr(catalog2, "partner"):
+            catalog1.partner = catalog2     # the items of catalog 2 are looked up in the pipeline of catalog 1
+        ScanCatalog(catalog1, catalog2, session, VerboseOutput, args.moves, args.move_size)
+
+    if memory is not None:
+        memory.checkpoint("compare")
+        memory.stop()
+        memory.write(sys.stderr)
     if session.outfile != sys.stdout:
         session.outfile.close()
 
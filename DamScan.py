@@ -22,10 +22,13 @@ import sys
 import datetime
 import argparse
 import configparser
+import io
+import shlex
+from collections import Counter
 from Daminion.SessionParams import SessionParams
-from Daminion.DamCatalog import DamCatalog
+# the catalog modules and the database drivers are imported only when they are used
 
-__version__ = "1.5.0"
+__version__ = "1.6.0"
 __doc__ = "This program is checking if all the linked or grouped items in a Daminion catalog have same tags."
 
 #   Version history
@@ -68,6 +71,27 @@ __doc__ = "This program is checking if all the linked or grouped items in a Dami
 #   1.3.0   – some updates to INI file structure
 #   1.4.0   – added Title, Description and Comments
 #   1.5.0   - added support to GPS precision (based on Wilfried's changes
+#   1.6.0   - added -m/--columnar option to scan an in-memory columnar copy of the catalog
+#           - added -k/--component option to compare multi-value tags against the whole link/stack component
+#           - added --pushdown option to compute the multi-value tag differences in the database
+#           - added -w/--workers option to hydrate the items asynchronously over a connection pool
+#           - the catalog modules and database drivers are imported only when needed (faster startup)
+#           - added --watch option to keep the catalog open and check the changed items again
+#           - added --baseline option to report only the findings added or resolved since a previous report
+#             (the unlinked pairs with --unlinked, not used with --summary and --gps-outliers)
+#           - added --summary option to count the differences per folder and tag category in the database
+#           - added --sample/--sample-fraction options to estimate the inconsistency rates from a random sample
+#           - the filter and acknowledged pair files can be shared between the scans of DamBatch.py
+#           - added --unlinked option to find items with the same basename that are not linked or stacked
+#           - added --gps-outliers option to find items far from the other items of their Event or component
+#           - added --memory option to report the memory use by subsystem (tracemalloc)
+#           - added --export-snapshot option, and a snapshot file can be scanned in place of the catalog
+#           - added --values option to check only the items with the given tag values and their linked items
+#           - added --serve option to answer single item and component checks over a local HTTP/JSON server
+#           - creation times are compared as seconds converted in SQL, invalid ones are reported once
+#           - the place strings are memoized per combination of places and compared as interned strings
+#           - added --integrity option, the missing file entries and invalid ids are found with bulk queries
+#             instead of being reported item by item during the scan
 
 alltags = ["Event", "Place", "GPS", "Title", "Description", "Comments", "People", "Keywords", "Categories",
            "Collections"]
@@ -76,7 +100,11 @@ def check_conf(conf):
     valid_config = {'Database': { 'sqlite': None, 'catalog': None, 'port': None, 'server': None, 'user': None },
                   'Session': { 'fullpath': None, 'id': None, 'group': None, 'basename': None, 'tags': None,
                                'acknowledged': None, 'excludetags': None, 'onlytags': None,
-                               'gps_dist': None, 'gps_alt': None, 'outfile': None, 'verbose': None,
+                               'gps_dist': None, 'gps_alt': None, 'outfile': None, 'verbose': None, 'columnar': None,
+                               'component': None, 'pushdown': None, 'workers': None, 'watch': None, 'baseline': None,
+                               'summary': None, 'sample': None, 'sample_fraction': None, 'seed': None,
+                               'unlinked': None, 'gps_outliers': None, 'memory': None, 'export_snapshot': None,
+                               'values': None, 'serve': None, 'integrity': None,
                                'exclude': None, 'only': None }}
 
     valid_conf = configparser.ConfigParser(allow_no_value=True)
@@ -171,6 +199,42 @@ def read_ini(args, conf):
         args.outfile = open(file, 'w', encoding='utf-8')
     if args.verbose is None:
         args.verbose = conf.getint('Session', 'Verbose', fallback=0)
+    if args.baseline is None:
+        args.baseline = conf.get('Session', 'Baseline', fallback=None)
+    if args.summary is None:
+        args.summary = conf.get('Session', 'Summary', fallback=None)
+    if args.columnar is None:
+        args.columnar = conf.getboolean('Session', 'Columnar', fallback=False)
+    if args.workers is None:
+        args.workers = conf.getint('Session', 'Workers', fallback=0)
+    if args.component is None:
+        args.component = conf.getboolean('Session', 'Component', fallback=False)
+    if args.pushdown is None:
+        args.pushdown = conf.getboolean('Session', 'Pushdown', fallback=False)
+    if args.watch is None:
+        args.watch = conf.getfloat('Session', 'Watch', fallback=0.0)
+    if args.unlinked is None:
+        unlinked = conf.get('Session', 'Unlinked', fallback=None)
+        if unlinked is not None:
+            args.unlinked = [k for k in unlinked.split() if k.lower() != "basename"]
+    if args.gps_outliers is None:
+        args.gps_outliers = conf.get('Session', 'GPS_outliers', fallback=None)
+    if args.memory is None:
+        args.memory = conf.getboolean('Session', 'Memory', fallback=False)
+    if args.export_snapshot is None:
+        args.export_snapshot = conf.get('Session', 'Export_snapshot', fallback=None)
+    if args.values is None:
+        args.values = shlex.split(conf.get('Session', 'Values', fallback=""))
+    if args.serve is None:
+        args.serve = conf.getint('Session', 'Serve', fallback=None)
+    if args.integrity is None:
+        args.integrity = conf.getint('Session', 'Integrity', fallback=None)
+    if args.sample is None:
+        args.sample = conf.getint('Session', 'Sample', fallback=None)
+    if args.sample_fraction is None:
+        args.sample_fraction = conf.getfloat('Session', 'Sample_fraction', fallback=None)
+    if args.seed is None:
+        args.seed = conf.getint('Session', 'Seed', fallback=None)
 
 def create_parser():
     global alltags
@@ -184,6 +248,14 @@ def create_parser():
     parser.add_argument("-g", "--group", dest="group", #default=False,
                         action="store_const", const=True, default=None,
                         help="Use groups/stacks instead of image links")
+    parser.add_argument("-k", "--component", dest="component", #default=False,
+                        action="store_const", const=True, default=None,
+                        help="Compare multi-value tags of each item against the union of its link/stack component")
+    parser.add_argument("--pushdown", dest="pushdown", #default=False,
+                        action="store_const", const=True, default=None,
+                        help="Compute the differences of multi-value tags with SQL queries in the database. The "
+                             "report has the same lines as without it, but the multi-value tag lines come after "
+                             "the others, ordered by tag category and item.")
     parser.add_argument("-f", "--fullpath", dest="fullpath", #default=False,
                         action="store_const", const=True, default=None,
                         help="Print full directory path and not just file name")
@@ -210,17 +282,69 @@ def create_parser():
     parser.add_argument("-b", "--basename", dest="basename", nargs='*', metavar="SEPARATOR",
                         help="Compare the basename of the files. If additional strings are specified, "
                              "those are also used as separators, unless the filename is <= 8 chars.")
+    parser.add_argument("--unlinked", dest="unlinked", nargs='*', choices=["time", "folder"], metavar="KEY",
+                        help="Report the items with the same basename (see -b) that are not linked (or stacked with "
+                             "-g) together, and their differences. KEYs time and folder require the same creation "
+                             "time and folder too.")
+    parser.add_argument("--gps-outliers", dest="gps_outliers", nargs='?', const="event",
+                        choices=["event", "component"],
+                        help="Report the geotagged items farther than --GPS_dist [1000 m] from where most items of "
+                             "their Event [default] or link/stack component are")
+    parser.add_argument("--values", dest="values", nargs='+', metavar="TAG=VALUE",
+                        help="Check only the items with any of the tag values and the items linked (or stacked "
+                             "with -g) to them. TAG is People, Keywords, Categories, Collections or Event, and "
+                             "VALUE the full hierarchy, e.g. Keywords=Animals|Birds|Gull. VALUE|* selects the "
+                             "whole branch.")
+    parser.add_argument("--serve", dest="serve", type=int, nargs='?', const=8765, metavar="PORT",
+                        help="Keep the catalog open and answer the check requests GET /check?id=N and "
+                             "/component?id=N with JSON records on http://127.0.0.1:PORT [8765]. -w sets the "
+                             "number of connections [4].")
+    parser.add_argument("--memory", dest="memory", #default=False,
+                        action="store_const", const=True, default=None,
+                        help="Trace the memory allocations and report the peak and the memory used by the "
+                             "catalog constants, filters, items and output into stderr (slows down the scan)")
+    parser.add_argument("-m", "--columnar", dest="columnar", #default=False,
+                        action="store_const", const=True, default=None,
+                        help="Read the catalog into memory with bulk queries and compare the columnar copy")
+    parser.add_argument("-w", "--workers", dest="workers", type=int, #default=0,
+                        help="Hydrate the items asynchronously over a pool of WORKERS connections [0 = off]")
+    parser.add_argument("--watch", dest="watch", type=float, nargs='?', const=2.0, metavar="SECONDS",
+                        help="Keep running, check the changed items again and append the new findings to the report. "
+                             "Changes are polled every SECONDS [2]; on a server catalog each poll computes a "
+                             "checksum of every watched table in the database (a scan of the tables on the server).")
     parser.add_argument("-l", "--sqlite", dest="sqlite", #default=False,
                         action="store_const", const=True, default=None,
                         help="Use Sqlite (= standalone) instead of Postgresql (=server)")
     parser.add_argument("-c", "--catalog", dest="dbname", #default="NetCatalog",
-                        help="Daminion catalog name [NetCatalog]")
+                        help="Daminion catalog name [NetCatalog], or a snapshot file written with --export-snapshot")
+    parser.add_argument("--export-snapshot", dest="export_snapshot", metavar="FILE",
+                        help="Write the catalog into a snapshot FILE that can be scanned (and compared) without the "
+                             "database, and exit")
+    parser.add_argument("--integrity", dest="integrity", type=int, nargs='?', const=10, metavar="N",
+                        help="Check the referential integrity of the catalog (missing file entries, invalid "
+                             "events, media formats, tag values and creation times), report the number of errors "
+                             "and N [10] samples of each, and exit")
     parser.add_argument("-s", "--server", dest="server", #default="localhost",
                         help="Postgres server [localhost]")
     parser.add_argument("-p", "--port", dest="port", type=int, #default=5432,
                         help="Postgres server port [5432]")
     parser.add_argument("-u", "--user", dest="user", #default="postgres/postgres",
                         help="Postgres user/password [postgres/postgres]")
+    parser.add_argument("--summary", dest="summary", nargs='?', const="table", choices=["table", "json"],
+                        help="Report only the number of differences per folder and tag category, as a table "
+                             "[default] or JSON.")
+    sample = parser.add_mutually_exclusive_group()
+    sample.add_argument("--sample", dest="sample", type=int, metavar="N",
+                        help="Check a random sample of N items and report the estimated share of items with "
+                             "findings per tag category, with 95%% confidence intervals")
+    sample.add_argument("--sample-fraction", dest="sample_fraction", type=float, metavar="F",
+                        help="As --sample, but check the fraction F (0-1) of the items")
+    parser.add_argument("--seed", dest="seed", type=int,
+                        help="Seed of the random sample, the same seed gives the same sample [random]")
+    parser.add_argument("--baseline", dest="baseline",
+                        help="Previous (full) report; only the findings added or resolved since it are reported. "
+                             "Use the same options as for the previous report. With --unlinked only the unlinked "
+                             "pairs of the report are compared, ignored with --summary and --gps-outliers.")
     parser.add_argument("-o", "--output", dest="outfilename", # type=argparse.FileType('w', encoding='utf-8'),
                         # default=sys.stdout,
                         help="Output file for report [stdout]")
@@ -236,38 +360,136 @@ def create_parser():
     return parser, conf
 
 
+def CheckImage(curr_img, session, verbose=0):
+    # compare one item with the items it is linked (or stacked with -g) to
+    if not curr_img.isvalid:
+        return
+    taglist = session.tag_cat_list
+    exclude = session.filter_list
+    if session.group:  # by groups
+        ToList = curr_img.top_item()
+        FromList = curr_img.bottom_items()
+    else:  # by links
+        ToList = curr_img.linked("id_tomediaitem", "id_frommediaitem")
+        FromList = curr_img.linked("id_frommediaitem", "id_tomediaitem")
+    if ToList == [] and FromList == []:
+        return
+    if verbose > 1:
+        print("\n{}\t{}\t{}".format(FromList, curr_img, ToList))
+    if session.comp_name is not None:
+        for lst in ToList, FromList:
+            for f in lst:
+                if curr_img.basename != f.basename and ("Name", curr_img._id, f._id) not in session.filter_pairs:
+                    session.outfile.write(curr_img.ImageName + "\t<>\t" + f.ImageName + "\tName\n")
+    for tag in taglist:
+        if tag in ["Event", "Place", "GPS", "Title", "Description", "Comments"]:  # single value tags
+            for img in ToList:
+                curr_img.SameSingleValueTag(img, tag, exclude, session.filter_pairs, session.dist_tolerance,
+                                            session.alt_tolerance)
+        else:  # multi value tags
+            for img in ToList:
+                curr_img.SameMultiValueTags(">", img, tag, exclude, session.filter_pairs)
+            for img in FromList:
+                curr_img.SameMultiValueTags("<", img, tag, exclude, session.filter_pairs)
+
+
 def ScanCatalog(catalog, session, verbose=0):
     session.outfile.write("ImageA\tDir\tImageB\tTag\tValueA/Missing A\t\tValueB\n")
+    for curr_img in catalog.NextImage(catalog, session, verbose):
+        CheckImage(curr_img, session, verbose)
+
+
+def ScanSample(catalog, session, verbose=0):
+    # the items of a DamSample with findings, by tag category
+    counts = Counter()
+    checked = 0
+    outfile = session.outfile
+    try:
+        for curr_img in catalog.NextImage(catalog, session, verbose):
+            if not curr_img.isvalid:
+                continue
+            checked += 1
+            session.outfile = io.StringIO()
+            CheckImage(curr_img, session, verbose)
+            counts.update(set(line.split("\t")[3] for line in session.outfile.getvalue().splitlines()))
+    finally:
+        session.outfile = outfile
+    return counts, checked
+
+
+def ScanPushdown(catalog, session, verbose=0):
+    # multi-value tags are compared in the database, the other checks item by item with ScanCatalog
+    from Daminion.DamPushdown import DamPushdown
+
+    taglist = session.tag_cat_list
+    session.tag_cat_list = [t for t in taglist if t in ["Event", "Place", "GPS", "Title", "Description", "Comments"]]
+    if session.tag_cat_list != [] or session.comp_name is not None:
+        ScanCatalog(catalog, session, verbose)
+    else:
+        session.outfile.write("ImageA\tDir\tImageB\tTag\tValueA/Missing A\t\tValueB\n")
+    session.tag_cat_list = taglist
+    DamPushdown(catalog).ScanTags(session, [t for t in taglist if t in ["People", "Keywords", "Categories",
+                                                                        "Collections"]])
+
+
+def component_of(curr_img, session, visited):
+    # breadth first search of the valid items connected to curr_img by links (or stacks with -g)
+    members = [curr_img]
+    to_lists = {}
+    visited.add(curr_img._id)
+    i = 0
+    while i < len(members):
+        img = members[i]
+        if session.group:
+            ToList = img.top_item()
+            FromList = img.bottom_items()
+        else:
+            ToList = img.linked("id_tomediaitem", "id_frommediaitem")
+            FromList = img.linked("id_frommediaitem", "id_tomediaitem")
+        to_lists[img._id] = ToList
+        for f in ToList + FromList:
+            if f._id not in visited:
+                visited.add(f._id)
+                members.append(f)
+        i += 1
+    members.sort(key=lambda m: m._id)
+    return members, to_lists
+
+
+def ScanComponents(catalog, session, verbose=0):
+    # Multi-value tags are compared once per item against the union of the values in its component, instead
+    # of pairwise against every neighbour. Single value tags and names are compared along the links as before.
+    session.outfile.write("Image\tDir\tComponent\tTag\tMissing\tCount\n")
     taglist = session.tag_cat_list
     exclude = session.filter_list
-    for curr_img in DamCatalog.NextImage(catalog, session, verbose):
-        if not curr_img.isvalid:
+    visited = set()
+    for curr_img in catalog.NextImage(catalog, session, verbose):
+        if not curr_img.isvalid or curr_img._id in visited:
             continue
-        if session.group:  # by groups
-            ToList = curr_img.top_item()
-            FromList = curr_img.bottom_items()
-        else:  # by links
-            ToList = curr_img.linked("id_tomediaitem", "id_frommediaitem")
-            FromList = curr_img.linked("id_frommediaitem", "id_tomediaitem")
-        if ToList == [] and FromList == []:
+        members, to_lists = component_of(curr_img, session, visited)
+        if len(members) < 2:
             continue
         if verbose > 1:
-            print("\n{}\t{}\t{}".format(FromList, curr_img, ToList))
-        if session.comp_name is not None:
-            for lst in ToList, FromList:
-                for f in lst:
-                    if curr_img.basename != f.basename and ("Name", curr_img._id, f._id) not in session.filter_pairs:
-                        session.outfile.write(curr_img.ImageName + "\t<>\t" + f.ImageName + "\tName\n")
+            print("\n{}".format(members))
+        rep = members[0]
+        for img in members:
+            for f in to_lists[img._id]:
+                if session.comp_name is not None and img.basename != f.basename and \
+                        ("Name", img._id, f._id) not in session.filter_pairs:
+                    session.outfile.write(img.ImageName + "\t<>\t" + f.ImageName + "\tName\n")
+                for tag in taglist:
+                    if tag in ["Event", "Place", "GPS", "Title", "Description", "Comments"]:
+                        img.SameSingleValueTag(f, tag, exclude, session.filter_pairs, session.dist_tolerance,
+                                               session.alt_tolerance)
         for tag in taglist:
-            if tag in ["Event", "Place", "GPS", "Title", "Description", "Comments"]:  # single value tags
-                for img in ToList:
-                    curr_img.SameSingleValueTag(img, tag, exclude, session.filter_pairs, session.dist_tolerance,
-                                                session.alt_tolerance)
-            else:  # multi value tags
-                for img in ToList:
-                    curr_img.SameMultiValueTags(">", img, tag, exclude, session.filter_pairs)
-                for img in FromList:
-                    curr_img.SameMultiValueTags("<", img, tag, exclude, session.filter_pairs)
+            if tag in ["Event", "Place", "GPS", "Title", "Description", "Comments"]:
+                continue
+            union = {}
+            for img in members:
+                for tagvalue in dict.fromkeys(img.GetTags(tag)):
+                    union[tagvalue] = union.get(tagvalue, 0) + 1
+            for img in members:
+                img.SameComponentTags(rep, union, len(members), tag, exclude, session.filter_pairs)
 
 
 def main():
@@ -284,19 +506,112 @@ def main():
         else:
             sys.exit(0)
 
-    user = args.user.split('/')[0]
-    password = args.user.split('/')[1]
-    catalog = DamCatalog(args.server, args.port, args.dbname, user, password, args.sqlite)
-    catalog.initCatalogConstants()
+    return run(args, sys.argv)
+
+
+def run(args, argv):
+    # the scan of one catalog with the options read by read_ini, argv is documented in the report
+    VerboseOutput = args.verbose
+    memory = None
+    if args.memory:
+        from Daminion.DamMemory import DamMemory
+        memory = DamMemory()
+    from Daminion.DamSnapshot import DamSnapshot
+    snapshot = DamSnapshot.is_snapshot(args.dbname)
+    if snapshot:
+        catalog = DamSnapshot(args.dbname)
+        if args.sample is not None or args.sample_fraction is not None or args.gps_outliers is not None or \
+                args.summary is not None or args.watch > 0 or args.pushdown or args.workers > 0 or args.values != [] \
+                or args.serve is not None or args.integrity is not None:
+            sys.stderr.write("* Warning: --sample, --gps-outliers, --summary, --watch, --pushdown, -w, --values, "
+                             "--serve and --integrity need the database and are ignored with a snapshot\n")
+        args.sample = args.sample_fraction = args.gps_outliers = args.summary = args.serve = args.integrity = None
+        args.values = []
+        args.watch = 0
+        args.pushdown = False
+        args.workers = 0
+    else:
+        from Daminion.DamCatalog import DamCatalog
+        user = args.user.split('/')[0]
+        password = args.user.split('/')[1]
+        catalog = DamCatalog(args.server, args.port, args.dbname, user, password, args.sqlite)
+        catalog.initCatalogConstants()
+        if args.integrity is not None:
+            from Daminion.DamIntegrity import DamIntegrity, write_integrity
+            args.outfile.write(" ".join(argv) + "\n")
+            write_integrity(DamIntegrity(catalog).check(args.integrity), args.outfile)
+            if args.outfile != sys.stdout:
+                args.outfile.close()
+            return 0
+    if args.export_snapshot is not None:
+        from Daminion.DamColumns import DamColumns
+        DamSnapshot.export(catalog if snapshot else DamColumns(catalog), args.export_snapshot)
+        if VerboseOutput > 0:
+            print("Snapshot of", args.dbname, "written into", args.export_snapshot)
+        if args.outfile != sys.stdout:
+            args.outfile.close()
+        return 0
+    sampling = args.sample is not None or args.sample_fraction is not None
+    if snapshot:            # the snapshot is a columnar catalog
+        pass
+    elif args.serve is not None:
+        if args.columnar or args.component or args.pushdown or args.watch > 0 or args.summary is not None or \
+                args.baseline is not None or sampling or args.values != [] or args.unlinked is not None or \
+                args.gps_outliers is not None:
+            sys.stderr.write("* Warning: -m, -k, --pushdown, --watch, --summary, --baseline, --sample, --values, "
+                             "--unlinked and --gps-outliers are ignored in serve mode\n")
+        args.baseline = args.summary = args.unlinked = args.gps_outliers = None
+        sampling = False
+    elif sampling:
+        if args.columnar or args.component or args.pushdown or args.workers > 0 or args.watch > 0 or \
+                args.summary is not None or args.baseline is not None or args.values != []:
+            sys.stderr.write("* Warning: -m, -k, --pushdown, -w, --watch, --summary, --baseline and --values are "
+                             "ignored when sampling\n")
+        args.baseline = None
+        args.summary = None
+        from Daminion.DamSample import DamSample
+        catalog = DamSample(catalog, args.sample, args.sample_fraction, args.seed)
+    elif args.values != []:
+        if args.columnar or args.component or args.pushdown or args.workers > 0 or args.watch > 0 or \
+                args.summary is not None or args.unlinked is not None or args.gps_outliers is not None:
+            sys.stderr.write("* Warning: -m, -k, --pushdown, -w, --watch, --summary, --unlinked and --gps-outliers "
+                             "are ignored with --values\n")
+        args.component = args.pushdown = False
+        args.watch = 0
+        args.summary = args.unlinked = args.gps_outliers = None
+        from Daminion.DamIndex import DamIndex, parse_terms
+        catalog = DamIndex(catalog).select(parse_terms(args.values), args.group)
+    elif args.unlinked is not None:       # read with bulk queries like -m
+        from Daminion.DamColumns import DamColumns
+        catalog = DamColumns(catalog)
+    elif args.watch > 0:
+        if args.columnar or args.component or args.pushdown or args.workers > 0:
+            sys.stderr.write("* Warning: -m, -k, --pushdown and -w are ignored in watch mode\n")
+    elif args.columnar:
+        from Daminion.DamColumns import DamColumns
+        catalog = DamColumns(catalog)
+    elif args.workers > 0:
+        from Daminion.DamAsync import DamAsync
+        catalog = DamAsync(catalog, args.workers)
+    baseline_kinds = None       # the findings of the scans are compared with the baseline
+    if args.baseline is not None and (args.summary is not None or args.gps_outliers is not None):
+        sys.stderr.write("* Warning: --baseline is ignored with --summary and --gps-outliers\n")
+        args.baseline = None
+    elif args.baseline is not None and args.unlinked is not None:
+        from Daminion.DamBaseline import UNLINKED
+        baseline_kinds = UNLINKED
     if VerboseOutput > 0:
         print("Database", args.dbname, "opened and datastructures initialized.")
+    if memory is not None:
+        memory.checkpoint("catalog")
 
     # document the call parameters in the output file
-    line = sys.argv[0]
-    for s in sys.argv[1:]:
+    line = argv[0]
+    for s in argv[1:]:
         line += ' ' + s
     line += '\n'
-    args.outfile.write(line)
+    if args.summary != "json":
+        args.outfile.write(line)
 
     if args.onlyfile is None:
         file = args.exfile
@@ -304,7 +619,10 @@ def main():
         file = args.onlyfile
     session = SessionParams(args.taglist, args.fullpath, args.id, args.group, args.basename,
                             args.onlyfile == file, file, args.ack_pairs, args.dist_tolerance, args.alt_tolerance,
-                            outfile=args.outfile)
+                            outfile=args.outfile, baseline=args.baseline,
+                            baseline_kinds=baseline_kinds)
+    if memory is not None:
+        memory.checkpoint("session")
     #       For verbose print the filter list
     if VerboseOutput > 0:
         line = "Tags that are"
@@ -318,8 +636,43 @@ def main():
                 print(o)
         print("")
 
-    ScanCatalog(catalog, session, VerboseOutput)
+    if args.serve is not None:
+        from Daminion.DamServer import DamServer
+        try:
+            DamServer(catalog, session, CheckImage, args.workers if args.workers > 0 else 4,
+                      verbose=VerboseOutput).run(args.serve)
+        except KeyboardInterrupt:
+            pass
+    elif sampling:
+        from Daminion.DamSample import write_estimates
+        counts, checked = ScanSample(catalog, session, VerboseOutput)
+        write_estimates(counts, checked, catalog, session.outfile, session.tag_cat_list)
+    elif args.unlinked is not None:
+        from Daminion.DamUnlinked import DamUnlinked
+        DamUnlinked(catalog).ScanUnlinked(session, args.unlinked)
+    elif args.gps_outliers is not None:
+        from Daminion.DamGeo import DamGeo
+        DamGeo(catalog).ScanOutliers(session, args.gps_outliers)
+    elif args.summary is not None:
+        from Daminion.DamSummary import DamSummary, write_summary
+        write_summary(DamSummary(catalog).ScanSummary(session), session.outfile, session.tag_cat_list, args.summary)
+    elif args.watch > 0:
+        from Daminion.DamWatch import DamWatch
+        try:
+            DamWatch(catalog, session, CheckImage, VerboseOutput).run(args.watch)
+        except KeyboardInterrupt:
+            pass
+    elif args.component:
+        ScanComponents(catalog, session, VerboseOutput)
+    elif args.pushdown:
+        ScanPushdown(catalog, session, VerboseOutput)
+    else:
+        ScanCatalog(catalog, session, VerboseOutput)
 
+    if memory is not None:
+        memory.checkpoint("scan")
+        memory.stop()
+        memory.write(sys.stderr)
     if session.outfile != sys.stdout:
         session.outfile.close()
 
@@ -0,0 +1,206 @@
+#
+#   Copyright Juha Lintula (juha.v.lintula@gmail.com), 2017
+#
+#
+#
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+#   Asyncio pipeline for hydrating the items of a catalog. The queries of DamImage are run over a small pool
+#   of connections, so with a remote server up to pool size items are being fetched at the same time instead
+#   of one query after another. The DB-API drivers are blocking, so each query runs in an executor thread;
+#   the event loop only schedules them and puts the results back into the catalog order. The items an item
+#   is compared with are hydrated in the same job on the same pool connection: its linked (or with -g
+#   stacked) items, and with a partner catalog (DamCompare) the item of the same name there.
+#   DamAsync has the same interface as DamCatalog and can be given to DamScan.ScanCatalog and
+#   DamCompare.ScanCatalog.
+
+import asyncio
+import queue
+import threading
+from array import array
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from Daminion.DamImage import DamImage, get_image_by_name
+
+_END = object()
+LINKS = [("id_tomediaitem", "id_frommediaitem"), ("id_frommediaitem", "id_tomediaitem")]
+
+
+class _PoolView:
+    # what DamImage needs from a catalog: a connection and the constant lists
+    def __init__(self, catalog, conn):
+        self.catalog = conn
+        self.MediaList = catalog.MediaList
+        self.EventList = catalog.EventList
+        self.PlaceList = catalog.PlaceList
+        self.PeopleList = catalog.PeopleList
+        self.KeywordList = catalog.KeywordList
+        self.CategoryList = catalog.CategoryList
+        self.CollectionList = catalog.CollectionList
+
+
+class _Prefetched(DamImage):
+    # an item hydrated together with the items it is compared with; the other queries are run as in DamImage
+
+    def __init__(self, img_id, view, session, neighbours=True, partner=None):
+        DamImage.__init__(self, img_id, view, session)
+        self._neighbours = {}
+        self.match = None           # (partner, the item of the same name in partner or None)
+        if not self.isvalid:
+            return
+        if neighbours:
+            if session.group:
+                self._neighbours["top"] = DamImage.top_item(self)
+                self._neighbours["bottom"] = DamImage.bottom_items(self)
+            else:
+                for select, where in LINKS:
+                    self._neighbours[(select, where)] = DamImage.linked(self, select, where)
+        if partner is not None:
+            other = partner._views.get()
+            try:
+                self.match = (partner, get_image_by_name(self._ImagePath, self._ImageName, other, session))
+            finally:
+                partner._views.put(other)
+
+    def linked(self, select, where):
+        if (select, where) in self._neighbours:
+            return self._neighbours[(select, where)]
+        return DamImage.linked(self, select, where)
+
+    def top_item(self):
+        if "top" in self._neighbours:
+            return self._neighbours["top"]
+        return DamImage.top_item(self)
+
+    def bottom_items(self):
+        if "bottom" in self._neighbours:
+            return self._neighbours["bottom"]
+        return DamImage.bottom_items(self)
+
+
+class DamAsync:
+
+    def __init__(self, catalog, pool_size=4, window=64, connect=None, neighbours=True, partner=None):
+        # catalog is an opened DamCatalog with initialized constants, connect opens another connection to it;
+        # neighbours prefetches the linked (or stacked) items for DamScan and partner is the DamAsync catalog
+        # whose items of the same name are prefetched for DamCompare
+        self._source = catalog
+        self.catalog = catalog.catalog
+        self._dbname = catalog._dbname
+        self._counter = 0
+        self.MediaList = catalog.MediaList
+        self.EventList = catalog.EventList
+        self.PlaceList = catalog.PlaceList
+        self.PeopleList = catalog.PeopleList
+        self.KeywordList = catalog.KeywordList
+        self.CategoryList = catalog.CategoryList
+        self.CollectionList = catalog.CollectionList
+        self.pool_size = max(1, pool_size)
+        self.window = max(self.pool_size, window, 2)
+        if connect is None:
+            connect = catalog.connect
+        self._pool = [_PoolView(catalog, connect()) for i in range(self.pool_size)]
+        self._views = queue.Queue()     # the pool for the lookups of a partner catalog
+        for view in self._pool:
+            self._views.put(view)
+        self.neighbours = neighbours
+        self.partner = partner
+
+    def __del__(self):
+        for view in getattr(self, "_pool", []):
+            view.catalog.close()
+
+    def image_by_name(self, path, name, session):
+        return get_image_by_name(path, name, self, session)
+
+    async def _hydrate(self, loop, executor, pool, img_id, session):
+        view = await pool.get()
+        try:
+            img = await loop.run_in_executor(executor, _Prefetched, img_id, view, session, self.neighbours,
+                                             self.partner)
+        finally:
+            pool.put_nowait(view)
+        # anything else is read with the main connection
+        img._db = self
+        for items in img._neighbours.values():
+            for other in items:
+                other._db = self
+        if img.match is not None and img.match[1] is not None:
+            img.match[1]._db = self.partner
+        return img
+
+    async def _stream(self, ids, session, out, stop):
+        # at most window items are scheduled and pool_size of them are being queried at any time;
+        # the results are passed on in the order of ids
+        loop = asyncio.get_running_loop()
+        pool = asyncio.Queue()
+        for view in self._pool:
+            pool.put_nowait(view)
+        pending = deque()
+        with ThreadPoolExecutor(max_workers=self.pool_size) as executor:
+            try:
+                for img_id in ids:
+                    if stop.is_set():
+                        break
+                    pending.append(asyncio.ensure_future(self._hydrate(loop, executor, pool, img_id, session)))
+                    if len(pending) >= self.window:
+                        await loop.run_in_executor(None, out.put, await pending.popleft())
+                while pending and not stop.is_set():
+                    await loop.run_in_executor(None, out.put, await pending.popleft())
+                if not stop.is_set():
+                    out.put(_END)
+            except BaseException as error:
+                if not stop.is_set():
+                    out.put(error)
+            finally:
+                for task in pending:
+                    task.cancel()
+                if pending:
+                    await asyncio.gather(*pending, return_exceptions=True)
+
+    @staticmethod
+    def NextImage(cat, session, verbose=0):
+        curs = cat.catalog.cursor()
+        curs.execute("SELECT id, filename, deleted FROM mediaitems")
+        ids = array('i')
+        names = []
+        for row in curs:
+            if not bool(row[2]):
+                ids.append(row[0])
+                if verbose > 0:
+                    names.append(row[1])
+        curs.close()
+
+        out = queue.Queue(cat.window)
+        stop = threading.Event()
+        worker = threading.Thread(target=asyncio.run, args=(cat._stream(ids, session, out, stop),), daemon=True)
+        worker.start()
+        try:
+            n = 0
+            img = out.get()
+            while img is not _END:
+                if isinstance(img, BaseException):
+                    raise img
+                cat._counter += 1
+                if verbose > 0:
+                    print("\r", "{:7} {:7}: {:60}".format(cat._counter, img._id, names[n]), end="", flush=True)
+                n += 1
+                yield img
+                img = out.get()
+        finally:
+            stop.set()
+            while not out.empty():
+                out.get_nowait()
+            worker.join()
@@ -0,0 +1,179 @@
+#
+#   Copyright Juha Lintula (juha.v.lintula@gmail.com), 2017
+#
+#
+#
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+#   Database backends. All SQL is written with '?' placeholders; the backend translates it to the dialect
+#   of its driver and keeps a per-connection cache of prepared statements, so the per-item queries of
+#   DamImage are parsed and planned only once per connection. Adding a backend means adding a class here
+#   and a branch in connect(). The driver modules are imported when a backend is opened, so a run against
+#   a standalone catalog never loads psycopg2.
+
+import os
+import sys
+
+
+class Backend:
+
+    false = "FALSE"     # SQL literal for a false boolean column value
+    dialect = None
+    # SQL expression of a timestamp column {0} as integer seconds since 1970 with the fractions dropped,
+    # NULL for a malformed value
+    epoch = "CAST(FLOOR(EXTRACT(EPOCH FROM {0})) AS BIGINT)"
+
+    def __init__(self, conn):
+        self.conn = conn
+        self._statements = {}
+
+    def cursor(self):
+        # plain cursor for streaming bulk queries
+        return self.conn.cursor()
+
+    def stream(self):
+        # cursor for results larger than memory, the rows are fetched from the server in batches
+        return self.conn.cursor()
+
+    def close(self):
+        self.conn.close()
+
+    def fetchone(self, sql, params=()):
+        rows = self.fetchall(sql, params)
+        return rows[0] if rows != [] else None
+
+    def fetchall(self, sql, params=()):
+        # a new cursor for each query, the backends of this module reuse prepared statements instead
+        cur = self.conn.cursor()
+        try:
+            cur.execute(sql, params)
+            return cur.fetchall()
+        finally:
+            cur.close()
+
+    def commit(self):
+        # end the current read transaction, so that the next queries see the changes of other connections
+        self.conn.commit()
+
+    def data_version(self):
+        # a counter that changes when another connection commits changes, None if there is none
+        return None
+
+    def checksum(self, sql):
+        # (row count, order independent checksum of the rows) of the result of sql, computed here from the
+        # rows; the server backends compute it in the database and only the one row is transferred
+        count, total = 0, 0
+        cur = self.stream()
+        cur.execute(sql)
+        for row in cur:
+            count += 1
+            total = (total + hash(row)) & ((1 << 64) - 1)
+        cur.close()
+        return count, total
+
+
+class SqliteBackend(Backend):
+
+    false = "0"
+    dialect = "sqlite"
+    epoch = "CASE WHEN length({0}) >= 19 THEN CAST(strftime('%s', substr({0}, 1, 19)) AS INTEGER) END"
+
+    @staticmethod
+    def open(name):
+        import sqlite3
+        if os.path.isfile(name):
+            return SqliteBackend(sqlite3.connect(name, check_same_thread=False))   # used from one thread at a time
+        else:
+            sys.stderr.write(name + " is not a valid database file\n")
+            sys.exit(-1)
+
+    def fetchall(self, sql, params=()):
+        # sqlite3 keeps the compiled statement of a cursor, so each statement gets its own reused cursor
+        if sql not in self._statements:
+            self._statements[sql] = self.conn.cursor()
+        cur = self._statements[sql]
+        cur.execute(sql, params)
+        return cur.fetchall()
+
+    def data_version(self):
+        return self.fetchone("PRAGMA data_version")[0]
+
+    def close(self):
+        for cur in self._statements.values():
+            cur.close()
+        self.conn.close()
+
+
+class PostgresBackend(Backend):
+
+    dialect = "postgresql"
+
+    @staticmethod
+    def open(host, port, name, user, pwd):
+        import psycopg2
+        try:
+            return PostgresBackend(psycopg2.connect(host=host, port=port, database=name, user=user, password=pwd))
+        except (Exception, psycopg2.DatabaseError) as error:
+            sys.stderr.write(error.args[0])
+            sys.exit(-1)
+
+    def __init__(self, conn):
+        Backend.__init__(self, conn)
+        self._cur = conn.cursor()
+        self._streams = 0
+
+    def stream(self):
+        # a named (server side) cursor, psycopg2 would read the whole result of a plain cursor at once
+        self._streams += 1
+        cur = self.conn.cursor(name="damstream_" + str(self._streams))
+        cur.itersize = 10000
+        return cur
+
+    @staticmethod
+    def _numbered(sql):
+        # '?' placeholders to $1, $2, ... for PREPARE
+        parts = sql.split("?")
+        line = parts[0]
+        for i in range(1, len(parts)):
+            line += "$" + str(i) + parts[i]
+        return line, len(parts) - 1
+
+    def fetchall(self, sql, params=()):
+        # server side PREPARE once per connection, EXECUTE after that
+        if sql not in self._statements:
+            name = "damstmt_" + str(len(self._statements) + 1)
+            prepared, count = self._numbered(sql)
+            self._cur.execute("PREPARE " + name + " AS " + prepared)
+            self._statements[sql] = (name, count)
+        name, count = self._statements[sql]
+        if count == 0:
+            self._cur.execute("EXECUTE " + name)
+        else:
+            self._cur.execute("EXECUTE " + name + " (" + ", ".join(["%s"] * count) + ")", params)
+        return self._cur.fetchall()
+
+    def checksum(self, sql):
+        # the hashes of the row texts summed in the database, still a sequential scan of the table on the server
+        return self.fetchone("SELECT count(*), coalesce(sum(hashtext(CAST(t AS text))), 0) FROM (" + sql + ") t")
+
+    def close(self):
+        self._cur.close()
+        self.conn.close()
+
+
+def connect(host, port, name, user, pwd, sqlite):
+    if sqlite:
+        return SqliteBackend.open(name)
+    else:
+        return PostgresBackend.open(host, port, name, user, pwd)
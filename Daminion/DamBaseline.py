@@ -0,0 +1,190 @@
+#
+#   Copyright Juha Lintula (juha.v.lintula@gmail.com), 2017
+#
+#
+#
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+#   Delta reports: the findings of a previous (full) report are read into a sorted array of 64 bit keys, one
+#   key for each tag value (multi-value tags) or each tag (the other lines) of an item pair. The report lines
+#   of the new run are written through DamBaseline, which passes on only the findings not in the baseline.
+#   When it is closed, the baseline is read again and the findings that were not seen in this run (and are
+#   not acknowledged with -a) are written as resolved. The memory use is about 9 bytes per finding.
+#   Only the findings of the kinds the run reports are compared: the tag differences of the scans, or the
+#   unlinked pairs of --unlinked. The other lines of the baseline are ignored.
+
+import sys
+import os
+import heapq
+from array import array
+from bisect import bisect_left
+
+from Daminion.SessionParams import SessionParams, FilterPairs
+
+CHUNK = 1 << 20     # keys sorted at a time when the baseline is read
+
+DIFFERENCES = ["<", ">", "<>", "*"]     # the kinds of findings of the scans and DamCompare
+UNLINKED = ["~"]                        # --unlinked
+
+
+def findings(line):
+    # the fields of a report line, the values (or tags) it reports, their keys and the acknowledgement
+    # checks for them; lines that are not findings (command line, headers) have no keys
+    p = line.split("\t")
+    if len(p) < 3 or p[1] not in ["<", ">", "<>", "*", "~"]:
+        return p, [], [], []
+    id1 = SessionParams._get_item_id(p[0])
+    id2 = SessionParams._get_item_id(p[2])
+    pair = "\t".join([p[0] if id1 is None else str(id1), p[1], p[2] if id2 is None else str(id2)])
+    if p[1] == "~":     # --unlinked, one finding per pair whatever their differences are
+        values = [""]
+        keys = [hash(pair)]
+        acks = [("Unlinked", id1, id2, "")]
+    elif p[1] == "<>":  # single value tags, names and DamCompare
+        if len(p) > 3:
+            values = p[3].split(", ")
+        else:
+            values = [""]
+        keys = [hash(pair + "\t" + v) for v in values]
+        acks = [(v, id1, id2, "") for v in values]
+    else:               # multi-value tags
+        if len(p) > 4:
+            values = [v[1:-1] for v in p[4].split(", ")]        # remove quotes
+        else:
+            values = [""]
+        keys = [hash(pair + "\t" + p[3] + "\t" + v) for v in values]
+        acks = [(p[3], id1, id2, v) for v in values]
+    return p, values, keys, acks
+
+
+def rebuild(p, values, selected):
+    # the report line with only the selected values
+    p = list(p)
+    if p[1] == "~":
+        pass
+    elif p[1] == "<>":
+        if len(p) > 3:
+            p[3] = ", ".join(values[i] for i in selected)
+    elif len(p) > 4:
+        p[4] = ", ".join("'" + values[i] + "'" for i in selected)
+        if len(p) > 5:          # counts of -k/--component
+            counts = p[5].split(", ")
+            p[5] = ", ".join(counts[i] for i in selected)
+    return "\t".join(p) + "\n"
+
+
+class DamBaseline:
+
+    def __init__(self, filename, outfile, filter_pairs=None, kinds=DIFFERENCES):
+        self.filename = filename
+        self.kinds = kinds
+        self.outfile = outfile
+        if filter_pairs is None:
+            self.filter_pairs = FilterPairs()
+        else:
+            self.filter_pairs = filter_pairs
+        self._keys = self._load(filename)
+        self._seen = bytearray(len(self._keys))
+        self._buffer = ""
+        self.added = 0
+        self.resolved = 0
+
+    @staticmethod
+    def _lines(filename):
+        with open(filename, "r", encoding="utf-8") as f:
+            for line in f:
+                yield line.rstrip("\n")
+
+    def _findings(self, line):
+        # findings() of the kinds of this run, the lines of other kinds have no keys
+        p, values, keys, acks = findings(line)
+        if keys != [] and p[1] not in self.kinds:
+            return p, [], [], []
+        return p, values, keys, acks
+
+    def _load(self, filename):
+        # the keys are sorted in chunks, which are then merged
+        if filename is None or not os.path.isfile(filename):
+            sys.stderr.write("{} doesn't exist. Option --baseline ignored.\n".format(filename))
+            self.filename = None
+            return array('q')
+        chunks = []
+        chunk = array('q')
+        for line in self._lines(filename):
+            chunk.extend(self._findings(line)[2])
+            if len(chunk) >= CHUNK:
+                chunks.append(array('q', sorted(chunk)))
+                chunk = array('q')
+        chunks.append(array('q', sorted(chunk)))
+        if len(chunks) == 1:
+            return chunks[0]
+        return array('q', heapq.merge(*chunks))
+
+    def _find(self, key):
+        i = bisect_left(self._keys, key)
+        if i < len(self._keys) and self._keys[i] == key:
+            return i
+        return -1
+
+    def _write_line(self, line):
+        p, values, keys, acks = self._findings(line)
+        if keys == []:
+            self.outfile.write(line + "\n")
+            return
+        selected = []
+        for i in range(len(keys)):
+            j = self._find(keys[i])
+            if j < 0:
+                selected.append(i)
+            else:
+                self._seen[j] = 1
+        if selected != []:
+            self.added += len(selected)
+            self.outfile.write(rebuild(p, values, selected))
+
+    def write(self, s):
+        # lines may be written in parts
+        lines = (self._buffer + s).split("\n")
+        self._buffer = lines.pop()
+        for line in lines:
+            self._write_line(line)
+
+    def flush(self):
+        self.outfile.flush()
+
+    def write_resolved(self):
+        if self._buffer != "":
+            self._write_line(self._buffer)
+            self._buffer = ""
+        if self.filename is None:
+            return
+        self.outfile.write("Resolved since {}:\n".format(self.filename))
+        for line in self._lines(self.filename):
+            p, values, keys, acks = self._findings(line)
+            selected = []
+            for i in range(len(keys)):
+                j = self._find(keys[i])
+                if not self._seen[j] and acks[i] not in self.filter_pairs:
+                    selected.append(i)
+                    self._seen[j] = 1           # report a finding once, even if the baseline repeats it
+            if selected != []:
+                self.resolved += len(selected)
+                self.outfile.write(rebuild(p, values, selected))
+
+    def close(self):
+        self.write_resolved()
+        if self.outfile != sys.stdout:
+            self.outfile.close()
+        else:
+            self.outfile.flush()
@@ -18,12 +18,8 @@
 #
 #
 
-import sqlite3
-import psycopg2
-import os
-import sys
-
-from Daminion.DamImage import DamImage
+from Daminion.DamImage import DamImage, PlaceTable, get_image_by_name
+from Daminion import DamBackend
 
 class DamCatalog:
 
@@ -77,7 +73,7 @@ class DamCatalog:
         cur.execute("SELECT id, hierarchylevel, value FROM place_table")
         rows = cur.fetchall()
         cur.close()
-        tmplist = {}
+        tmplist = PlaceTable()
         for r in rows:
             tmplist[r[0]] = (r[1], r[2])
         return tmplist
@@ -98,33 +94,18 @@ class DamCatalog:
     def _initCollectionList(conn):
         return DamCatalog._initHierList(conn, "systemcollection_table")
 
-    @staticmethod
-    def _open_db_sqlite(name):
-        if os.path.isfile(name):
-            return sqlite3.connect(name)
-        else:
-            sys.stderr.write(name + " is not a valid database file\n")
-            sys.exit(-1)
-
-    @staticmethod
-    def _open_db_postgres(host, port, name, user, pwd):
-        try:
-            return psycopg2.connect(host=host, port=port, database=name,
-                                                user=user, password=pwd)
-        except (Exception, psycopg2.DatabaseError) as error:
-            sys.stderr.write(error.args[0])
-            sys.exit(-1)
-
     def __init__(self, host, port, name, user, pwd, sqlite):
 
         self.catalog = None
         self._dbname = name
         self._counter = 0
+        self._params = (host, port, name, user, pwd, sqlite)
+
+        self.catalog = self.connect()
 
-        if sqlite:
-            self.catalog = self._open_db_sqlite(name)
-        else:
-            self.catalog = self._open_db_postgres(host, port, name, user, pwd)
+    def connect(self):
+        # a new connection (backend) to the same catalog
+        return DamBackend.connect(*self._params)
 
     def __del__(self):
         if self.catalog is not None:
@@ -139,6 +120,9 @@ class DamCatalog:
         self.CategoryList = DamCatalog._initCategoryList(self.catalog)
         self.CollectionList = DamCatalog._initCollectionList(self.catalog)
 
+    def image_by_name(self, path, name, session):
+        return get_image_by_name(path, name, self, session)
+
     @staticmethod
     def NextImage(cat, session, verbose=0):
         curs = cat.catalog.cursor()
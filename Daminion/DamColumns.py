@@ -0,0 +1,461 @@
+#
+#   Copyright Juha Lintula (juha.v.lintula@gmail.com), 2017
+#
+#
+#
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+#   Columnar in-memory model of a catalog. The whole catalog is read with a handful of bulk queries into
+#   parallel arrays (one slot per media item, ordered by item id) and the multi-value tags into CSR
+#   (compressed sparse row) form: the values of the item in row r are values[offsets[r]:offsets[r + 1]].
+#   ColumnImage offers the same interface as DamImage, so DamScan.ScanCatalog and DamCompare.ScanCatalog
+#   run unchanged against a DamColumns object, but the comparisons are done on the value id arrays and
+#   the strings are built only for the differences that are reported.
+
+from array import array
+from bisect import bisect_left
+from datetime import timedelta
+
+from Daminion.DamImage import DamImage, imagefiletypekey, place_key, INVALID_TIME, EPOCH
+
+#   tag category, assignment table, value list in DamCatalog
+multivaluetags = [("People", "people_file", "PeopleList"),
+                  ("Keywords", "keywords_file", "KeywordList"),
+                  ("Categories", "categories_file", "CategoryList"),
+                  ("Collections", "systemcollection_file", "CollectionList")]
+valuelists = dict((tag, valuelist) for tag, table, valuelist in multivaluetags)
+
+
+class DamColumns:
+
+    @staticmethod
+    def _group(keys, values, n):
+        # stable counting sort of (row, value) pairs into CSR offsets and values
+        offsets = array('q', bytes(8 * (n + 1)))
+        for k in keys:
+            offsets[k + 1] += 1
+        for r in range(n):
+            offsets[r + 1] += offsets[r]
+        pos = array('q', offsets[:-1])
+        grouped = array('i', bytes(4 * len(values)))
+        for k, v in zip(keys, values):
+            grouped[pos[k]] = v
+            pos[k] += 1
+        return offsets, grouped
+
+    def _csr(self, cur, table):
+        # assignment rows sorted by item and value, so each item's slice is in the order DamImage reads it
+        n = len(self.ids)
+        offsets = array('q', bytes(8 * (n + 1)))
+        values = array('i')
+        cur.execute("SELECT id_mediaitem, id_value FROM " + table + " ORDER BY id_mediaitem, id_value")
+        ids = self.ids
+        r = 0
+        for item, value in cur:
+            while r < n and ids[r] < item:
+                r += 1
+                offsets[r] = len(values)
+            if r < n and ids[r] == item:
+                values.append(value)
+        while r < n:
+            r += 1
+            offsets[r] = len(values)
+        return offsets, values
+
+    def _load_mediaitems(self, cur):
+        # the creation time is converted to seconds in the database, milliseconds dropped
+        cur.execute("SELECT id, filename, deleted, id_event, id_mediaformat, " +
+                    self.catalog.epoch.format("creationdatetime") +
+                    ", id_topmediaitemstack FROM mediaitems ORDER BY id")
+        for row in cur:
+            self.ids.append(row[0])
+            self.names.append(DamImage._none_to_str(row[1]))
+            self.deleted.append(bool(row[2]))
+            self.event.append(row[3] or 0)
+            self.mediaformat.append(row[4] or 0)
+            self.ctime.append(INVALID_TIME if row[5] is None else row[5])
+            self.top.append(row[6] or 0)
+
+    def _load_files(self, cur):
+        paths = {}
+        n = len(self.ids)
+        self.path = array('i', [-1]) * n
+        cur.execute("SELECT id_mediaitem, filename, relativepath FROM files")
+        for item, name, path in cur:
+            r = self.row(item)
+            if r < 0 or self.path[r] >= 0:
+                continue
+            if path not in paths:
+                paths[path] = len(self.paths)
+                self.paths.append(path)
+            self.path[r] = paths[path]
+            self.names[r] = name
+
+    def _load_gps(self, cur):
+        n = len(self.ids)
+        seen = bytearray(n)
+        self.gps = array('d', bytes(3 * 8 * n))     # latitude, longitude, altitude of each item
+        cur.execute("SELECT id_mediaitem, gpslatitude, gpslongitude, gpsaltitude FROM image")
+        for item, lat, long, alt in cur:
+            r = self.row(item)
+            if r < 0 or seen[r]:
+                continue
+            seen[r] = 1
+            self.gps[3 * r] = float(lat)
+            self.gps[3 * r + 1] = float(long)
+            self.gps[3 * r + 2] = float(alt)
+
+    def _load_subject(self, cur):
+        n = len(self.ids)
+        seen = bytearray(n)
+        self.title = [""] * n
+        self.description = [""] * n
+        self.comments = [""] * n
+        cur.execute("SELECT id_mediaitem, title, description, comments FROM subject")
+        for item, title, description, comments in cur:
+            r = self.row(item)
+            if r < 0 or seen[r]:
+                continue
+            seen[r] = 1
+            self.title[r] = DamImage._none_to_str(title)
+            self.description[r] = DamImage._none_to_str(description)
+            self.comments[r] = DamImage._none_to_str(comments)
+
+    def _load_links(self, cur):
+        n = len(self.ids)
+        keys_to, keys_from, ids_to, ids_from = array('i'), array('i'), array('i'), array('i')
+        cur.execute("SELECT id_frommediaitem, id_tomediaitem FROM mediaitems_link")
+        for id_from, id_to in cur:
+            r_from = self.row(id_from)
+            r_to = self.row(id_to)
+            if r_from >= 0 and r_to >= 0:
+                keys_to.append(r_from)
+                ids_to.append(r_to)
+                keys_from.append(r_to)
+                ids_from.append(r_from)
+        self.links_to = self._group(keys_to, ids_to, n)
+        self.links_from = self._group(keys_from, ids_from, n)
+
+        keys, rows = array('i'), array('i')
+        for r in range(n):
+            t = self.row(self.top[r])
+            if t >= 0:
+                keys.append(t)
+                rows.append(r)
+        self.stack = self._group(keys, rows, n)
+
+    def __init__(self, catalog):
+        # catalog is an opened DamCatalog with initialized constants
+        self._source = catalog
+        self.catalog = catalog.catalog
+        self._dbname = catalog._dbname
+        self._counter = 0
+        self.MediaList = catalog.MediaList
+        self.EventList = catalog.EventList
+        self.PlaceList = catalog.PlaceList
+        self.PeopleList = catalog.PeopleList
+        self.KeywordList = catalog.KeywordList
+        self.CategoryList = catalog.CategoryList
+        self.CollectionList = catalog.CollectionList
+
+        self.ids = array('i')
+        self.names = []
+        self.deleted = array('b')
+        self.event = array('i')
+        self.mediaformat = array('i')
+        self.ctime = array('q')
+        self.top = array('i')
+        self.paths = []
+        self._path_index = None
+        self._keys = {}
+
+        cur = self.catalog.cursor()
+        self._load_mediaitems(cur)
+        self._load_files(cur)
+        self._load_gps(cur)
+        self._load_subject(cur)
+        self.tags = {}
+        for tag, table, valuelist in multivaluetags:
+            self.tags[tag] = self._csr(cur, table)
+        self.tags["Place"] = self._csr(cur, "place_file")
+        self._load_links(cur)
+        cur.close()
+
+        self.isimage = bytearray(len(self.ids))
+        for r in range(len(self.ids)):
+            self.isimage[r] = self.MediaList.get(self.mediaformat[r]) in imagefiletypekey
+
+    def row(self, img_id):
+        r = bisect_left(self.ids, img_id)
+        if r < len(self.ids) and self.ids[r] == img_id:
+            return r
+        return -1
+
+    def path_of(self, r):
+        if self.path[r] < 0:
+            return "<empty>"
+        return self.paths[self.path[r]]
+
+    def values(self, tag, r):
+        offsets, values = self.tags[tag]
+        return values[offsets[r]:offsets[r + 1]]
+
+    def value_keys(self, tag, other=None):
+        # Maps the value ids of tag in catalog other (default: this catalog) to integers that are equal
+        # exactly when the value strings are equal, so the tag sets can be compared as sorted int arrays.
+        if other is None:
+            other = self
+        key = (id(other), tag)
+        if key not in self._keys:
+            valuelist = getattr(self, valuelists[tag])
+            canon = {"–ERROR–": -1}
+            for i in sorted(valuelist):
+                canon.setdefault(valuelist[i], i)
+            mapping = {}
+            other_list = getattr(other, valuelists[tag])
+            for i, s in other_list.items():
+                if s not in canon:
+                    canon[s] = -2 - len(canon)
+                mapping[i] = canon[s]
+            self._keys[key] = (mapping, canon)
+        return self._keys[key]
+
+    def image_by_name(self, path, name, session):
+        # hashed (relativepath, filename) index, built on first use
+        if self._path_index is None:
+            self._path_index = {}
+            for r in range(len(self.ids)):
+                if self.path[r] >= 0 and not self.deleted[r]:
+                    self._path_index.setdefault((self.paths[self.path[r]], self.names[r]), r)
+        r = self._path_index.get((path, name))
+        if r is None:
+            return None
+        return ColumnImage(self.ids[r], self, session, r)
+
+    @staticmethod
+    def NextImage(cat, session, verbose=0):
+        for r in range(len(cat.ids)):
+            if not cat.deleted[r]:
+                cat._counter += 1
+                if verbose > 0:
+                    print("\r", "{:7} {:7}: {:60}".format(cat._counter, cat.ids[r], cat.names[r]), end="",
+                          flush=True)
+                yield ColumnImage(cat.ids[r], cat, session, r)
+
+
+class ColumnImage(DamImage):
+    # DamImage backed by a row in DamColumns; all the attributes are read from the arrays on demand
+
+    def __init__(self, img_id, db, session, row=None):
+        self._db = db
+        self._id = img_id
+        self._session = session
+        self._row = db.row(img_id) if row is None else row
+
+    @property
+    def _ImageName(self):
+        if self._row < 0:
+            return "<empty>"
+        return self._db.names[self._row]
+
+    @property
+    def _ImagePath(self):
+        if self._row < 0:
+            return "<empty>"
+        return self._db.path_of(self._row)
+
+    @property
+    def IsDeleted(self):
+        return self._row < 0 or bool(self._db.deleted[self._row])
+
+    @property
+    def IsImage(self):
+        return self._row >= 0 and bool(self._db.isimage[self._row])
+
+    @property
+    def Event(self):
+        if self.IsDeleted:
+            return ""
+        return self._db.EventList.get(self._db.event[self._row], "–ERROR–")
+
+    @property
+    def ctime(self):
+        if self._row < 0:
+            return INVALID_TIME
+        return self._db.ctime[self._row]
+
+    @property
+    def creationtime(self):
+        t = self.ctime
+        if t == INVALID_TIME:
+            return None
+        return EPOCH + timedelta(seconds=t)
+
+    def _place(self):
+        if self.IsDeleted:
+            return place_key(""), ""
+        return self._db.PlaceList.place(tuple(sorted(self._db.values("Place", self._row))))
+
+    @property
+    def PlaceId(self):
+        return self._place()[0]
+
+    @property
+    def Place(self):
+        return self._place()[1]
+
+    @property
+    def lat(self):
+        return self._db.gps[3 * self._row] if not self.IsDeleted else 0.0
+
+    @property
+    def long(self):
+        return self._db.gps[3 * self._row + 1] if not self.IsDeleted else 0.0
+
+    @property
+    def alt(self):
+        return self._db.gps[3 * self._row + 2] if not self.IsDeleted else 0.0
+
+    @property
+    def GPS(self):
+        if self.IsDeleted:
+            return ""
+        return "{}N {}E {}m".format(self.lat, self.long, self.alt)
+
+    @property
+    def Title(self):
+        return self._db.title[self._row] if not self.IsDeleted else ""
+
+    @property
+    def Description(self):
+        return self._db.description[self._row] if not self.IsDeleted else ""
+
+    @property
+    def Comments(self):
+        return self._db.comments[self._row] if not self.IsDeleted else ""
+
+    def _tag_strings(self, tag):
+        if self.IsDeleted:
+            return []
+        valuelist = getattr(self._db, valuelists[tag])
+        return [valuelist.get(v, "–ERROR–") for v in self._db.values(tag, self._row)]
+
+    @property
+    def People(self):
+        return self._tag_strings("People")
+
+    @property
+    def Keywords(self):
+        return self._tag_strings("Keywords")
+
+    @property
+    def Categories(self):
+        return self._tag_strings("Categories")
+
+    @property
+    def Collections(self):
+        return self._tag_strings("Collections")
+
+    def _same_tag(self, other, tag):
+        # cheap array level test; True means the values are certainly equal, False that they may differ
+        db = self._db
+        r1, r2 = self._row, other._row
+        if tag == "Event":
+            return db is other._db and db.event[r1] == db.event[r2]
+        if tag == "Place":
+            return self.PlaceId == other.PlaceId
+        if tag == "GPS":     # bitwise, as 0.0 and -0.0 are printed differently
+            return db.gps[3 * r1:3 * r1 + 3].tobytes() == other._db.gps[3 * r2:3 * r2 + 3].tobytes()
+        return getattr(self, tag) == getattr(other, tag)
+
+    def _same_multi(self, other, tag):
+        mapping, canon = self._db.value_keys(tag, self._db)
+        if other._db is self._db:
+            other_mapping = mapping
+        else:
+            other_mapping, canon = self._db.value_keys(tag, other._db)
+        mine = sorted(mapping.get(v, -1) for v in self._db.values(tag, self._row))
+        theirs = sorted(other_mapping.get(v, -1) for v in other._db.values(tag, other._row))
+        return mine == theirs
+
+    def linked(self, select, where):
+        if where == "id_frommediaitem":
+            offsets, rows = self._db.links_to
+        else:
+            offsets, rows = self._db.links_from
+        tmp_list = []
+        for r in rows[offsets[self._row]:offsets[self._row + 1]]:
+            if r != self._row:
+                img = ColumnImage(self._db.ids[r], self._db, self._session, r)
+                if img.isvalid:
+                    tmp_list.append(img)
+        return tmp_list
+
+    def top_item(self):
+        r = self._db.row(self._db.top[self._row])
+        if r < 0 or r == self._row:
+            return []
+        img = ColumnImage(self._db.ids[r], self._db, self._session, r)
+        if img.isvalid:
+            return [img]
+        else:
+            return []
+
+    def bottom_items(self):
+        offsets, rows = self._db.stack
+        tmp_list = []
+        for r in rows[offsets[self._row]:offsets[self._row + 1]]:
+            if r != self._row:
+                img = ColumnImage(self._db.ids[r], self._db, self._session, r)
+                if img.isvalid:
+                    tmp_list.append(img)
+        return tmp_list
+
+    def image_eq(self, other, dist_tolerance, alt_tolerance):
+        if other is None or other.IsDeleted:
+            return False, ["ERROR: file missing"]
+        lst = []
+        if self.ctime != other.ctime:
+            lst.append("Creation Time")
+        for tag in ["Title", "Description", "Comments", "Place"]:
+            if not self._same_tag(other, tag):
+                lst.append(tag)
+        if not self._same_tag(other, "GPS") and self.GPS != other.GPS:
+            if dist_tolerance > 0.0 or alt_tolerance > 0.0:
+                distance, delta_alt = self.image_dist(other)
+                if distance > dist_tolerance or delta_alt > alt_tolerance:
+                    lst.append("GPS")
+            else:
+                lst.append("GPS")
+        if self.Event != other.Event:
+            lst.append("Event")
+        for tag, table, valuelist in multivaluetags:
+            if not self._same_multi(other, tag):
+                lst.append(tag)
+        return lst == [], lst
+
+    def SameSingleValueTag(self, other, tagcat, filter_list, filter_pairs, dist, alt):
+        if self._same_tag(other, tagcat):
+            return
+        DamImage.SameSingleValueTag(self, other, tagcat, filter_list, filter_pairs, dist, alt)
+
+    def SameMultiValueTags(self, d, other, tagcat, filter_list, filter_pairs):
+        # diff the value id slices first, the strings are needed only when some value is missing
+        mine = self._db.values(tagcat, self._row)
+        theirs = other._db.values(tagcat, other._row)
+        if other._db is self._db:
+            mine_set = set(mine)
+            if all(v in mine_set for v in theirs):
+                return
+        DamImage.SameMultiValueTags(self, d, other, tagcat, filter_list, filter_pairs)
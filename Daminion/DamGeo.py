@@ -0,0 +1,188 @@
+#
+#   Copyright Juha Lintula (juha.v.lintula@gmail.com), 2017
+#
+#
+#
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+#   GPS outliers: the geotagged items are read in one pass over the image table and put into a grid of cells
+#   about --GPS_dist wide, separately for each Event (or link/stack component). The densest 3x3 block of cells
+#   of a group is where most of its items are; the centre of the items in it is the centre of the group, and
+#   the items farther than --GPS_dist from the centre are reported. There are no pairwise distances, and the
+#   memory use is a few numbers per geotagged item.
+
+from array import array
+from collections import Counter
+from math import atan2, cos, degrees, floor, hypot, radians, sin, sqrt
+from types import SimpleNamespace
+
+from Daminion.DamImage import DamImage, imagefiletypekey
+
+METRES_PER_DEGREE = 111195.0        # along a meridian, with the earth radius of DamImage.image_dist
+DEFAULT_DIST = 1000.0               # when --GPS_dist is not given
+MIN_ITEMS = 3                       # smaller groups have no majority
+
+
+class DamGeo:
+
+    def __init__(self, catalog):
+        # catalog is an opened DamCatalog with initialized constants
+        self.catalog = catalog.catalog
+        self._db = catalog
+        self.ids = array('i')
+        self.groups = array('q')
+        self.lat = array('d')
+        self.long = array('d')
+
+    def _components(self, group):
+        # item: component label (smallest item id), only for the linked (or stacked) items
+        parent = {}
+
+        def find(a):
+            root = a
+            while parent.get(root, root) != root:
+                root = parent[root]
+            while parent.get(a, a) != root:
+                parent[a], a = root, parent[a]
+            return root
+
+        cur = self.catalog.cursor()
+        if group:
+            cur.execute("SELECT id, id_topmediaitemstack FROM mediaitems WHERE id <> id_topmediaitemstack")
+        else:
+            cur.execute("SELECT id_frommediaitem, id_tomediaitem FROM mediaitems_link")
+        for a, b in cur:
+            if a is None or b is None:
+                continue
+            a, b = find(a), find(b)
+            if a != b:
+                parent[max(a, b)] = min(a, b)
+        cur.close()
+        for a in list(parent):
+            parent[a] = find(a)
+        return parent
+
+    def read(self, by="event", group=False):
+        # the valid geotagged items and their group: id_event, or the component with by="component"
+        labels = self._components(group) if by == "component" else None
+        cur = self.catalog.cursor()
+        cur.execute("SELECT i.id_mediaitem, i.gpslatitude, i.gpslongitude, m.id_event, m.deleted, m.id_mediaformat "
+                    "FROM image i JOIN mediaitems m ON m.id = i.id_mediaitem")
+        for img_id, lat, long, event, deleted, fmt in cur:
+            if bool(deleted) or self._db.MediaList.get(fmt) not in imagefiletypekey:
+                continue
+            lat, long = float(lat or 0.0), float(long or 0.0)
+            if lat == 0.0 and long == 0.0:              # not geotagged
+                continue
+            if labels is None:
+                if not event:
+                    continue
+                key = event
+            else:
+                key = labels.get(img_id, img_id)
+            self.ids.append(img_id)
+            self.groups.append(key)
+            self.lat.append(lat)
+            self.long.append(long)
+        cur.close()
+
+    @staticmethod
+    def _cell(lat, long, size, scale):
+        # scale is the cosine of the latitude of the group, so that the cells are as wide as they are high
+        return floor(lat / size), floor(long * scale / size)
+
+    def _scales(self):
+        # group: cosine of the mean latitude of its items
+        sums = {}
+        for i in range(len(self.ids)):
+            s = sums.setdefault(self.groups[i], [0.0, 0])
+            s[0] += self.lat[i]
+            s[1] += 1
+        return dict((key, max(cos(radians(total / n)), 0.01)) for key, (total, n) in sums.items())
+
+    def centres(self, dist):
+        # group: (latitude, longitude, number of items in the densest block)
+        size = dist / METRES_PER_DEGREE
+        scales = self._scales()
+        cells = {}
+        for i in range(len(self.ids)):
+            key = self.groups[i]
+            cells.setdefault(key, Counter())[self._cell(self.lat[i], self.long[i], size, scales[key])] += 1
+        best = {}
+        for key, counts in cells.items():
+            if sum(counts.values()) < MIN_ITEMS:
+                continue
+            block = max(sorted(counts), key=lambda c: sum(counts.get((c[0] + i, c[1] + j), 0)
+                                                          for i in (-1, 0, 1) for j in (-1, 0, 1)))
+            best[key] = block
+        sums = {}
+        for i in range(len(self.ids)):
+            key = self.groups[i]
+            if key not in best:
+                continue
+            c = self._cell(self.lat[i], self.long[i], size, scales[key])
+            if abs(c[0] - best[key][0]) <= 1 and abs(c[1] - best[key][1]) <= 1:
+                lat, long = radians(self.lat[i]), radians(self.long[i])
+                s = sums.setdefault(key, [0.0, 0.0, 0.0, 0])
+                s[0] += cos(lat) * cos(long)
+                s[1] += cos(lat) * sin(long)
+                s[2] += sin(lat)
+                s[3] += 1
+        return dict((key, (degrees(atan2(z, hypot(x, y))), degrees(atan2(y, x)), n))
+                    for key, (x, y, z, n) in sums.items())
+
+    def outliers(self, dist):
+        # (item id, group, distance from the centre, centre, (spread, number) of the other items of the group) of
+        # the items beyond dist; the spread is the root mean square distance from the centre
+        centres = self.centres(dist)
+        distances = []
+        spread = {}
+        for i in range(len(self.ids)):
+            key = self.groups[i]
+            if key not in centres:
+                continue
+            centre = SimpleNamespace(lat=centres[key][0], long=centres[key][1], alt=0.0)
+            d = DamImage.image_dist(centre, SimpleNamespace(lat=self.lat[i], long=self.long[i], alt=0.0))[0]
+            if d > dist:
+                distances.append((self.ids[i], key, d))
+            else:
+                s = spread.setdefault(key, [0.0, 0])
+                s[0] += d * d
+                s[1] += 1
+        for img_id, key, d in distances:
+            s, n = spread.get(key, (0.0, 0))
+            yield img_id, key, d, centres[key], (sqrt(s / n) if n > 0 else 0.0, n)
+
+    def _label(self, key, by, session):
+        if by == "component":
+            return "Component of " + self._name(key, session)
+        return self._db.EventList.get(key, "–ERROR–")
+
+    def _name(self, img_id, session):
+        name, path, err = DamImage._get_filename(self.catalog, img_id)
+        return DamImage.format_name(session, path, name, img_id)
+
+    def ScanOutliers(self, session, by="event"):
+        dist = session.dist_tolerance if session.dist_tolerance > 0.0 else DEFAULT_DIST
+        self.read(by, session.group)
+        session.outfile.write("Image\tGroup\tDistance\tCentre\tSpread\n")
+        count = 0
+        for img_id, key, d, centre, spread in self.outliers(dist):
+            label = self._label(key, by, session)
+            if by == "event" and session.filter_list.has_option("Event", label):
+                continue
+            session.outfile.write("{}\t{}\t{:.0f} m\t{:.6f}N {:.6f}E\t{:.0f} m ({} items)\n".format(
+                self._name(img_id, session), label, d, centre[0], centre[1], spread[0], spread[1]))
+            count += 1
+        return count
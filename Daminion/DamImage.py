@@ -20,35 +20,49 @@
 #   19Nov2019: Ignore difference in milliseconds, when comparing creation time
 
 import sys
-import sqlite3
-from datetime import datetime
-import psycopg2
-import psycopg2.extensions
+from datetime import datetime, timedelta
+from functools import lru_cache
 
 from math import cos, asin, sqrt                                                                                # WBL
 
 imagefiletypekey = ["%7jnbapuim4$lwk:d45bb3b6-b441-435c-a3ec-b27d067b7c53",
                     "%7jnbapuim4$lwk:343f9214-79a7-4b58-96a3-b7838e3e37ee"]  # magic keys from database
+INVALID_TIME = -2 ** 63     # creation time that is missing or malformed in the database
+EPOCH = datetime(1970, 1, 1)
+PLACE_CACHE = 4096          # combinations of place ids whose place strings are memoized per catalog
+
+
+def place_key(place):
+    # the interned place string: equal places of both catalogs are the same object and compare by identity,
+    # and a string is freed when no cached combination or item refers to it any more
+    return sys.intern(place)
+
+
+class PlaceTable(dict):
+    # the place constants of a catalog (id: (hierarchylevel, value)); most items share a few combinations
+    # of places, so the place string of each combination is made once and kept in a bounded LRU cache
+
+    def __init__(self, places=(), size=PLACE_CACHE):
+        dict.__init__(self, places)
+        self.place = lru_cache(maxsize=size)(self._place)
+
+    def _place(self, ids):
+        # ids is a sorted tuple of place ids, returns the interned key and the place string; an id missing
+        # from place_table is shown as –ERROR– like the other tags
+        place = place_key("|".join(p[1] for p in sorted(self.get(i, (0, "–ERROR–")) for i in ids)))
+        return place, place
 
 
 def get_image_by_name(path, name, db, session):
     # this should do cur.fetchall() and select the row which is not deleted
     # no this is taking the first row from the database
-    cur = db.catalog.cursor()
-    if isinstance(cur, sqlite3.Cursor):
-        cur.execute("SELECT id_mediaitem FROM files WHERE filename = ? AND relativepath = ?", (name, path))
-    elif isinstance(cur, psycopg2.extensions.cursor):
-        cur.execute("SELECT id_mediaitem FROM files WHERE filename = %s AND relativepath = %s", (name, path))
-    row = cur.fetchall()
+    row = db.catalog.fetchall("SELECT id_mediaitem FROM files WHERE filename = ? AND relativepath = ?",
+                              (name, path))
     if row is None: # or row[0] is None:
         return None
     else:
         for r in row:
-            if isinstance(cur, sqlite3.Cursor):
-                cur.execute("SELECT deleted FROM mediaitems WHERE id=?", (r[0], ))
-            elif isinstance(cur, psycopg2.extensions.cursor):
-                cur.execute("SELECT deleted FROM mediaitems WHERE id=%s", (r[0], ))
-            d = cur.fetchone()
+            d = db.catalog.fetchone("SELECT deleted FROM mediaitems WHERE id = ?", (r[0], ))
             if d is not None and not bool(d[0]):
                 return DamImage(r[0], db, session)
         return None
@@ -57,88 +71,60 @@ def get_image_by_name(path, name, db, session):
 class DamImage:
 
     @staticmethod
-    def _getMultiValueTags(cur, img_id, tag, table, filename, valuelist):
-        cur.execute("SELECT id_value FROM " + table + " WHERE id_mediaitem=" + str(img_id) + " ORDER BY id_value")
-        rows = cur.fetchall()
+    def _getMultiValueTags(conn, img_id, tag, table, filename, valuelist):
+        rows = conn.fetchall("SELECT id_value FROM " + table + " WHERE id_mediaitem = ? ORDER BY id_value", (img_id, ))
         tmp_list = []
         for r in rows:
             if r[0] in valuelist:
                 tmp_list.append(valuelist[r[0]])
             else:
-                tmp_list.append("–ERROR–")
-                sys.stderr.write("***ERROR: Invalid {} in id: {}, image: {}\n".format(tag, img_id, filename))
+                tmp_list.append("–ERROR–")     # found by DamScan.py --integrity
         return tmp_list
 
     @staticmethod
-    def _get_filename(cur, img_id):
-        cur.execute("SELECT filename, relativepath FROM files WHERE id_mediaitem=" + str(img_id))
-        row = cur.fetchone()
+    def _get_filename(conn, img_id):
+        row = conn.fetchone("SELECT filename, relativepath FROM files WHERE id_mediaitem = ?", (img_id, ))
         if row is None:
-            cur.execute("SELECT filename FROM mediaitems WHERE id=" + str(img_id))
-            row = cur.fetchone()
+            row = conn.fetchone("SELECT filename FROM mediaitems WHERE id = ?", (img_id, ))
             if row is None:
                 name = "<empty>"
             else:
                 name = row[0]
-            sys.stderr.write("***ERROR: No corresponding file entry for {} (id: {})\n".format(name, img_id))
             return name, "<empty>", True
         else:
             return row[0], row[1], False
 
     @staticmethod
-    def _get_mediaitems_attr(cur, img_id, filename, medialist, eventlist):
+    def _get_mediaitems_attr(conn, img_id, filename, medialist, eventlist):
 
         global imagefiletypekey
 
-        cur.execute("SELECT deleted, id_event, id_mediaformat, creationdatetime FROM mediaitems WHERE id=" +
-                    str(img_id))
-        row = cur.fetchone()
+        row = conn.fetchone("SELECT deleted, id_event, id_mediaformat, " + conn.epoch.format("creationdatetime") +
+                            " FROM mediaitems WHERE id = ?", (img_id, ))
         isdeleted = row is None or bool(row[0])
         if isdeleted:
-            return "", False, isdeleted, None
+            return "", False, isdeleted, INVALID_TIME
         if row[1] in eventlist:
             event = eventlist[row[1]]
         else:
             event = "–ERROR–"
-            sys.stderr.write("***ERROR: Invalid Event in id: {}, image: {}\n".format(img_id, filename))
         if row[2] in medialist:
             isimage = medialist[row[2]] in imagefiletypekey
         else:
             isimage = False
-            sys.stderr.write("***ERROR: Invalid Media format in id: {}, image: {}\n".format(img_id, filename))
-        if isinstance(cur, sqlite3.Cursor):
-            if len(row[3]) < 19:
-                sys.stderr.write("***ERROR: Invalid creation time id: {}, image: {}, time: {}\n".format(
-                    img_id, filename, row[3]))
-                time = datetime.today()
-            elif len(row[3]) > 19:   # ensure all there is exactly six decimals
-                t_str = row[3] + "000000"
-                time = datetime.fromisoformat(t_str[:26])
-            else:
-                time = datetime.fromisoformat(row[3])
-        else:
-            time = row[3]
-        return event, isimage, isdeleted, time
+        # the creation time is converted to seconds in the database; the invalid ids and times are found by
+        # DamScan.py --integrity
+        return event, isimage, isdeleted, INVALID_TIME if row[3] is None else row[3]
 
     @staticmethod
-    def _get_place(cur, img_id, filename, places):
-        cur.execute("SELECT id_value FROM place_file WHERE id_mediaitem=" + str(img_id))
-        rows = cur.fetchall()
-        tmp_placelist = []
-        for r in rows:
-            tmp_placelist.append(places[r[0]])
-        tmp_placelist.sort()
-        placelist = ""
-        for p in tmp_placelist:
-            if placelist != "":
-                placelist += '|'
-            placelist += p[1]
-        return placelist
+    def _get_place(conn, img_id, filename, places):
+        rows = conn.fetchall("SELECT id_value FROM place_file WHERE id_mediaitem = ?", (img_id, ))
+        return places.place(tuple(sorted(r[0] for r in rows)))
 
     @staticmethod
-    def _get_GPS(cur, img_id):
-        cur.execute("SELECT gpslatitude, gpslongitude, gpsaltitude FROM image WHERE id_mediaitem=" + str(img_id))
-        row = cur.fetchone()
+    def _get_GPS(conn, img_id):
+        row = conn.fetchone("SELECT gpslatitude, gpslongitude, gpsaltitude FROM image WHERE id_mediaitem = ?",
+                            (img_id, ))
         if row is None:
             lat = 0.0
             long = 0.0
@@ -159,9 +145,8 @@ class DamImage:
             return s
 
     @staticmethod
-    def _get_subject(cur, img_id):
-        cur.execute("SELECT title, description, comments FROM subject WHERE id_mediaitem=" + str(img_id))
-        row = cur.fetchone()
+    def _get_subject(conn, img_id):
+        row = conn.fetchone("SELECT title, description, comments FROM subject WHERE id_mediaitem = ?", (img_id, ))
         if row is None:
             title = ""
             description = ""
@@ -177,15 +162,16 @@ class DamImage:
         self._id = img_id
         self._session = session
 
-        cur = self._db.catalog.cursor()
-        self._ImageName, self._ImagePath, err_flag = self._get_filename(cur, self._id)
+        conn = self._db.catalog
+        self._ImageName, self._ImagePath, err_flag = self._get_filename(conn, self._id)
         if err_flag:
             self.IsDeleted = True
             self.IsImage = False
         filename = self._ImagePath + "\\" + self._ImageName
-        self.Event, self.IsImage, self.IsDeleted, self.creationtime = self._get_mediaitems_attr(cur, self._id, filename,
-                                                                             self._db.MediaList, self._db.EventList)
+        self.Event, self.IsImage, self.IsDeleted, self.ctime = self._get_mediaitems_attr(conn, self._id,
+                                                                    filename, self._db.MediaList, self._db.EventList)
         if self.IsDeleted:
+            self.PlaceId = place_key("")
             self.Place = ""
             self.GPS = ""
             self.lat = 0.0
@@ -199,19 +185,19 @@ class DamImage:
             self.Description = ""
             self.Comments = ""
         else:
-            self.Place = self._get_place(cur, self._id, filename, self._db.PlaceList)
-            self.GPS, self.lat, self.long, self.alt = self._get_GPS(cur, self._id)                              # WBL
-            self.Title, self.Description, self.Comments = self._get_subject(cur, self._id)
+            self.PlaceId, self.Place = self._get_place(conn, self._id, filename, self._db.PlaceList)
+            self.GPS, self.lat, self.long, self.alt = self._get_GPS(conn, self._id)                             # WBL
+            self.Title, self.Description, self.Comments = self._get_subject(conn, self._id)
 
             # get list of People, Keywords and Categories
-            self.People = self._getMultiValueTags(cur, self._id, "People", "people_file", filename, self._db.PeopleList)
-            self.Keywords = self._getMultiValueTags(cur, self._id, "Keywords", "keywords_file", filename,
+            self.People = self._getMultiValueTags(conn, self._id, "People", "people_file", filename,
+                                                  self._db.PeopleList)
+            self.Keywords = self._getMultiValueTags(conn, self._id, "Keywords", "keywords_file", filename,
                                                     self._db.KeywordList)
-            self.Categories = self._getMultiValueTags(cur, self._id, "Categories", "categories_file", filename,
+            self.Categories = self._getMultiValueTags(conn, self._id, "Categories", "categories_file", filename,
                                                       self._db.CategoryList)
-            self.Collections = self._getMultiValueTags(cur, self._id, "Collections", "systemcollection_file", filename,
-                                                       self._db.CollectionList)
-        cur.close()
+            self.Collections = self._getMultiValueTags(conn, self._id, "Collections", "systemcollection_file",
+                                                       filename, self._db.CollectionList)
 
     def image_dist(self, other):
 #        other_lat = float(other.lat)  # WBL    Calculate
@@ -239,9 +225,7 @@ class DamImage:
 #            lst.append("Path")
 #       If the creation time is changed in Daminion, it drops milliseconds from its database
 #       but leaves them in EXIF data. Drop the milliseconds, so they don't generate false positives
-        self.creationtime = self.creationtime.replace(microsecond=0)
-        other.creationtime = other.creationtime.replace(microsecond=0)
-        if self.creationtime != other.creationtime:
+        if self.ctime != other.ctime:      # seconds, other may be a ColumnImage
             lst.append("Creation Time")
         if self.Title != other.Title:
             lst.append("Title")
@@ -249,7 +233,7 @@ class DamImage:
             lst.append("Description")
         if self.Comments != other.Comments:
             lst.append("Comments")
-        if self.Place != other.Place:
+        if self.PlaceId != other.PlaceId:
             lst.append("Place")
         if self.GPS != other.GPS:
             if dist_tolerance > 0.0 or alt_tolerance > 0.0:
@@ -270,27 +254,41 @@ class DamImage:
             lst.append("Collections")
         return lst == [], lst
 
-    @property
-    def ImageName(self):
+    @staticmethod
+    def format_name(session, path, name, img_id):
         line = ""
-        if self._session.fullpath:
-            line += self._ImagePath + "\\"
-        line += self._ImageName
-        if self._session.print_id:
-            line += " ({})".format(self._id)
+        if session.fullpath:
+            line += path + "\\"
+        line += name
+        if session.print_id:
+            line += " ({})".format(img_id)
         return line
 
     @property
-    def basename(self):
-        name = self._ImageName.rsplit('.', maxsplit=1)[0]
-        if self._session.comp_name is not None:
-            for c in self._session.comp_name:
+    def ImageName(self):
+        return DamImage.format_name(self._session, self._ImagePath, self._ImageName, self._id)
+
+    @staticmethod
+    def base_name(filename, separators):
+        name = filename.rsplit('.', maxsplit=1)[0]
+        if separators is not None:
+            for c in separators:
                 tmp = name.rsplit(c, maxsplit=1)[0]
                 if len(tmp) < 8:
                     break
                 name = tmp
         return name
 
+    @property
+    def creationtime(self):
+        if self.ctime == INVALID_TIME:
+            return None
+        return EPOCH + timedelta(seconds=self.ctime)
+
+    @property
+    def basename(self):
+        return DamImage.base_name(self._ImageName, self._session.comp_name)
+
     #  Ignore deleted entries and items that are not images
     @property
     def isvalid(self):
@@ -298,24 +296,19 @@ class DamImage:
 
     def linked(self, select, where):
         tmp_list = []
-        cur = self._db.catalog.cursor()
-        cur.execute("SELECT " + select + " FROM mediaitems_link WHERE " + where + "=" + str(self._id))
+        row = self._db.catalog.fetchall("SELECT " + select + " FROM mediaitems_link WHERE " + where + " = ?",
+                                        (self._id, ))
 #        if VerboseOutput:
 #            print("Linked {} count {}: {}".format(where, self.ImageName, cur.rowcount))
-        row = cur.fetchall()
         for r in row:
             if r[0] != self._id:
                 img = DamImage(r[0], self._db, self._session)
                 if img.isvalid:
                     tmp_list.append(img)
-        cur.close()
         return tmp_list
 
     def top_item(self):
-        cur = self._db.catalog.cursor()
-        cur.execute("SELECT id_topmediaitemstack FROM mediaitems WHERE id=" + str(self._id))
-        row = cur.fetchone()
-        cur.close()
+        row = self._db.catalog.fetchone("SELECT id_topmediaitemstack FROM mediaitems WHERE id = ?", (self._id, ))
         if row is None or row[0] == self._id:
             return []
         else:
@@ -327,10 +320,7 @@ class DamImage:
 
     def bottom_items(self):
         tmp_list = []
-        cur = self._db.catalog.cursor()
-        cur.execute("SELECT id FROM mediaitems WHERE id_topmediaitemstack=" + str(self._id))
-        rows = cur.fetchall()
-        cur.close()
+        rows = self._db.catalog.fetchall("SELECT id FROM mediaitems WHERE id_topmediaitemstack = ?", (self._id, ))
         for r in rows:
             if r[0] != self._id:
                 img = DamImage(r[0], self._db, self._session)
@@ -343,6 +333,8 @@ class DamImage:
         return tags
 
     def SameSingleValueTag(self, other, tagcat, filter_list, filter_pairs, dist, alt):
+        if tagcat == "Place" and self.PlaceId == other.PlaceId:
+            return
         mytag = self.GetTags(tagcat)
         othertag = other.GetTags(tagcat)
         pair = (tagcat, self._id, other._id) in filter_pairs
@@ -379,3 +371,20 @@ class DamImage:
                 line += "'" + tagvalue + "'"
         if orig_len < len(line):
             self._session.outfile.write(line + "\n")
+
+    def SameComponentTags(self, rep, union, size, tagcat, filter_list, filter_pairs):
+        # union has the values of the whole component with the number of members having each value
+        mytags = set(self.GetTags(tagcat))
+        line = self.ImageName + "\t*\t" + rep.ImageName + "\t" + tagcat + "\t"
+        orig_len = len(line)
+        counts = ""
+        for tagvalue, count in union.items():
+            pair = (tagcat, self._id, rep._id, tagvalue) in filter_pairs
+            if tagvalue not in mytags and not filter_list.has_option(tagcat, tagvalue) and tagvalue != "" and not pair:
+                if len(line) > orig_len:
+                    line += ", "
+                    counts += ", "
+                line += "'" + tagvalue + "'"
+                counts += "{}/{}".format(count, size)
+        if orig_len < len(line):
+            self._session.outfile.write(line + "\t" + counts + "\n")
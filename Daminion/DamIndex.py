@@ -0,0 +1,147 @@
+#
+#   Copyright Juha Lintula (juha.v.lintula@gmail.com), 2017
+#
+#
+#
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+#   Reverse index from tag values to items: for each value id of People, Keywords, Categories, Collections and
+#   Event a sorted posting list of the item ids, read with one bulk query per tag category when the category
+#   is first used. A value selects the items tagged with it; a value ending with "|*" selects the whole branch
+#   under it. DamSelection is a catalog of the selected items and the items linked (or stacked) with them,
+#   so that DamScan.ScanCatalog re-checks only them.
+
+import sys
+from array import array
+
+from Daminion.DamImage import DamImage, get_image_by_name
+
+#   tag category: assignment table, value id column, item id column, value list in DamCatalog
+indexedtags = {"People": ("people_file", "id_value", "id_mediaitem", "PeopleList"),
+               "Keywords": ("keywords_file", "id_value", "id_mediaitem", "KeywordList"),
+               "Categories": ("categories_file", "id_value", "id_mediaitem", "CategoryList"),
+               "Collections": ("systemcollection_file", "id_value", "id_mediaitem", "CollectionList"),
+               "Event": ("mediaitems", "id_event", "id", "EventList")}
+BRANCH = "|*"
+
+
+def parse_terms(terms):
+    # "TAG=VALUE" strings into (tag, value) pairs, the invalid ones are reported and dropped
+    parsed = []
+    for term in terms:
+        tag, sep, value = term.partition("=")
+        if sep == "" or tag not in indexedtags or value == "":
+            sys.stderr.write("* Warning: invalid tag value '{}' – expected TAG=VALUE with TAG one of {}\n".format(
+                term, ", ".join(indexedtags)))
+            continue
+        parsed.append((tag, value))
+    return parsed
+
+
+class DamIndex:
+
+    def __init__(self, catalog):
+        # catalog is an opened DamCatalog with initialized constants
+        self._db = catalog
+        self.catalog = catalog.catalog
+        self.postings = {}      # tag category: {value id: array of item ids}
+
+    def _build(self, tag):
+        table, value_col, item_col, valuelist = indexedtags[tag]
+        postings = {}
+        cur = self.catalog.cursor()
+        cur.execute("SELECT {0}, {1} FROM {2} WHERE {0} IS NOT NULL ORDER BY {0}, {1}".format(value_col, item_col,
+                                                                                         table))
+        for value, item in cur:
+            if value not in postings:
+                postings[value] = array('i')
+            postings[value].append(item)
+        cur.close()
+        self.postings[tag] = postings
+
+    def build(self, tags=indexedtags):
+        for tag in tags:
+            self._build(tag)
+        return self
+
+    def value_ids(self, tag, value):
+        # the ids of value in the value list of tag, or of the values in its branch with a trailing "|*"
+        valuelist = getattr(self._db, indexedtags[tag][3])
+        if value.endswith(BRANCH):
+            prefix = value[:-len(BRANCH)]
+            return sorted(i for i, s in valuelist.items() if s == prefix or s.startswith(prefix + "|"))
+        return sorted(i for i, s in valuelist.items() if s == value)
+
+    def items(self, terms):
+        # sorted ids of the items with any of the (tag, value) terms
+        found = set()
+        for tag, value in terms:
+            if tag not in self.postings:
+                self._build(tag)
+            ids = self.value_ids(tag, value)
+            if ids == []:
+                sys.stderr.write("* Warning: {} value '{}' is not in the catalog\n".format(tag, value))
+            for i in ids:
+                found.update(self.postings[tag].get(i, ()))
+        return sorted(found)
+
+    def linked(self, ids, group=False):
+        # ids and the items linked (or with group stacked) with them
+        found = set(ids)
+        for img_id in ids:
+            if group:
+                rows = self.catalog.fetchall("SELECT id_topmediaitemstack FROM mediaitems WHERE id = ?", (img_id, ))
+                rows += self.catalog.fetchall("SELECT id FROM mediaitems WHERE id_topmediaitemstack = ?", (img_id, ))
+            else:
+                rows = self.catalog.fetchall("SELECT id_tomediaitem FROM mediaitems_link WHERE id_frommediaitem = ?",
+                                             (img_id, ))
+                rows += self.catalog.fetchall("SELECT id_frommediaitem FROM mediaitems_link WHERE id_tomediaitem = ?",
+                                              (img_id, ))
+            found.update(row[0] for row in rows if row[0] is not None)
+        return sorted(found)
+
+    def select(self, terms, group=False):
+        return DamSelection(self._db, self.linked(self.items(terms), group))
+
+
+class DamSelection:
+
+    def __init__(self, catalog, ids):
+        # catalog is an opened DamCatalog with initialized constants, ids the items to be scanned
+        self._source = catalog
+        self.catalog = catalog.catalog
+        self._dbname = catalog._dbname
+        self._counter = 0
+        self.MediaList = catalog.MediaList
+        self.EventList = catalog.EventList
+        self.PlaceList = catalog.PlaceList
+        self.PeopleList = catalog.PeopleList
+        self.KeywordList = catalog.KeywordList
+        self.CategoryList = catalog.CategoryList
+        self.CollectionList = catalog.CollectionList
+        self.ids = ids
+
+    def image_by_name(self, path, name, session):
+        return get_image_by_name(path, name, self, session)
+
+    @staticmethod
+    def NextImage(cat, session, verbose=0):
+        for img_id in cat.ids:
+            img = DamImage(img_id, cat, session)
+            if img.IsDeleted:
+                continue
+            cat._counter += 1
+            if verbose > 0:
+                print("\r", "{:7} {:7}: {:60}".format(cat._counter, img_id, img.ImageName), end="", flush=True)
+            yield img
@@ -0,0 +1,90 @@
+#
+#   Copyright Juha Lintula (juha.v.lintula@gmail.com), 2017
+#
+#
+#
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+#   Referential integrity of a catalog: the items without a file entry, the events, media formats and tag
+#   values that refer to a missing row of their value table and the creation times that can't be read. Each
+#   check is one anti-join query over the whole catalog, counted in the database, and a few of the broken
+#   rows are given as samples. The scans don't look for these errors, the check is its own mode, run with
+#   DamScan.py --integrity.
+
+from Daminion.DamColumns import multivaluetags
+from Daminion.DamImage import DamImage
+
+SAMPLES = 10            # samples of each error
+
+NOT_DELETED = "COALESCE(m.deleted, {false}) = {false}"
+
+#   the checks: name, the FROM and WHERE clauses of the broken rows of the not deleted items m and the
+#   column that shows the broken value
+CHECKS = [("No corresponding file entry",
+           "FROM mediaitems m WHERE " + NOT_DELETED +
+           " AND NOT EXISTS (SELECT 1 FROM files f WHERE f.id_mediaitem = m.id)", "m.filename"),
+          ("Invalid Event",
+           "FROM mediaitems m WHERE " + NOT_DELETED +
+           " AND NOT EXISTS (SELECT 1 FROM event_table v WHERE v.id = m.id_event)", "m.id_event"),
+          ("Invalid Media format",
+           "FROM mediaitems m WHERE " + NOT_DELETED +
+           " AND NOT EXISTS (SELECT 1 FROM mediaformat_table v WHERE v.id = m.id_mediaformat)", "m.id_mediaformat"),
+          ("Invalid creation time",
+           "FROM mediaitems m WHERE " + NOT_DELETED + " AND {epoch} IS NULL", "m.creationdatetime")] + \
+         [("Invalid " + tag,
+           "FROM " + table + " t JOIN mediaitems m ON m.id = t.id_mediaitem WHERE " + NOT_DELETED +
+           " AND NOT EXISTS (SELECT 1 FROM " + table.replace("_file", "_table") + " v WHERE v.id = t.id_value)",
+           "t.id_value") for tag, table, valuelist in multivaluetags + [("Place", "place_file", "PlaceList")]]
+
+
+class DamIntegrity:
+
+    def __init__(self, catalog):
+        # catalog is an opened DamCatalog
+        self.catalog = catalog.catalog
+
+    def _sql(self, clauses):
+        return clauses.format(false=self.catalog.false, epoch=self.catalog.epoch.format("m.creationdatetime"))
+
+    def check(self, samples=SAMPLES):
+        # (name, number of items, number of rows, samples) of each check that found errors; a sample is
+        # (item id, image, broken value)
+        found = []
+        for name, clauses, value in CHECKS:
+            sql = self._sql(clauses)
+            items, rows = self.catalog.fetchone("SELECT COUNT(DISTINCT m.id), COUNT(*) " + sql)
+            if rows == 0:
+                continue
+            sample = []
+            if samples > 0:
+                for img_id, v in self.catalog.fetchall("SELECT m.id, " + value + " " + sql + " ORDER BY m.id, 2 "
+                                                       "LIMIT " + str(int(samples))):
+                    filename, path, err_flag = DamImage._get_filename(self.catalog, img_id)
+                    sample.append((img_id, path + "\\" + filename, v))
+            found.append((name, items, rows, sample))
+        self.catalog.commit()
+        return found
+
+
+def write_integrity(found, outfile):
+    # the report of --integrity
+    outfile.write("Check\tItems\tRows\n")
+    for name, items, rows, sample in found:
+        outfile.write("{}\t{}\t{}\n".format(name, items, rows))
+    for name, items, rows, sample in found:
+        outfile.write("\n{}:\n".format(name))
+        for img_id, image, v in sample:
+            outfile.write("{}\t{}\t{}\n".format(img_id, image, v))
+        if rows > len(sample):
+            outfile.write("…\n")
@@ -0,0 +1,87 @@
+#
+#   Copyright Juha Lintula (juha.v.lintula@gmail.com), 2017
+#
+#
+#
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+#   Memory accounting with tracemalloc: at each checkpoint the live allocations are summed by subsystem, which
+#   is decided by the innermost frame of the allocation in this program: the catalog constant dicts
+#   (DamCatalog), the filter lists and pairs (SessionParams, DamBaseline), the items (DamImage and the other
+#   catalog wrappers) and the report lines and buffers (a write call in any module). The peak of each phase
+#   (since the previous checkpoint) is recorded too.
+
+import linecache
+import os
+import tracemalloc
+
+SUBSYSTEMS = ["constants", "filters", "items", "output", "other"]
+MODULES = {"DamCatalog.py": "constants", "DamBackend.py": "constants",
+           "SessionParams.py": "filters", "DamBaseline.py": "filters",
+           "DamImage.py": "items", "DamColumns.py": "items", "DamAsync.py": "items", "DamSample.py": "items",
+           "DamMoves.py": "items", "DamGeo.py": "items", "DamUnlinked.py": "items"}
+PROGRAMS = ["DamScan.py", "DamCompare.py", "DamBatch.py", "DamSummary.py", "DamPushdown.py", "DamWatch.py"]
+FRAMES = 25         # deep enough to get from the database driver and the standard library to this program
+
+
+def subsystem(traceback):
+    # the subsystem of an allocation, from its innermost frame in this program
+    for frame in reversed(traceback):
+        name = os.path.basename(frame.filename)
+        if name in MODULES or name in PROGRAMS:
+            if ".write(" in linecache.getline(frame.filename, frame.lineno):
+                return "output"
+            return MODULES.get(name, "other")
+    return "other"
+
+
+class DamMemory:
+
+    def __init__(self, frames=FRAMES):
+        self.checkpoints = []       # (label, bytes by subsystem, current, peak)
+        self._started = not tracemalloc.is_tracing()
+        if self._started:
+            tracemalloc.start(frames)
+        self._reset_peak()
+
+    @staticmethod
+    def _reset_peak():
+        if hasattr(tracemalloc, "reset_peak"):      # Python 3.9
+            tracemalloc.reset_peak()
+
+    def checkpoint(self, label):
+        # the live allocations by subsystem and the peak since the previous checkpoint
+        current, peak = tracemalloc.get_traced_memory()
+        snapshot = tracemalloc.take_snapshot().filter_traces([
+            tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, linecache.__file__)])
+        sizes = dict((s, 0) for s in SUBSYSTEMS)
+        for stat in snapshot.statistics("traceback"):
+            sizes[subsystem(stat.traceback)] += stat.size
+        self.checkpoints.append((label, sizes, current, peak))
+        self._reset_peak()
+        return sizes
+
+    @property
+    def peak(self):
+        return max([c[3] for c in self.checkpoints] + [0])
+
+    def stop(self):
+        if self._started and tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+    def write(self, outfile):
+        outfile.write("Memory (KiB)\tPeak\tCurrent\t" + "\t".join(SUBSYSTEMS) + "\n")
+        for label, sizes, current, peak in self.checkpoints:
+            outfile.write("{}\t{:.0f}\t{:.0f}\t".format(label, peak / 1024, current / 1024) +
+                          "\t".join("{:.0f}".format(sizes[s] / 1024) for s in SUBSYSTEMS) + "\n")
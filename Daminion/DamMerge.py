@@ -0,0 +1,160 @@
+#
+#   Copyright Juha Lintula (juha.v.lintula@gmail.com), 2017
+#
+#
+#
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+#   Sorted streams for comparing catalogs larger than memory: the (relativepath, filename, item id) rows of a
+#   catalog in order, so that two catalogs can be merge joined instead of looking each item up in catalog 2.
+#   A server catalog sorts them with ORDER BY (in byte order, the order of Python strings) and they are read
+#   through a server side cursor. The rows of a standalone catalog are sorted here with an external merge
+#   sort: runs of run_size rows are sorted in memory and spilled into temporary files, and the runs are
+#   merged, at most FANIN at a time. The memory use depends on run_size only, not on the catalog size.
+
+import heapq
+import os
+import pickle
+import tempfile
+
+RUN_SIZE = 100000       # rows sorted in memory at a time
+FANIN = 64              # runs merged at a time
+BATCH = 1000            # rows pickled together in a spill file
+
+#   item rows (relativepath, filename, id) of catalog 1, an item without a file row is named like DamImage
+#   names it; the items themselves are checked when they are read
+ITEMS = "SELECT COALESCE(f.relativepath, '<empty>'), COALESCE(f.filename, m.filename), m.id FROM mediaitems m " \
+        "LEFT JOIN files f ON f.id_mediaitem = m.id " \
+        "WHERE COALESCE(m.deleted, {0}) = {0} AND COALESCE(f.filename, m.filename) IS NOT NULL"
+ITEMS_ORDER = " ORDER BY COALESCE(f.relativepath, '<empty>') COLLATE \"C\", COALESCE(f.filename, m.filename) " \
+              "COLLATE \"C\", m.id"
+#   file rows of catalog 2 whose items are not deleted, like get_image_by_name finds them
+FILES = "SELECT f.relativepath, f.filename, f.id_mediaitem FROM files f JOIN mediaitems m ON m.id = f.id_mediaitem " \
+        "WHERE COALESCE(m.deleted, {0}) = {0} AND f.relativepath IS NOT NULL AND f.filename IS NOT NULL"
+FILES_ORDER = ' ORDER BY f.relativepath COLLATE "C", f.filename COLLATE "C", f.id_mediaitem'
+
+
+def _spill(rows):
+    # writes the rows into a temporary file and returns its name, the file is removed when it is read
+    fd, name = tempfile.mkstemp(prefix="damsort")
+    with os.fdopen(fd, "wb") as f:
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= BATCH:
+                pickle.dump(batch, f, pickle.HIGHEST_PROTOCOL)
+                batch = []
+        if batch != []:
+            pickle.dump(batch, f, pickle.HIGHEST_PROTOCOL)
+    return name
+
+
+def _read(name):
+    try:
+        with open(name, "rb") as f:
+            while True:
+                try:
+                    batch = pickle.load(f)
+                except EOFError:
+                    return
+                yield from batch
+    finally:
+        os.remove(name)
+
+
+def external_sort(rows, run_size=RUN_SIZE, fanin=FANIN):
+    # the rows in sorted order, spilling sorted runs of run_size rows into temporary files; the runs are kept
+    # in levels and fanin runs of a level are merged into one run of the next level, so that the number of
+    # runs waiting to be merged grows only with the logarithm of the number of rows
+    levels = [[]]
+    try:
+        run = []
+        for row in rows:
+            run.append(row)
+            if len(run) >= run_size:
+                run.sort()
+                levels[0].append(_spill(run))
+                run = []
+                for k, level in enumerate(levels):
+                    if len(level) < fanin:
+                        break
+                    if k + 1 == len(levels):
+                        levels.append([])
+                    levels[k + 1].append(_spill(heapq.merge(*[_read(name) for name in level])))
+                    del level[:]
+        run.sort()
+        if levels == [[]]:
+            yield from run
+            return
+        if run != []:
+            levels[0].append(_spill(run))
+        run = None
+        runs = [name for level in levels for name in level]
+        levels = [runs]
+        while len(runs) > fanin:
+            runs[:fanin] = [_spill(heapq.merge(*[_read(name) for name in runs[:fanin]]))]
+        yield from heapq.merge(*[_read(name) for name in runs])
+    finally:
+        for level in levels:
+            for name in level:
+                if os.path.exists(name):
+                    os.remove(name)
+
+
+def sorted_rows(catalog, sql, order, run_size=RUN_SIZE):
+    # the rows of sql (relativepath, filename, id) of a DamCatalog, sorted; order is the ORDER BY clause
+    # for a server catalog
+    backend = catalog.catalog
+    if backend.dialect == "sqlite":
+        cur = backend.cursor()
+        cur.execute(sql.format(backend.false))
+        try:
+            yield from external_sort(cur, run_size)
+        finally:
+            cur.close()
+    else:
+        cur = backend.stream()
+        cur.execute(sql.format(backend.false) + order)
+        try:
+            for row in cur:
+                yield tuple(row)
+        finally:
+            cur.close()
+
+
+def items(catalog, run_size=RUN_SIZE):
+    return sorted_rows(catalog, ITEMS, ITEMS_ORDER, run_size)
+
+
+def files(catalog, run_size=RUN_SIZE):
+    return sorted_rows(catalog, FILES, FILES_ORDER, run_size)
+
+
+def merge_join(rows1, rows2):
+    # (path, name, id of catalog 1, id of catalog 2 or None) for the rows of catalog 1; with several rows for
+    # the same file in catalog 2 the one with the smallest id is given
+    rows2 = iter(rows2)
+    row2 = next(rows2, None)
+    previous = None
+    for row1 in rows1:
+        if row1 == previous:
+            continue
+        previous = row1
+        key = row1[:2]
+        while row2 is not None and row2[:2] < key:
+            row2 = next(rows2, None)
+        if row2 is not None and row2[:2] == key:
+            yield row1[0], row1[1], row1[2], row2[2]
+        else:
+            yield row1[0], row1[1], row1[2], None
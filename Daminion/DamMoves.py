@@ -0,0 +1,65 @@
+#
+#   Copyright Juha Lintula (juha.v.lintula@gmail.com), 2017
+#
+#
+#
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+#   Moved files: the items of catalog 1 that are not found in catalog 2 by (relativepath, filename) are looked
+#   up in a hashed index of catalog 2 keyed by (filename, creation time in seconds) and optionally the file
+#   size. The index is read with one query, the items of catalog 2 that were already matched by path are
+#   left out, and an item is paired only when exactly one candidate is left for it.
+
+from Daminion.DamImage import INVALID_TIME
+
+
+class MoveIndex:
+
+    def __init__(self, catalog, size=False, matched=()):
+        # catalog is catalog 2, matched the ids of its items that were found by path
+        self.catalog = catalog
+        self.size = size
+        self._index = {}
+        cur = catalog.catalog.cursor()
+        cur.execute("SELECT f.id_mediaitem, f.filename, f.relativepath, f.filesize, " +
+                    catalog.catalog.epoch.format("m.creationdatetime") + ", m.deleted "
+                    "FROM files f JOIN mediaitems m ON m.id = f.id_mediaitem")
+        for img_id, name, path, filesize, ctime, deleted in cur:
+            if bool(deleted) or img_id in matched:
+                continue
+            key = self._key(name, INVALID_TIME if ctime is None else ctime, filesize)
+            if key is not None:
+                self._index.setdefault(key, []).append((img_id, path, name))
+        cur.close()
+
+    def _key(self, name, seconds, filesize):
+        if seconds == INVALID_TIME:
+            return None
+        if self.size:
+            return name, seconds, filesize
+        return name, seconds
+
+    def _filesize(self, img):
+        row = img._db.catalog.fetchone("SELECT filesize FROM files WHERE id_mediaitem = ?", (img._id, ))
+        return None if row is None else row[0]
+
+    def find(self, img, session):
+        # the item of catalog 2 that img was moved to, or None; each item of catalog 2 is given only once
+        key = self._key(img._ImageName, img.ctime,
+                        self._filesize(img) if self.size else None)
+        candidates = self._index.get(key, [])
+        if len(candidates) != 1:
+            return None
+        img_id, path, name = candidates.pop()
+        return self.catalog.image_by_name(path, name, session)
@@ -0,0 +1,137 @@
+#
+#   Copyright Juha Lintula (juha.v.lintula@gmail.com), 2017
+#
+#
+#
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+#   Multi-value tag differences of linked (or stacked) items computed in the database. For every pair
+#   (a, b) of mediaitems_link, one anti-join query per tag category returns the values of b that a
+#   doesn't have and vice versa. The deleted/image checks and the -x/-y value filter are part of the
+#   query, so only the differences are streamed back and formatted like DamImage.SameMultiValueTags.
+#   The value ids missing from the value table are all mapped to MISSING, as DamImage shows them all as
+#   –ERROR–. The lines are written after those of the other tags, ordered by tag category, item, direction
+#   and other item, not in the order of the item by item scan.
+
+from Daminion.DamImage import DamImage, imagefiletypekey
+
+#   tag category, assignment table, value list in DamCatalog
+multivaluetags = {"People": ("people_file", "PeopleList"),
+                  "Keywords": ("keywords_file", "KeywordList"),
+                  "Categories": ("categories_file", "CategoryList"),
+                  "Collections": ("systemcollection_file", "CollectionList")}
+
+MISSING = -1        # the value id of the values missing from the value table
+
+
+class DamPushdown:
+
+    @staticmethod
+    def _in_list(column, ids, negate=False):
+        if ids == []:
+            return "1 = 1" if negate else "1 = 0"
+        return column + (" NOT IN (" if negate else " IN (") + ", ".join(str(i) for i in sorted(ids)) + ")"
+
+    def __init__(self, catalog):
+        # catalog is an opened DamCatalog (or DamColumns) with initialized constants
+        self._db = catalog
+        self.catalog = catalog.catalog
+        self._false = self.catalog.false
+
+    def _valid(self, alias):
+        # SQL condition for DamImage.isvalid: not deleted and media format is an image
+        formats = [i for i, key in self._db.MediaList.items() if key in imagefiletypekey]
+        return "COALESCE(" + alias + ".deleted, " + self._false + ") = " + self._false + " AND " + \
+            self._in_list(alias + ".id_mediaformat", formats)
+
+    def _value_filter(self, tag, filter_list):
+        # the values that DamImage.SameMultiValueTags would skip: filtered by -x/-y or empty
+        valuelist = getattr(self._db, multivaluetags[tag][1])
+        skipped = [i for i, v in valuelist.items() if v == "" or filter_list.has_option(tag, v)]
+        if filter_list.has_option(tag, "–ERROR–"):      # values that are missing from the value list
+            kept = set(valuelist) - set(skipped)
+            return self._in_list("t.id_value", list(kept))
+        return self._in_list("t.id_value", skipped, negate=True)
+
+    def pairs(self, group):
+        # one row per link (or stack member - top item), duplicate link rows are reported once
+        if group:
+            pairs = "SELECT DISTINCT id AS a, id_topmediaitemstack AS b FROM mediaitems"
+        else:
+            pairs = "SELECT DISTINCT id_frommediaitem AS a, id_tomediaitem AS b FROM mediaitems_link"
+        return "(SELECT p.a, p.b FROM (" + pairs + ") p " \
+               "JOIN mediaitems ma ON ma.id = p.a JOIN mediaitems mb ON mb.id = p.b " \
+               "WHERE p.a <> p.b AND " + self._valid("ma") + " AND " + self._valid("mb") + ")"
+
+    def query(self, tag, filter_list, group, order=True):
+        # rows (item, direction, other item, value): value of the other item that the item is missing
+        table = multivaluetags[tag][0]
+        value_filter = self._value_filter(tag, filter_list)
+        pairs = self.pairs(group)
+        value = "CASE WHEN EXISTS (SELECT 1 FROM " + table.replace("_file", "_table") + " v " \
+                "WHERE v.id = {0}.id_value) THEN {0}.id_value ELSE " + str(MISSING) + " END"
+        part = "SELECT p.{0} AS item, {2} AS dir, p.{1} AS other, " + value.format("t") + " AS value " \
+               "FROM " + pairs + " p JOIN " + table + " t ON t.id_mediaitem = p.{1} " \
+               "WHERE " + value_filter + " AND NOT EXISTS (SELECT 1 FROM " + table + " m " \
+               "WHERE m.id_mediaitem = p.{0} AND " + value.format("m") + " = " + value.format("t") + ")"
+        sql = part.format("a", "b", 0) + " UNION ALL " + part.format("b", "a", 1)
+        if order:
+            sql += " ORDER BY 1, 2, 3, 4"
+        return sql
+
+    def names(self, group):
+        # (filename, relativepath) of the items in the pairs, like DamImage._get_filename
+        pairs = self.pairs(group)
+        cur = self.catalog.stream()
+        cur.execute("SELECT m.id, m.filename, f.filename, f.relativepath "
+                    "FROM (SELECT a AS id FROM " + pairs + " p UNION SELECT b FROM " + pairs + " q) i "
+                    "JOIN mediaitems m ON m.id = i.id LEFT JOIN files f ON f.id_mediaitem = m.id")
+        names = {}
+        for img_id, itemname, filename, path in cur:
+            if img_id not in names:
+                if filename is None:
+                    names[img_id] = ("<empty>" if itemname is None else itemname, "<empty>")
+                else:
+                    names[img_id] = (filename, path)
+        cur.close()
+        return names
+
+    def ScanTags(self, session, taglist):
+        names = self.names(session.group)
+
+        def image_name(img_id):
+            return DamImage.format_name(session, names[img_id][1], names[img_id][0], img_id)
+
+        for tag in taglist:
+            valuelist = getattr(self._db, multivaluetags[tag][1])
+            cur = self.catalog.stream()     # a server side cursor is used for one query
+            cur.execute(self.query(tag, session.filter_list, session.group))
+            key = None
+            line = ""
+            for item, direction, other, value in cur:
+                tagvalue = valuelist.get(value, "–ERROR–")
+                if (tag, item, other, tagvalue) in session.filter_pairs:
+                    continue
+                if key != (item, direction, other):
+                    if line != "":
+                        session.outfile.write(line + "\n")
+                    key = (item, direction, other)
+                    line = image_name(item) + "\t" + "><"[direction] + "\t" + image_name(other) + "\t" + tag + "\t"
+                else:
+                    line += ", "
+                line += "'" + tagvalue + "'"
+            if line != "":
+                session.outfile.write(line + "\n")
+            cur.close()
+        self.catalog.commit()
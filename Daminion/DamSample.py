@@ -0,0 +1,137 @@
+#
+#   Copyright Juha Lintula (juha.v.lintula@gmail.com), 2017
+#
+#
+#
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+#   Sampling mode: a random sample of the (not deleted) items is checked as usual, and the share of the items
+#   with findings is reported per tag category with a 95% confidence interval, as an estimate for the whole
+#   catalog. On a server catalog the sample is taken with TABLESAMPLE BERNOULLI, on a standalone catalog it
+#   is drawn from the ids of the not deleted items, read with one query (8 bytes per item), and only the
+#   sampled items are read further.
+#   The same seed gives the same sample of an unchanged catalog.
+
+import math
+import random
+from array import array
+
+from Daminion.DamImage import DamImage, get_image_by_name
+
+Z95 = 1.959964
+
+
+def wilson(k, n, population=None, z=Z95):
+    # Wilson score interval of the proportion k/n, narrowed by the finite population correction
+    if n == 0:
+        return 0.0, 1.0
+    p = k / n
+    d = 1 + z * z / n
+    centre = (p + z * z / (2 * n)) / d
+    half = z * math.sqrt(p * (1 - p) / n + z * z / (4 * n * n)) / d
+    if population is not None and n >= population:
+        return p, p
+    if population is not None and population > 1:
+        half *= math.sqrt((population - n) / (population - 1))
+    return min(p, max(0.0, centre - half)), max(p, min(1.0, centre + half))
+
+
+class DamSample:
+
+    def __init__(self, catalog, size=None, fraction=None, seed=None):
+        # catalog is an opened DamCatalog with initialized constants; either size or fraction is given
+        self._source = catalog
+        self.catalog = catalog.catalog
+        self._dbname = catalog._dbname
+        self._counter = 0
+        self.MediaList = catalog.MediaList
+        self.EventList = catalog.EventList
+        self.PlaceList = catalog.PlaceList
+        self.PeopleList = catalog.PeopleList
+        self.KeywordList = catalog.KeywordList
+        self.CategoryList = catalog.CategoryList
+        self.CollectionList = catalog.CollectionList
+        if seed is None:
+            seed = random.randrange(1 << 31)
+        self.seed = seed
+        self.ids = []
+        self.population = 0
+        if self.catalog.dialect == "postgresql":
+            self._tablesample(size, fraction)
+        else:
+            self._idlist(size, fraction)
+
+    def _tablesample(self, size, fraction):
+        # the row count estimate of the planner is enough for choosing the sampling percentage
+        rows = self.catalog.fetchone("SELECT reltuples FROM pg_class WHERE relname = 'mediaitems'")
+        total = 0 if rows is None else int(rows[0])
+        if total <= 0:
+            total = self.catalog.fetchone("SELECT count(*) FROM mediaitems")[0]
+        if size is not None:
+            percent = min(100.0, 100.0 * 1.1 * size / max(total, 1))     # 10 % extra for the deleted items
+        else:
+            percent = min(100.0, 100.0 * fraction)
+        rows = self.catalog.fetchall("SELECT id, deleted FROM mediaitems TABLESAMPLE BERNOULLI (?) REPEATABLE (?)",
+                                     (percent, self.seed))
+        self.catalog.commit()
+        ids = [row[0] for row in rows if not bool(row[1])]
+        if rows != []:
+            self.population = round(total * len(ids) / len(rows))
+        if size is not None and len(ids) > size:
+            ids = random.Random(self.seed).sample(ids, size)
+        self.ids = sorted(ids)
+
+    def _not_deleted(self):
+        # a NULL deleted column is not deleted, as bool(None) in the scan
+        return "COALESCE(deleted, {0}) = {0}".format(self.catalog.false)
+
+    def _idlist(self, size, fraction):
+        # a sample of the ids of the not deleted items, read in one query instead of one query per drawn id
+        valid = array('q')
+        cur = self.catalog.stream()
+        cur.execute("SELECT id FROM mediaitems WHERE " + self._not_deleted() + " ORDER BY id")
+        for row in cur:
+            valid.append(row[0])
+        cur.close()
+        self.catalog.commit()
+        self.population = len(valid)
+        if size is None:
+            size = round(fraction * self.population)
+        size = min(size, self.population)
+        self.ids = sorted(random.Random(self.seed).sample(valid, size))
+
+    def image_by_name(self, path, name, session):
+        return get_image_by_name(path, name, self, session)
+
+    @staticmethod
+    def NextImage(cat, session, verbose=0):
+        for img_id in cat.ids:
+            cat._counter += 1
+            img = DamImage(img_id, cat, session)
+            if verbose > 0:
+                print("\r", "{:7} {:7}: {:60}".format(cat._counter, img_id, img.ImageName), end="", flush=True)
+            yield img
+
+
+def write_estimates(counts, checked, sample, outfile, taglist):
+    # counts: items with findings by tag category, checked: the number of sampled items that were checked
+    outfile.write("Sample of {} items of {} (seed {}), {} checked\n".format(len(sample.ids), sample.population,
+                                                                            sample.seed, checked))
+    outfile.write("Tag\tItems\tRate\t95% CI\tEstimated items\n")
+    scale = sample.population * checked / max(len(sample.ids), 1)      # the catalog items that would be checked
+    for tag in list(taglist) + sorted(set(counts) - set(taglist)):
+        low, high = wilson(counts[tag], checked, round(scale))
+        outfile.write("{}\t{}\t{:.2%}\t{:.2%}–{:.2%}\t{}–{}\n".format(tag, counts[tag], counts[tag] / max(checked, 1),
+                                                                     low, high, math.floor(low * scale),
+                                                                     math.ceil(high * scale)))
@@ -0,0 +1,253 @@
+#
+#   Copyright Juha Lintula (juha.v.lintula@gmail.com), 2017
+#
+#
+#
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+#   Serve mode: a local HTTP server that keeps the catalog open with its constants and filter lists and
+#   checks single items on request, so that plugins and review tools do not have to start DamScan.py for
+#   each item. The requests are
+#     GET /check?id=N         the findings of item N against its linked (or stacked) items, as CheckImage
+#     GET /component?id=N     the findings of all items of the link/stack component of item N
+#     GET /health             the catalog name and the size of the index
+#   and the answer is a JSON object with the findings as records. Each request is handled in its own thread
+#   and borrows a connection from a pool, so concurrent requests do not wait for each other. The items are
+#   read with the per-item queries of DamImage (prepared once per connection) as in a scan; an index of the
+#   links and stacks kept in memory only finds the items of /component. The index and the constants are
+#   read again into new objects, which are swapped in when complete, so the requests meanwhile use the old
+#   ones: on a standalone catalog when PRAGMA data_version shows a change, on a server catalog every max_age
+#   seconds in a background thread, so a change is seen by the requests up to max_age seconds late.
+
+import copy
+import io
+import json
+import queue
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+from Daminion.DamImage import DamImage, get_image_by_name
+from Daminion.SessionParams import SessionParams
+
+CONSTANTS = ["MediaList", "EventList", "PlaceList", "PeopleList", "KeywordList", "CategoryList", "CollectionList"]
+
+
+def record(line):
+    # a report line as a JSON record
+    p = line.rstrip("\n").split("\t")
+    return {"a": p[0], "a_id": SessionParams._get_item_id(p[0]), "dir": p[1] if len(p) > 1 else "",
+            "b": p[2] if len(p) > 2 else "", "b_id": SessionParams._get_item_id(p[2]) if len(p) > 2 else None,
+            "tag": p[3] if len(p) > 3 else "", "values": p[4:]}
+
+
+class _View:
+    # what DamImage needs from a catalog: a connection of the pool and the constant lists
+    def __init__(self, catalog, conn):
+        self.catalog = conn
+        self._dbname = catalog._dbname
+        self._generation = None
+
+    def image_by_name(self, path, name, session):
+        return get_image_by_name(path, name, self, session)
+
+
+class DamServer:
+
+    def __init__(self, catalog, session, check, pool_size=4, max_age=5.0, verbose=0):
+        # catalog is an opened DamCatalog with initialized constants, session the template of the request
+        # sessions and check(img, session, verbose) writes the findings of one item into session.outfile
+        self._source = catalog
+        self.catalog = catalog.catalog
+        self._dbname = catalog._dbname
+        self.session = session
+        self.check = check
+        self.max_age = max_age
+        self.verbose = verbose
+        self._lock = threading.Lock()           # the swap of the index and constants
+        self._reading = threading.Lock()        # the main connection, one reread at a time
+        self._generation = 0
+        self._version = None
+        self._constants = {}
+        self._links = {}        # item id: items linked to it in either direction
+        self._tops = {}         # item id: top item of its stack
+        self._stacks = {}       # top item: items of the stack
+        self._stop = threading.Event()
+        self._refresher = None
+        self._pool = queue.Queue()
+        self._views = [_View(catalog, catalog.connect()) for i in range(max(1, pool_size))]
+        for view in self._views:
+            self._pool.put(view)
+        self.httpd = None
+        self.refresh()
+
+    def close(self):
+        self._stop.set()
+        if self._refresher is not None:
+            self._refresher.join()
+            self._refresher = None
+        if self.httpd is not None:
+            self.httpd.server_close()
+            self.httpd = None
+        for view in self._views:
+            view.catalog.close()
+        self._views = []
+
+    def _read_index(self):
+        links, tops, stacks = {}, {}, {}
+        curs = self.catalog.cursor()
+        curs.execute("SELECT id_frommediaitem, id_tomediaitem FROM mediaitems_link")
+        for a, b in curs:
+            links.setdefault(a, set()).add(b)
+            links.setdefault(b, set()).add(a)
+        curs.execute("SELECT id, id_topmediaitemstack FROM mediaitems")
+        for img_id, top in curs:
+            tops[img_id] = top
+            stacks.setdefault(top, set()).add(img_id)
+        curs.close()
+        return links, tops, stacks
+
+    def refresh(self):
+        # read the index and the constants again if the catalog may have changed, the requests use the old
+        # ones until the new ones are complete
+        with self._reading:
+            version = self.catalog.data_version()
+            if version is not None and version == self._version:
+                return False
+            if self._generation > 0:
+                self._source.initCatalogConstants()
+            constants = dict((c, getattr(self._source, c)) for c in CONSTANTS)
+            links, tops, stacks = self._read_index()
+            self.catalog.commit()
+            with self._lock:
+                self._constants = constants
+                self._links, self._tops, self._stacks = links, tops, stacks
+                self._version = version
+                self._generation += 1
+            return True
+
+    def _refresh_loop(self):
+        # a server catalog has no change counter, it is read again every max_age seconds
+        while not self._stop.wait(self.max_age):
+            try:
+                self.refresh()
+            except Exception as error:
+                sys.stderr.write("* Warning: the catalog could not be read again: {}\n".format(error))
+
+    def component(self, img_id):
+        # sorted ids of the link (or with group stack) component of img_id
+        with self._lock:
+            links, tops, stacks = self._links, self._tops, self._stacks
+        members = {img_id}
+        todo = [img_id]
+        while todo != []:
+            i = todo.pop()
+            if self.session.group:
+                found = stacks.get(i, set()) | {tops.get(i)} - {None}
+            else:
+                found = links.get(i, set())
+            for f in found:
+                if f not in members:
+                    members.add(f)
+                    todo.append(f)
+        return sorted(members)
+
+    def _checkout(self):
+        view = self._pool.get()
+        with self._lock:
+            if view._generation != self._generation:
+                for c in CONSTANTS:
+                    setattr(view, c, self._constants[c])
+                view._generation = self._generation
+        return view
+
+    def findings(self, ids):
+        # the report lines of the items, None if the first one does not exist or is deleted
+        session = copy.copy(self.session)
+        session.outfile = io.StringIO()
+        view = self._checkout()
+        try:
+            for n, img_id in enumerate(ids):
+                img = DamImage(img_id, view, session)
+                if n == 0 and img.IsDeleted:
+                    return None
+                self.check(img, session, 0)
+        finally:
+            view.catalog.commit()
+            self._pool.put(view)
+        return session.outfile.getvalue().splitlines()
+
+    def handle(self, path, query):
+        # status and JSON object of a request
+        if path == "/health":
+            return 200, {"catalog": self._dbname, "items": len(self._tops), "links": len(self._links),
+                         "generation": self._generation}
+        if path not in ["/check", "/component"]:
+            return 404, {"error": "unknown request " + path}
+        try:
+            img_id = int(query["id"][0])
+        except (KeyError, ValueError):
+            return 400, {"error": "id=N expected"}
+        start = time.perf_counter()
+        if self._version is not None:
+            self.refresh()
+        ids = [img_id]
+        if path == "/component":
+            ids = [img_id] + [i for i in self.component(img_id) if i != img_id]
+        lines = self.findings(ids)
+        if lines is None:
+            return 404, {"error": "item {} does not exist or is deleted".format(img_id)}
+        return 200, {"id": img_id, "items": sorted(ids), "records": [record(line) for line in lines],
+                     "ms": round((time.perf_counter() - start) * 1000, 1)}
+
+    def start(self, port=0, host="127.0.0.1"):
+        # binds the server, port 0 picks a free port
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                try:
+                    status, answer = server.handle(url.path, parse_qs(url.query))
+                except Exception as error:
+                    status, answer = 500, {"error": str(error)}
+                body = json.dumps(answer).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                if server.verbose > 0:
+                    sys.stderr.write("{} {}\n".format(self.address_string(), format % args))
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+        if self._version is None and self._refresher is None:
+            self._refresher = threading.Thread(target=self._refresh_loop, daemon=True)
+            self._refresher.start()
+        return self.httpd.server_address[1]
+
+    def run(self, port=0):
+        port = self.start(port)
+        if self.verbose > 0:
+            print("Serving {} on http://127.0.0.1:{}/".format(self._dbname, port))
+        try:
+            self.httpd.serve_forever()
+        finally:
+            self.close()
@@ -0,0 +1,156 @@
+#
+#   Copyright Juha Lintula (juha.v.lintula@gmail.com), 2017
+#
+#
+#
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+#   Catalog snapshot: the arrays of a DamColumns catalog in one file, so that the scans can be run without
+#   the database. The file starts with a magic string and a JSON header (the catalog constants and the
+#   offset, type and length of each section), followed by the sections aligned to 8 bytes. A section is a
+#   fixed width array; a list of strings is two sections, the end offsets of the strings and their UTF-8
+#   bytes. The file is memory mapped when it is opened and the arrays are memoryviews into the mapping, so
+#   nothing is read before it is used. A snapshot written on a machine of the other byte order is copied
+#   and byte swapped when it is opened.
+
+import json
+import mmap
+import os
+import sys
+from array import array
+
+from Daminion.DamImage import PlaceTable
+from Daminion.DamColumns import DamColumns, multivaluetags
+
+MAGIC = b"DAMSNAP1"
+VERSION = 1
+
+#   attribute, type code of the fixed width arrays of DamColumns
+ARRAYS = [("ids", "i"), ("deleted", "b"), ("event", "i"), ("mediaformat", "i"), ("ctime", "q"), ("top", "i"),
+          ("path", "i"), ("gps", "d"), ("isimage", "B")]
+STRINGS = ["names", "paths", "title", "description", "comments"]
+CSR = ["links_to", "links_from", "stack"]
+TAGS = [tag for tag, table, valuelist in multivaluetags] + ["Place"]
+CONSTANTS = ["MediaList", "EventList", "PlaceList", "PeopleList", "KeywordList", "CategoryList", "CollectionList"]
+
+
+class StringTable:
+    # read-only list of the strings of a snapshot, decoded on access
+
+    def __init__(self, ends, data):
+        self._ends = ends
+        self._data = data
+
+    def __len__(self):
+        return len(self._ends)
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += len(self._ends)
+        start = self._ends[i - 1] if i > 0 else 0
+        return str(self._data[start:self._ends[i]], "utf-8")
+
+
+class DamSnapshot(DamColumns):
+
+    @staticmethod
+    def is_snapshot(name):
+        if name is None or not os.path.isfile(name):
+            return False
+        with open(name, "rb") as f:
+            return f.read(len(MAGIC)) == MAGIC
+
+    @staticmethod
+    def _sections(columns):
+        # name: array of the sections of a DamColumns catalog
+        sections = {}
+        for attr, code in ARRAYS:
+            sections[attr] = array(code, getattr(columns, attr))
+        for attr in STRINGS:
+            ends = array('q')
+            data = bytearray()
+            for s in getattr(columns, attr):
+                data += s.encode("utf-8")
+                ends.append(len(data))
+            sections[attr + ".ends"] = ends
+            sections[attr + ".data"] = array('B', data)
+        for attr in CSR:
+            offsets, values = getattr(columns, attr)
+            sections[attr + ".offsets"] = array('q', offsets)
+            sections[attr + ".values"] = array('i', values)
+        for tag in TAGS:
+            offsets, values = columns.tags[tag]
+            sections["tags." + tag + ".offsets"] = array('q', offsets)
+            sections["tags." + tag + ".values"] = array('i', values)
+        return sections
+
+    @staticmethod
+    def export(columns, filename):
+        # writes the DamColumns catalog columns into filename
+        sections = DamSnapshot._sections(columns)
+        header = {"version": VERSION, "byteorder": sys.byteorder, "dbname": columns._dbname, "sections": {},
+                  "constants": dict((c, [[k, v] for k, v in getattr(columns, c).items()]) for c in CONSTANTS)}
+        offset = 0
+        for name, values in sections.items():
+            header["sections"][name] = [values.typecode, offset, len(values)]
+            offset += (len(values) * values.itemsize + 7) // 8 * 8
+        text = json.dumps(header).encode("utf-8")
+        start = (len(MAGIC) + 8 + len(text) + 7) // 8 * 8
+        with open(filename, "wb") as f:
+            f.write(MAGIC + len(text).to_bytes(8, "little") + text)
+            f.write(bytes(start - f.tell()))
+            for name, values in sections.items():
+                f.write(values.tobytes())
+                f.write(bytes(-f.tell() % 8))
+
+    def _section(self, name):
+        code, offset, length = self._header["sections"][name]
+        start = self._start + offset
+        view = self._map[start:start + length * array(code).itemsize]
+        if self._header["byteorder"] != sys.byteorder:
+            values = array(code, bytes(view))
+            values.byteswap()
+            return values
+        return view.cast(code)
+
+    def __init__(self, filename):
+        self._source = None
+        self.catalog = None         # there is no database behind a snapshot
+        self._dbname = filename
+        self._counter = 0
+        with open(filename, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._map = memoryview(self._mmap)
+        length = int.from_bytes(self._map[len(MAGIC):len(MAGIC) + 8], "little")
+        self._header = json.loads(str(self._map[len(MAGIC) + 8:len(MAGIC) + 8 + length], "utf-8"))
+        if self._header["version"] != VERSION:
+            sys.stderr.write("{} is a snapshot of version {}, {} expected\n".format(filename,
+                                                                                 self._header["version"], VERSION))
+            sys.exit(-1)
+        self._start = (len(MAGIC) + 8 + length + 7) // 8 * 8
+        for c in CONSTANTS:
+            setattr(self, c, dict((k, tuple(v) if isinstance(v, list) else v)
+                                  for k, v in self._header["constants"][c]))
+        self.PlaceList = PlaceTable(self.PlaceList)
+
+        for attr, code in ARRAYS:
+            setattr(self, attr, self._section(attr))
+        for attr in STRINGS:
+            setattr(self, attr, StringTable(self._section(attr + ".ends"), self._section(attr + ".data")))
+        for attr in CSR:
+            setattr(self, attr, (self._section(attr + ".offsets"), self._section(attr + ".values")))
+        self.tags = dict((tag, (self._section("tags." + tag + ".offsets"), self._section("tags." + tag + ".values")))
+                         for tag in TAGS)
+        self._path_index = None
+        self._keys = {}
@@ -0,0 +1,175 @@
+#
+#   Copyright Juha Lintula (juha.v.lintula@gmail.com), 2017
+#
+#
+#
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+#   Summary mode: the number of report lines per folder and tag category, without creating the items or the
+#   report lines. The database finds the linked (or stacked) pairs whose tags differ: multi-value tags are
+#   counted with the anti-join queries of DamPushdown, the single value tags are compared column by column.
+#   Only the differing pairs come back (for Place all pairs and the place rows, as the place string is made
+#   of several rows), and the checks that need the value strings (-x/-y, -a, GPS tolerances, -b) are done
+#   for them in Python before they are counted.
+
+import json
+from collections import Counter
+from types import SimpleNamespace
+
+from Daminion.DamImage import DamImage
+from Daminion.DamPushdown import DamPushdown, multivaluetags
+
+#   tag category: differing pairs (a, b, values of a, values of b)
+singlevaluetags = {
+    "Event": "SELECT p.a, p.b, ma.id_event, mb.id_event FROM {0} p "
+             "JOIN mediaitems ma ON ma.id = p.a JOIN mediaitems mb ON mb.id = p.b "
+             "WHERE COALESCE(ma.id_event, -1) <> COALESCE(mb.id_event, -1)",
+    "Place": "SELECT p.a, p.b FROM {0} p",        # the place strings are compared in Python
+    "GPS": "SELECT p.a, p.b, ia.gpslatitude, ia.gpslongitude, ia.gpsaltitude, "
+           "ib.gpslatitude, ib.gpslongitude, ib.gpsaltitude FROM {0} p "
+           "LEFT JOIN image ia ON ia.id_mediaitem = p.a LEFT JOIN image ib ON ib.id_mediaitem = p.b "
+           "WHERE COALESCE(ia.gpslatitude, 0) <> COALESCE(ib.gpslatitude, 0) "
+           "OR COALESCE(ia.gpslongitude, 0) <> COALESCE(ib.gpslongitude, 0) "
+           "OR COALESCE(ia.gpsaltitude, 0) <> COALESCE(ib.gpsaltitude, 0)",
+}
+for _tag, _column in [("Title", "title"), ("Description", "description"), ("Comments", "comments")]:
+    singlevaluetags[_tag] = "SELECT p.a, p.b, sa." + _column + ", sb." + _column + " FROM {0} p " \
+                            "LEFT JOIN subject sa ON sa.id_mediaitem = p.a " \
+                            "LEFT JOIN subject sb ON sb.id_mediaitem = p.b " \
+                            "WHERE COALESCE(sa." + _column + ", '') <> COALESCE(sb." + _column + ", '')"
+
+
+class DamSummary(DamPushdown):
+
+    def __init__(self, catalog):
+        DamPushdown.__init__(self, catalog)
+        self._names = {}
+
+    def _folder(self, img_id):
+        return self._names[img_id][1]
+
+    def _multi(self, counts, tag, session):
+        sql = self.query(tag, session.filter_list, session.group, order=False)
+        cur = self.catalog.cursor()
+        if tag in session.filter_pairs.keys():
+            # acknowledged values are checked one by one, a line is counted if any of its values is left
+            valuelist = getattr(self._db, multivaluetags[tag][1])
+            lines = set()
+            cur.execute(sql)
+            for item, direction, other, value in cur:
+                if (tag, item, other, valuelist.get(value, "–ERROR–")) not in session.filter_pairs:
+                    lines.add((item, direction, other))
+            for item, direction, other in lines:
+                counts[(self._folder(item), tag)] += 1
+        else:
+            cur.execute("SELECT item, count(*) FROM (SELECT DISTINCT item, dir, other FROM (" + sql + ") d) l "
+                        "GROUP BY item")
+            for item, n in cur:
+                counts[(self._folder(item), tag)] += n
+        cur.close()
+
+    def _places(self):
+        # place strings like DamImage._get_place
+        cur = self.catalog.cursor()
+        cur.execute("SELECT id_mediaitem, id_value FROM place_file")
+        values = {}
+        for img_id, value in cur:
+            if img_id in self._names:
+                values.setdefault(img_id, []).append(value)
+        cur.close()
+        return dict((img_id, self._db.PlaceList.place(tuple(sorted(v)))[1]) for img_id, v in values.items())
+
+    def _single(self, counts, tag, session):
+        cur = self.catalog.cursor()
+        cur.execute(singlevaluetags[tag].format(self.pairs(session.group)))
+        rows = cur.fetchall()
+        cur.close()
+        if tag == "Place" and rows != []:
+            places = self._places()
+        for row in rows:
+            a, b = row[0], row[1]
+            if tag == "Event":
+                mytag = self._db.EventList.get(row[2], "–ERROR–")
+                othertag = self._db.EventList.get(row[3], "–ERROR–")
+            elif tag == "Place":
+                mytag = places.get(a, "")
+                othertag = places.get(b, "")
+            elif tag == "GPS":
+                me = SimpleNamespace(lat=float(row[2] or 0.0), long=float(row[3] or 0.0), alt=float(row[4] or 0.0))
+                other = SimpleNamespace(lat=float(row[5] or 0.0), long=float(row[6] or 0.0),
+                                        alt=float(row[7] or 0.0))
+                mytag = "{}N {}E {}m".format(me.lat, me.long, me.alt)
+                othertag = "{}N {}E {}m".format(other.lat, other.long, other.alt)
+            else:
+                mytag = DamImage._none_to_str(row[2])
+                othertag = DamImage._none_to_str(row[3])
+            if mytag == othertag or (tag, a, b) in session.filter_pairs or \
+                    session.filter_list.has_option(tag, mytag) or session.filter_list.has_option(tag, othertag):
+                continue
+            if tag == "GPS":
+                lat_dist, alt_dist = DamImage.image_dist(me, other)
+                if lat_dist <= session.dist_tolerance and alt_dist <= session.alt_tolerance:
+                    continue
+            counts[(self._folder(a), tag)] += 1
+
+    def _basenames(self, counts, session):
+        # -b: the name is compared in both directions
+        cur = self.catalog.cursor()
+        cur.execute("SELECT a, b FROM " + self.pairs(session.group) + " p")
+        for a, b in cur:
+            if DamImage.base_name(self._names[a][0], session.comp_name) != \
+                    DamImage.base_name(self._names[b][0], session.comp_name):
+                if ("Name", a, b) not in session.filter_pairs:
+                    counts[(self._folder(a), "Name")] += 1
+                if ("Name", b, a) not in session.filter_pairs:
+                    counts[(self._folder(b), "Name")] += 1
+        cur.close()
+
+    def ScanSummary(self, session):
+        # Counter of report lines by (folder, tag category)
+        counts = Counter()
+        self._names = self.names(session.group)
+        if session.comp_name is not None:
+            self._basenames(counts, session)
+        for tag in session.tag_cat_list:
+            if tag in multivaluetags:
+                self._multi(counts, tag, session)
+            else:
+                self._single(counts, tag, session)
+        return counts
+
+
+def write_summary(counts, outfile, taglist, fmt="table"):
+    # folders as rows and tag categories as columns, with totals
+    tags = [t for t in taglist if t in set(tag for folder, tag in counts)] + \
+        sorted(set(tag for folder, tag in counts) - set(taglist))
+    folders = {}
+    for (folder, tag), n in counts.items():
+        folders.setdefault(folder, Counter())[tag] += n
+    total = Counter()
+    for c in folders.values():
+        total.update(c)
+    if fmt == "json":
+        result = {"folders": {}, "total": dict((t, total[t]) for t in tags)}
+        for folder in sorted(folders):
+            result["folders"][folder] = dict((t, folders[folder][t]) for t in tags if folders[folder][t] > 0)
+            result["folders"][folder]["Total"] = sum(folders[folder].values())
+        result["total"]["Total"] = sum(total.values())
+        outfile.write(json.dumps(result, indent=1, ensure_ascii=False) + "\n")
+    else:
+        outfile.write("Folder\t" + "\t".join(tags) + "\tTotal\n")
+        for folder in sorted(folders):
+            outfile.write(folder + "\t" + "\t".join(str(folders[folder][t]) for t in tags) + "\t" +
+                          str(sum(folders[folder].values())) + "\n")
+        outfile.write("Total\t" + "\t".join(str(total[t]) for t in tags) + "\t" + str(sum(total.values())) + "\n")
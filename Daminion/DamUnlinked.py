@@ -0,0 +1,114 @@
+#
+#   Copyright Juha Lintula (juha.v.lintula@gmail.com), 2017
+#
+#
+#
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+#   Missing links: the valid items of a DamColumns catalog are put into buckets by their basename (as with -b)
+#   and optionally by creation time and folder. The link (or stack) components are labeled with union-find,
+#   and the buckets whose items belong to more than one component are the suggested links. Both steps are
+#   linear in the number of items and links.
+
+from array import array
+
+from Daminion.DamImage import DamImage
+from Daminion.DamColumns import ColumnImage, INVALID_TIME
+
+KEYS = ["time", "folder"]
+
+
+class DamUnlinked:
+
+    def __init__(self, columns):
+        self.columns = columns
+
+    def _find(self, parent, r):
+        root = r
+        while parent[root] != root:
+            root = parent[root]
+        while parent[r] != root:
+            parent[r], r = root, parent[r]
+        return root
+
+    def components(self, group):
+        # component label (a row) of each row, by links or with group by stacks
+        db = self.columns
+        n = len(db.ids)
+        if group:
+            label = array('i', range(n))
+            for r in range(n):
+                t = db.row(db.top[r])
+                if t >= 0:
+                    label[r] = t
+            return label
+        parent = array('i', range(n))
+        offsets, rows = db.links_to
+        for r in range(n):
+            for s in rows[offsets[r]:offsets[r + 1]]:
+                a, b = self._find(parent, r), self._find(parent, s)
+                if a != b:
+                    parent[max(a, b)] = min(a, b)
+        for r in range(n):
+            parent[r] = self._find(parent, r)
+        return parent
+
+    def _key(self, r, separators, keys):
+        db = self.columns
+        key = (DamImage.base_name(db.names[r], separators), )
+        if "time" in keys:
+            if db.ctime[r] == INVALID_TIME:
+                return None
+            key += (db.ctime[r], )
+        if "folder" in keys:
+            key += (db.path[r], )
+        return key
+
+    def groups(self, session, keys=()):
+        # lists of rows with the same key in more than one component, each list by component
+        db = self.columns
+        buckets = {}
+        for r in range(len(db.ids)):
+            if not db.deleted[r] and db.isimage[r] and db.path[r] >= 0:
+                key = self._key(r, session.comp_name, keys)
+                if key is not None:
+                    buckets.setdefault(key, []).append(r)
+        label = self.components(session.group)
+        for rows in buckets.values():
+            if len(rows) < 2:
+                continue
+            parts = {}
+            for r in rows:
+                parts.setdefault(label[r], []).append(r)
+            if len(parts) > 1:
+                yield list(parts.values())
+
+    def ScanUnlinked(self, session, keys=()):
+        # each item of the other components is reported against the first item of the group
+        db = self.columns
+        taglist = set(session.tag_cat_list) | {"Creation Time"}
+        session.outfile.write("Image\tDir\tUnlinked\tTag\tDifferences\n")
+        count = 0
+        for parts in self.groups(session, keys):
+            rep = ColumnImage(db.ids[parts[0][0]], db, session, parts[0][0])
+            for part in parts[1:]:
+                for r in part:
+                    img = ColumnImage(db.ids[r], db, session, r)
+                    if ("Unlinked", rep._id, img._id) in session.filter_pairs:
+                        continue
+                    same, tags = rep.image_eq(img, session.dist_tolerance, session.alt_tolerance)
+                    session.outfile.write(rep.ImageName + "\t~\t" + img.ImageName + "\tUnlinked\t" +
+                                          ", ".join(t for t in tags if t in taglist) + "\n")
+                    count += 1
+        return count
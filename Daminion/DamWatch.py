@@ -0,0 +1,216 @@
+#
+#   Copyright Juha Lintula (juha.v.lintula@gmail.com), 2017
+#
+#
+#
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+#   Watch mode: the catalog stays open with its constants, link and stack indexes in memory, and only the
+#   items touched by a change are checked again. Changes are detected
+#     - by PRAGMA data_version on a standalone catalog,
+#     - on a server catalog by a row count and checksum of each watched table, summed in the database
+#       (Backend.checksum). The catalog is only read, there are no triggers to tell what changed, so each
+#       poll is a sequential scan of every watched table on the server, though only one row per table is
+#       transferred. On a large catalog use a poll interval of several seconds.
+#   Which items changed is found by comparing a per item checksum of the rows of the changed tables, as
+#   there are no modification times in the catalog. The changed items and the items linked or stacked with
+#   them (before and after the change) are checked again, and their new findings appended to the report.
+
+import io
+import time
+import datetime
+
+from Daminion.DamImage import DamImage
+
+# table: per item rows, the first column is the item id
+WATCHED = {
+    "mediaitems": "SELECT id, filename, deleted, id_event, id_mediaformat, creationdatetime, id_topmediaitemstack "
+                  "FROM mediaitems",
+    "files": "SELECT id_mediaitem, filename, relativepath FROM files",
+    "mediaitems_link": "SELECT id_frommediaitem, id_tomediaitem FROM mediaitems_link",
+    "image": "SELECT id_mediaitem, gpslatitude, gpslongitude, gpsaltitude FROM image",
+    "subject": "SELECT id_mediaitem, title, description, comments FROM subject",
+    "place_file": "SELECT id_mediaitem, id_value FROM place_file",
+    "people_file": "SELECT id_mediaitem, id_value FROM people_file",
+    "keywords_file": "SELECT id_mediaitem, id_value FROM keywords_file",
+    "categories_file": "SELECT id_mediaitem, id_value FROM categories_file",
+    "systemcollection_file": "SELECT id_mediaitem, id_value FROM systemcollection_file",
+}
+
+# tables of the catalog constants, a change in them is checked against all items
+VALUES = {
+    "mediaformat_table": "SELECT id, parentvalueid, value FROM mediaformat_table",
+    "event_table": "SELECT id, parentvalueid, value FROM event_table",
+    "place_table": "SELECT id, hierarchylevel, value FROM place_table",
+    "people_table": "SELECT id, parentvalueid, value FROM people_table",
+    "keywords_table": "SELECT id, parentvalueid, value FROM keywords_table",
+    "categories_table": "SELECT id, parentvalueid, value FROM categories_table",
+    "systemcollection_table": "SELECT id, parentvalueid, value FROM systemcollection_table",
+}
+
+TABLES = dict(WATCHED, **VALUES)
+
+MASK = (1 << 64) - 1
+
+
+class DamWatch:
+
+    def __init__(self, catalog, session, check, verbose=0):
+        # catalog is an opened DamCatalog with initialized constants, check(img, session, verbose) writes the
+        # findings of one item into session.outfile
+        self.catalog = catalog
+        self.session = session
+        self.check = check
+        self.verbose = verbose
+        self._state = {}        # table: {item id: checksum of its rows}
+        self._links = {}        # item id: set of items linked to it in either direction
+        self._tops = {}         # item id: top item of its stack
+        self._stacks = {}       # top item: items of the stack
+        self._findings = {}     # item id: report lines of the item
+        self._probes = {}       # table: (row count, checksum)
+        self._version = catalog.catalog.data_version()
+        if self._version is None:
+            self._probe(list(TABLES))
+
+    def _read(self, table):
+        # order independent checksum of the rows of each item
+        state = {}
+        curs = self.catalog.catalog.cursor()
+        curs.execute(TABLES[table])
+        for row in curs:
+            state[row[0]] = (state.get(row[0], 0) + hash(row)) & MASK
+            if table == "mediaitems_link":
+                self._links.setdefault(row[0], set()).add(row[1])
+                self._links.setdefault(row[1], set()).add(row[0])
+            elif table == "mediaitems":
+                self._tops[row[0]] = row[6]
+                self._stacks.setdefault(row[6], set()).add(row[0])
+        curs.close()
+        self.catalog.catalog.commit()
+        return state
+
+    def _probe(self, tables):
+        # tables whose row count or checksum has changed
+        changed = set()
+        for table in tables:
+            row = tuple(self.catalog.catalog.checksum(TABLES[table]))
+            if self._probes.get(table) != row:
+                self._probes[table] = row
+                changed.add(table)
+        self.catalog.catalog.commit()
+        return changed
+
+    def neighbours(self, img_id, links, tops, stacks):
+        # the items whose findings may involve img_id
+        if self.session.group:
+            return stacks.get(tops.get(img_id), set()) | stacks.get(img_id, set())
+        else:
+            return links.get(img_id, set())
+
+    def changed_tables(self, timeout):
+        # wait timeout seconds for changes, returns the names of the changed tables
+        time.sleep(timeout)
+        if self._version is not None:
+            version = self.catalog.catalog.data_version()
+            if version == self._version:
+                return set()
+            self._version = version
+            return set(TABLES)
+        return self._probe(list(TABLES))
+
+    def update(self, tables):
+        # reread the changed tables and return the ids of the items to be checked again
+        affected = set()
+        old = (self._links, self._tops, self._stacks)
+        changed = set()
+        for table in TABLES:
+            if table not in tables:
+                continue
+            if table == "mediaitems_link":
+                self._links = {}
+            elif table == "mediaitems":
+                self._tops, self._stacks = {}, {}
+            old_state = self._state.get(table, {})
+            new_state = self._read(table)
+            self._state[table] = new_state
+            diff = set(k for k in old_state.keys() | new_state.keys() if old_state.get(k) != new_state.get(k))
+            if table in VALUES:
+                if diff != set():
+                    self.catalog.initCatalogConstants()
+                    affected |= set(self._state["mediaitems"])
+            else:
+                changed |= diff
+        new = (self._links, self._tops, self._stacks)
+        for img_id in changed:
+            affected.add(img_id)
+            affected |= self.neighbours(img_id, *old) | self.neighbours(img_id, *new)
+        return sorted(affected)
+
+    def _findings_of(self, img_id):
+        if img_id not in self._state["mediaitems"]:
+            return []
+        outfile = self.session.outfile
+        self.session.outfile = io.StringIO()
+        try:
+            self.check(DamImage(img_id, self.catalog, self.session), self.session, 0)
+            return self.session.outfile.getvalue().splitlines(keepends=True)
+        finally:
+            self.session.outfile = outfile
+
+    def recheck(self, ids):
+        # append the findings that are new for the items
+        count = 0
+        for img_id in ids:
+            lines = self._findings_of(img_id)
+            old = self._findings.get(img_id, set())
+            for line in lines:
+                if line not in old:
+                    self.session.outfile.write(line)
+                    count += 1
+            if lines == []:
+                self._findings.pop(img_id, None)
+            else:
+                self._findings[img_id] = set(lines)
+        self.session.outfile.flush()
+        return count
+
+    def scan(self):
+        # the first full scan
+        for table in TABLES:
+            self._state[table] = self._read(table)
+        self.session.outfile.write("ImageA\tDir\tImageB\tTag\tValueA/Missing A\t\tValueB\n")
+        ids = sorted(self._state["mediaitems"])
+        count = self.recheck(ids)
+        if self.verbose > 0:
+            print("{:%H:%M:%S} {} items checked, {} findings".format(datetime.datetime.now(), len(ids), count))
+
+    def poll(self, timeout):
+        # one round of waiting for changes and checking the affected items again
+        tables = self.changed_tables(timeout)
+        if tables == set():
+            return 0
+        ids = self.update(tables)
+        count = self.recheck(ids)
+        if self.verbose > 0 and ids != []:
+            print("{:%H:%M:%S} {} items checked again, {} new findings".format(datetime.datetime.now(), len(ids),
+                                                                               count))
+        return count
+
+    def run(self, interval, cycles=None):
+        self.scan()
+        while cycles is None or cycles > 0:
+            self.poll(interval)
+            if cycles is not None:
+                cycles -= 1
+
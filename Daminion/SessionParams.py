@@ -47,7 +47,7 @@ class FilterPairs(dict):
 
     def __contains__(self, item):
         try:
-            if item[0] in ["Name", "Event", "Place", "GPS", "Title", "Description", "Comments"]:
+            if item[0] in ["Name", "Unlinked", "Event", "Place", "GPS", "Title", "Description", "Comments"]:
                 in_list = self[item[0]][item[1]][item[2]] == []
             else:
                 in_list = item[3] in self[item[0]][item[1]][item[2]]
@@ -88,6 +88,35 @@ class FilterTags(configparser.ConfigParser):
 
 class SessionParams:
 
+    _shared = None      # (kind, file name, ...): filter list or pairs, when they are shared between sessions
+
+    @staticmethod
+    def share_resources(enable=True):
+        # the filter lists and acknowledged pairs are read once and the same objects are given to all sessions
+        if enable:
+            if SessionParams._shared is None:
+                SessionParams._shared = {}
+        else:
+            SessionParams._shared = None
+
+    @staticmethod
+    def _resource(key, load):
+        if SessionParams._shared is None or key[1] is None:
+            return load()
+        key = (key[0], os.path.abspath(key[1])) + key[2:]
+        if key not in SessionParams._shared:
+            SessionParams._shared[key] = load()
+        return SessionParams._shared[key]
+
+    @staticmethod
+    def filter_tags(tagvaluefile, only_tags=False):
+        return SessionParams._resource(("tags", tagvaluefile, only_tags),
+                                       lambda: FilterTags(tagvaluefile, only_tags))
+
+    @staticmethod
+    def filter_pairs_of(filename):
+        return SessionParams._resource(("pairs", filename), lambda: SessionParams.read_pairs(filename))
+
     @staticmethod
     def _get_item_id(s):
         mi = re.search("(\S+) \((\d+)\)", s)
@@ -112,7 +141,7 @@ class SessionParams:
             sys.stderr.write("*Warning: No item IDs – ignored: " + line + "\n")
             return []
 
-        if tag in ["Name", "Event", "Place", "GPS", "Title", "Description", "Comments"]:
+        if tag in ["Name", "Unlinked", "Event", "Place", "GPS", "Title", "Description", "Comments"]:
             return [tag, mi1, mi2, []]
         elif len(p) < 5:
             sys.stderr.write("*Ignored:" + line + "\n")
@@ -144,14 +173,15 @@ class SessionParams:
 
     def __init__(self, tag_cat_list=[], fullpath=False, print_id=False, group=False, comp_name=None,
                  only_tags=False, tagvaluefile=None, filter_pairs=None, dist_tolerance=0.0, alt_tolerance=0.0,
-                 exdir=[], onlydir=[], outfile=sys.stdout):
+                 exdir=[], onlydir=[], outfile=sys.stdout, baseline=None,
+                 baseline_kinds=None):
         self.fullpath = fullpath
         self.print_id = print_id
         self.group = group
         self.comp_name = comp_name
         self.tag_cat_list = tag_cat_list
-        self.filter_list = FilterTags(tagvaluefile, only_tags)
-        self.filter_pairs = self.read_pairs(filter_pairs)
+        self.filter_list = self.filter_tags(tagvaluefile, only_tags)
+        self.filter_pairs = self.filter_pairs_of(filter_pairs)
         self.dist_tolerance = dist_tolerance
         self.alt_tolerance = alt_tolerance
         if exdir is None:
@@ -162,4 +192,10 @@ class SessionParams:
             self.onlydir = []
         else:
             self.onlydir = onlydir
-        self.outfile = outfile
+        if baseline is None:
+            self.outfile = outfile
+        else:       # only the changes against the baseline report are written
+            from Daminion.DamBaseline import DamBaseline, DIFFERENCES
+            if baseline_kinds is None:
+                baseline_kinds = DIFFERENCES
+            self.outfile = DamBaseline(baseline, outfile, self.filter_pairs, baseline_kinds)
@@ -0,0 +1,245 @@
+#
+#   Helper for the tests: generates small standalone (SQLite) catalogs with the subset of the Daminion
+#   schema that DamScan and DamCompare read.
+#
+
+import io
+import os
+import sys
+import random
+import time
+import shutil
+import sqlite3
+import tempfile
+from collections import Counter
+from unittest import TestCase
+from Daminion.DamCatalog import DamCatalog
+from Daminion.DamBackend import SqliteBackend
+
+IMAGES_KEY = "%7jnbapuim4$lwk:d45bb3b6-b441-435c-a3ec-b27d067b7c53"
+RAW_KEY = "%7jnbapuim4$lwk:343f9214-79a7-4b58-96a3-b7838e3e37ee"
+
+SCHEMA = """
+CREATE TABLE mediaitems (id INTEGER PRIMARY KEY, filename TEXT, deleted INTEGER, id_event INTEGER,
+                         id_mediaformat INTEGER, creationdatetime TEXT, id_topmediaitemstack INTEGER);
+CREATE TABLE files (id INTEGER PRIMARY KEY, id_mediaitem INTEGER, filename TEXT, relativepath TEXT,
+                    filesize INTEGER);
+CREATE TABLE mediaitems_link (id INTEGER PRIMARY KEY, id_frommediaitem INTEGER, id_tomediaitem INTEGER);
+CREATE TABLE image (id_mediaitem INTEGER, gpslatitude REAL, gpslongitude REAL, gpsaltitude REAL);
+CREATE TABLE subject (id_mediaitem INTEGER, title TEXT, description TEXT, comments TEXT);
+CREATE TABLE mediaformat_table (id INTEGER PRIMARY KEY, parentvalueid INTEGER, value TEXT);
+CREATE TABLE event_table (id INTEGER PRIMARY KEY, parentvalueid INTEGER, value TEXT);
+CREATE TABLE people_table (id INTEGER PRIMARY KEY, parentvalueid INTEGER, value TEXT);
+CREATE TABLE keywords_table (id INTEGER PRIMARY KEY, parentvalueid INTEGER, value TEXT);
+CREATE TABLE categories_table (id INTEGER PRIMARY KEY, parentvalueid INTEGER, value TEXT);
+CREATE TABLE systemcollection_table (id INTEGER PRIMARY KEY, parentvalueid INTEGER, value TEXT);
+CREATE TABLE place_table (id INTEGER PRIMARY KEY, hierarchylevel INTEGER, value TEXT);
+CREATE TABLE people_file (id_mediaitem INTEGER, id_value INTEGER);
+CREATE TABLE keywords_file (id_mediaitem INTEGER, id_value INTEGER);
+CREATE TABLE categories_file (id_mediaitem INTEGER, id_value INTEGER);
+CREATE TABLE systemcollection_file (id_mediaitem INTEGER, id_value INTEGER);
+CREATE TABLE place_file (id_mediaitem INTEGER, id_value INTEGER);
+CREATE INDEX files_item ON files (id_mediaitem);
+CREATE INDEX link_from ON mediaitems_link (id_frommediaitem);
+CREATE INDEX link_to ON mediaitems_link (id_tomediaitem);
+CREATE INDEX image_item ON image (id_mediaitem);
+CREATE INDEX subject_item ON subject (id_mediaitem);
+CREATE INDEX people_item ON people_file (id_mediaitem);
+CREATE INDEX keywords_item ON keywords_file (id_mediaitem);
+CREATE INDEX categories_item ON categories_file (id_mediaitem);
+CREATE INDEX collection_item ON systemcollection_file (id_mediaitem);
+CREATE INDEX place_item ON place_file (id_mediaitem);
+"""
+
+MEDIAFORMATS = [(1, 0, IMAGES_KEY), (2, 1, "JPEG"), (3, 1, "TIFF"), (4, 0, RAW_KEY), (5, 4, "NEF"),
+                (6, 0, "Video"), (7, 6, "MP4")]
+EVENTS = [(1, 0, "Travel"), (2, 1, "Rome 2017"), (3, 1, "Oslo 2018"), (4, 0, "Family"), (5, 4, "Birthday")]
+PEOPLE = [(1, 0, "Lintula"), (2, 1, "Juha"), (3, 1, "Anna"), (4, 0, "Smith"), (5, 4, "John")]
+KEYWORDS = [(1, 0, "Animals"), (2, 1, "Birds"), (3, 2, "Gull"), (4, 2, "Crow"), (5, 1, "Cat"),
+            (6, 0, "Nature"), (7, 6, "Sea"), (8, 6, "Forest"), (9, 0, "City")]
+CATEGORIES = [(1, 0, "Image"), (2, 1, "B&W"), (3, 1, "HDR"), (4, 0, "Best")]
+COLLECTIONS = [(1, 0, "Portfolio"), (2, 0, "Print"), (3, 2, "A4")]
+PLACES = [(1, 1, "Finland"), (2, 2, "Uusimaa"), (3, 3, "Helsinki"), (4, 1, "Italy"), (5, 3, "Rome")]
+PLACE_SETS = [[], [1, 2, 3], [4, 5], [1]]
+EXTRA_VALUES = {"people_file": [1, 2, 3, 4, 5], "keywords_file": [1, 2, 3, 4, 5, 6, 7, 8, 9],
+                "categories_file": [1, 2, 3, 4], "systemcollection_file": [1, 2, 3]}
+FOLDERS = ["2017\\Rome", "2018\\Oslo", "2018\\Home", "2019"]
+
+
+def create_catalog(name, items=60, seed=1):
+    # Items are created in link clusters of 1-4 members: the first member is a RAW file, the others
+    # are derived JPEG/TIFF files that mostly share the tags of the RAW file.
+    rnd = random.Random(seed)
+    conn = sqlite3.connect(name)
+    conn.executescript(SCHEMA)
+    conn.executemany("INSERT INTO mediaformat_table VALUES (?, ?, ?)", MEDIAFORMATS)
+    for table, rows in [("event_table", EVENTS), ("people_table", PEOPLE), ("keywords_table", KEYWORDS),
+                        ("categories_table", CATEGORIES), ("systemcollection_table", COLLECTIONS)]:
+        conn.executemany("INSERT INTO " + table + " VALUES (?, ?, ?)", rows)
+    conn.executemany("INSERT INTO place_table VALUES (?, ?, ?)", PLACES)
+
+    img_id = 0
+    while img_id < items:
+        size = min(rnd.randint(1, 4), items - img_id)
+        folder = rnd.choice(FOLDERS)
+        base = "IMG_{:04}".format(img_id + 1)
+        event = rnd.choice([1, 2, 3, 5])
+        places = rnd.choice(PLACE_SETS)
+        tags = {"people_file": rnd.sample([2, 3, 5], rnd.randint(0, 2)),
+                "keywords_file": rnd.sample([3, 4, 5, 7, 8, 9], rnd.randint(0, 3)),
+                "categories_file": rnd.sample([2, 3, 4], rnd.randint(0, 1)),
+                "systemcollection_file": rnd.sample([1, 3], rnd.randint(0, 1))}
+        gps = rnd.choice([(0.0, 0.0, 0.0), (60.1699, 24.9384, 10.0), (41.9028, 12.4964, 21.0)])
+        stamp = "2018-{:02}-{:02} 12:{:02}:{:02}".format(rnd.randint(1, 12), rnd.randint(1, 28),
+                                                        rnd.randint(0, 59), rnd.randint(0, 59))
+        title = rnd.choice(["", "Sunset", "Harbour"])
+        first = img_id + 1
+        for k in range(size):
+            img_id += 1
+            ext, fmt = [(".NEF", 5), (".jpg", 2), ("_edit.tif", 3), ("-2.jpg", 2)][k]
+            if rnd.random() < 0.03:
+                fmt = 7
+            ctime = stamp
+            if rnd.random() < 0.3:
+                ctime += ".{}".format(rnd.randint(1, 999))
+            if rnd.random() < 0.05:
+                ctime = stamp[:11] + "13:00:00"
+            deleted = 1 if rnd.random() < 0.04 else 0
+            conn.execute("INSERT INTO mediaitems VALUES (?, ?, ?, ?, ?, ?, ?)",
+                         (img_id, base + ext, deleted, rnd.choice([event, event, event, 9]) if k else event,
+                          fmt, ctime, first if size > 1 else img_id))
+            if rnd.random() > 0.02:
+                conn.execute("INSERT INTO files (id_mediaitem, filename, relativepath, filesize) VALUES (?, ?, ?, ?)",
+                             (img_id, base + ext, folder, 1000 + img_id))
+            if k > 0:
+                conn.execute("INSERT INTO mediaitems_link (id_frommediaitem, id_tomediaitem) VALUES (?, ?)",
+                             (first, img_id))
+            my_gps = gps if rnd.random() > 0.1 else (gps[0] + 0.001, gps[1], gps[2] + 5.0)
+            if rnd.random() > 0.05:
+                conn.execute("INSERT INTO image VALUES (?, ?, ?, ?)", (img_id,) + my_gps)
+            if rnd.random() > 0.05:
+                conn.execute("INSERT INTO subject VALUES (?, ?, ?, ?)",
+                             (img_id, title if rnd.random() > 0.1 else "Other", rnd.choice(["", None, "Desc"]),
+                              None))
+            my_places = places if rnd.random() > 0.1 else rnd.choice(PLACE_SETS)
+            conn.executemany("INSERT INTO place_file VALUES (?, ?)", [(img_id, p) for p in my_places])
+            for table, values in tags.items():
+                my_values = list(values)
+                if my_values and rnd.random() < 0.15:
+                    my_values.pop()
+                if rnd.random() < 0.1:
+                    my_values.append(rnd.choice(EXTRA_VALUES[table]))
+                if rnd.random() < 0.01:
+                    my_values.append(99)     # dangling tag value id
+                conn.executemany("INSERT INTO " + table + " VALUES (?, ?)",
+                                 [(img_id, v) for v in sorted(set(my_values))])
+    conn.commit()
+    conn.close()
+
+
+def open_catalog(name):
+    catalog = DamCatalog(None, None, name, None, None, True)
+    catalog.initCatalogConstants()
+    return catalog
+
+
+class LatencyCursor:
+    # cursor that waits before each statement, like a query to a remote server
+    def __init__(self, cursor, delay):
+        self._cursor = cursor
+        self._delay = delay
+
+    def execute(self, sql, params=()):
+        time.sleep(self._delay)
+        return self._cursor.execute(sql, params)
+
+    def fetchone(self):
+        return self._cursor.fetchone()
+
+    def fetchall(self):
+        return self._cursor.fetchall()
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def close(self):
+        self._cursor.close()
+
+
+class LatencyConnection:
+    # stand-in for a remote server catalog: a SQLite connection with injected latency
+    def __init__(self, name, delay):
+        self._conn = sqlite3.connect(name, check_same_thread=False)
+        self._delay = delay
+
+    def cursor(self):
+        return LatencyCursor(self._conn.cursor(), self._delay)
+
+    def close(self):
+        self._conn.close()
+
+
+class CountingCursor:
+    # cursor that counts the executed statements of its connection
+    def __init__(self, cursor, counts):
+        self._cursor = cursor
+        self._counts = counts
+
+    def execute(self, sql, params=()):
+        self._counts[sql] += 1
+        return self._cursor.execute(sql, params)
+
+    def fetchone(self):
+        return self._cursor.fetchone()
+
+    def fetchall(self):
+        return self._cursor.fetchall()
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def close(self):
+        self._cursor.close()
+
+
+class CountingConnection:
+    # SQLite connection that counts the statements executed through it, by SQL text
+    def __init__(self, name):
+        self._conn = sqlite3.connect(name, check_same_thread=False)
+        self.counts = Counter()
+
+    def cursor(self):
+        return CountingCursor(self._conn.cursor(), self.counts)
+
+    def commit(self):
+        self._conn.commit()
+
+    def close(self):
+        self._conn.close()
+
+
+def counting_catalog(name):
+    # an opened catalog whose queries after initCatalogConstants are counted in catalog.catalog.conn.counts
+    catalog = open_catalog(name)
+    catalog.catalog.close()
+    catalog.catalog = SqliteBackend(CountingConnection(name))
+    return catalog
+
+
+class CatalogTestCase(TestCase):
+    # the fixture of the catalog tests: a temporary directory self.dir with the catalog self.name of ITEMS
+    # items (none if ITEMS is None), and the error messages captured from stderr
+    ITEMS = None
+    SEED = 1
+
+    def setUp(self):
+        self.stderr = sys.stderr
+        sys.stderr = io.StringIO()
+        self.dir = tempfile.mkdtemp()
+        self.name = os.path.join(self.dir, "cat.dmc")
+        if self.ITEMS is not None:
+            create_catalog(self.name, self.ITEMS, seed=self.SEED)
+
+    def tearDown(self):
+        sys.stderr = self.stderr
+        shutil.rmtree(self.dir)
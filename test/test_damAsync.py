@@ -0,0 +1,91 @@
+from unittest import skipUnless
+import io
+import os
+import time
+import shutil
+import sqlite3
+from Daminion.SessionParams import SessionParams
+from Daminion.DamCatalog import DamCatalog
+from Daminion.DamAsync import DamAsync
+from Daminion.DamBackend import SqliteBackend
+from test.catalog_builder import CatalogTestCase, open_catalog, LatencyConnection
+import DamScan
+import DamCompare
+
+
+def scan(catalog):
+    out = io.StringIO()
+    session = SessionParams(DamScan.alltags, print_id=True, outfile=out)
+    DamScan.ScanCatalog(catalog, session)
+    return out.getvalue()
+
+
+class TestDamAsync(CatalogTestCase):
+
+    ITEMS = 120
+    SEED = 11
+
+    def test_scan(self):
+        expected = scan(open_catalog(self.name))
+        self.assertEqual(scan(DamAsync(open_catalog(self.name), 4, window=8)), expected)
+        self.assertEqual(scan(DamAsync(open_catalog(self.name), 1)), expected)
+
+    def test_early_stop(self):
+        catalog = DamAsync(open_catalog(self.name), 2, window=4)
+        items = DamAsync.NextImage(catalog, SessionParams())
+        first = [next(items) for i in range(3)]
+        items.close()
+        self.assertEqual([img._id for img in first], [img._id for img in
+                                                      list(DamCatalog.NextImage(open_catalog(self.name),
+                                                                                SessionParams()))[:3]])
+
+    def slow(self, delay):
+        # a catalog whose statements all take delay seconds
+        catalog = open_catalog(self.name)
+        catalog.catalog = SqliteBackend(LatencyConnection(self.name, delay))
+        return catalog
+
+    def test_pipelining(self):
+        # with 1 ms latency per statement, a scan with 8 connections must be much faster than with one; the
+        # linked items are hydrated in the pool too
+        delay = 0.001
+        for group in [False, True]:
+            out = io.StringIO()
+            start = time.perf_counter()
+            DamScan.ScanCatalog(self.slow(delay), SessionParams(DamScan.alltags, group=group, outfile=out))
+            sequential_time = time.perf_counter() - start
+
+            pooled = DamAsync(self.slow(delay), 8, connect=lambda: SqliteBackend(LatencyConnection(self.name, delay)))
+            found = io.StringIO()
+            start = time.perf_counter()
+            DamScan.ScanCatalog(pooled, SessionParams(DamScan.alltags, group=group, outfile=found))
+            pooled_time = time.perf_counter() - start
+            self.assertEqual(found.getvalue(), out.getvalue())
+            self.assertLess(pooled_time, sequential_time / 3)
+
+    def test_compare(self):
+        # the items of catalog 2 are looked up in the pipeline of catalog 1
+        name2 = os.path.join(self.dir, "cat2.dmc")
+        shutil.copy(self.name, name2)
+        conn = sqlite3.connect(name2)
+        conn.execute("UPDATE subject SET title = 'Changed' WHERE id_mediaitem % 7 = 0")
+        conn.execute("UPDATE files SET relativepath = 'Moved' WHERE id_mediaitem % 11 = 0")
+        conn.commit()
+        conn.close()
+        expected = io.StringIO()
+        DamCompare.ScanCatalog(open_catalog(self.name), open_catalog(name2), SessionParams(None, outfile=expected))
+        catalog2 = DamAsync(open_catalog(name2), 2, neighbours=False)
+        catalog1 = DamAsync(open_catalog(self.name), 4, neighbours=False, partner=catalog2)
+        catalog2.image_by_name = None       # all the lookups are done in the pipeline
+        out = io.StringIO()
+        DamCompare.ScanCatalog(catalog1, catalog2, SessionParams(None, outfile=out))
+        self.assertEqual(out.getvalue(), expected.getvalue())
+        self.assertGreater(out.getvalue().count("\n"), 20)
+
+    @skipUnless(os.environ.get("DAMINION_TEST_PG"), "set DAMINION_TEST_PG=host:port:catalog:user:password")
+    def test_postgres(self):
+        host, port, name, user, password = os.environ["DAMINION_TEST_PG"].split(":")
+        catalog = DamCatalog(host, int(port), name, user, password, False)
+        catalog.initCatalogConstants()
+        expected = scan(catalog)
+        self.assertEqual(scan(DamAsync(catalog, 8)), expected)
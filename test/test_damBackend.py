@@ -0,0 +1,71 @@
+from unittest import TestCase
+import io
+import os
+import sys
+import shutil
+import sqlite3
+import tempfile
+from Daminion import DamBackend
+from Daminion.DamBackend import SqliteBackend, PostgresBackend
+from test.catalog_builder import create_catalog
+
+
+class TestDamBackend(TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.name = os.path.join(self.dir, "cat.dmc")
+        create_catalog(self.name, 20)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_sqlite(self):
+        backend = DamBackend.connect(None, None, self.name, None, None, True)
+        self.assertIsInstance(backend, SqliteBackend)
+        sql = "SELECT filename FROM mediaitems WHERE id = ?"
+        self.assertEqual(backend.fetchone(sql, (1, )), ("IMG_0001.NEF", ))
+        cur = backend._statements[sql]
+        self.assertIsNone(backend.fetchone(sql, (1000, )))
+        self.assertIs(backend._statements[sql], cur)       # statement cursor is reused
+        self.assertEqual(len(backend.fetchall("SELECT id FROM mediaitems WHERE id < ?", (6, ))), 5)
+        self.assertEqual(len(backend._statements), 2)
+        backend.close()
+
+    def test_base(self):
+        # a driver connection without prepared statements
+        backend = DamBackend.Backend(sqlite3.connect(self.name))
+        self.assertEqual(backend.fetchone("SELECT filename FROM mediaitems WHERE id = ?", (1, )), ("IMG_0001.NEF", ))
+        self.assertEqual(len(backend.fetchall("SELECT id FROM mediaitems WHERE id < ?", (6, ))), 5)
+        self.assertEqual(backend._statements, {})
+        sql = "SELECT id_mediaitem, id_value FROM keywords_file"
+        count, checksum = backend.checksum(sql)
+        self.assertEqual(count, len(backend.fetchall(sql)))
+        backend.conn.execute("UPDATE keywords_file SET id_value = id_value + 1 WHERE rowid = 1")
+        self.assertEqual(backend.checksum(sql)[0], count)
+        self.assertNotEqual(backend.checksum(sql)[1], checksum)
+        backend.close()
+
+    def test_sqlite_missing(self):
+        tmp = sys.stderr
+        sys.stderr = io.StringIO()
+        with self.assertRaises(SystemExit):
+            SqliteBackend.open(os.path.join(self.dir, "missing.dmc"))
+        self.assertIn("is not a valid database file", sys.stderr.getvalue())
+        sys.stderr = tmp
+
+    def test_numbered(self):
+        self.assertEqual(PostgresBackend._numbered("SELECT deleted FROM mediaitems WHERE id = ?"),
+                         ("SELECT deleted FROM mediaitems WHERE id = $1", 1))
+        self.assertEqual(PostgresBackend._numbered("SELECT 1 FROM files WHERE filename = ? AND relativepath = ?"),
+                         ("SELECT 1 FROM files WHERE filename = $1 AND relativepath = $2", 2))
+        self.assertEqual(PostgresBackend._numbered("SELECT id FROM mediaitems"), ("SELECT id FROM mediaitems", 0))
+
+    def test_epoch(self):
+        backend = DamBackend.connect(None, None, self.name, None, None, True)
+        sql = "SELECT " + backend.epoch.format("t") + " FROM (SELECT ? AS t)"
+        for value, seconds in [("1970-01-01 00:00:00", 0), ("2019-05-01 12:00:00", 1556712000),
+                               ("2019-05-01T12:00:00.123", 1556712000), ("2019-05-01 12:00:00.9", 1556712000),
+                               ("2019-05-01", None), ("not a time, really", None), (None, None)]:
+            self.assertEqual(backend.fetchone(sql, (value, ))[0], seconds, value)
+        backend.close()
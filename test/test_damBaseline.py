@@ -0,0 +1,130 @@
+import io
+import os
+import sys
+import sqlite3
+from Daminion.SessionParams import SessionParams
+from Daminion import DamBaseline
+from test.catalog_builder import CatalogTestCase, open_catalog
+import DamScan
+
+
+class Output(io.StringIO):
+    # keeps the report after close()
+    def close(self):
+        self.report = self.getvalue()
+
+
+def scan(name, baseline=None, pairs=None, component=False):
+    out = Output()
+    session = SessionParams(DamScan.alltags, print_id=True, filter_pairs=pairs, outfile=out, baseline=baseline)
+    if component:
+        DamScan.ScanComponents(open_catalog(name), session)
+    else:
+        DamScan.ScanCatalog(open_catalog(name), session)
+    session.outfile.close()
+    return out.report
+
+
+def finding_set(report):
+    found = set()
+    for line in report.splitlines():
+        p, values, keys, acks = DamBaseline.findings(line)
+        for v in values:
+            found.add((p[0], p[1], p[2], p[3] if p[1] != "<>" else "", v))
+    return found
+
+
+class TestDamBaseline(CatalogTestCase):
+
+    ITEMS = 300
+    SEED = 11
+
+    def save(self, report, name="baseline.txt"):
+        filename = os.path.join(self.dir, name)
+        with open(filename, "w", encoding="utf-8") as f:
+            f.write(report)
+        return filename
+
+    def edit(self):
+        conn = sqlite3.connect(self.name)
+        conn.execute("DELETE FROM keywords_file WHERE id_mediaitem IN (SELECT id_tomediaitem FROM mediaitems_link "
+                     "WHERE id_frommediaitem < 40)")
+        conn.execute("UPDATE mediaitems SET id_event = 4 WHERE id IN (SELECT id_tomediaitem FROM mediaitems_link "
+                     "WHERE id_frommediaitem > 250)")
+        conn.execute("DELETE FROM people_file WHERE id_mediaitem > 200")
+        conn.commit()
+        conn.close()
+
+    def check_delta(self, component=False):
+        before = scan(self.name, component=component)
+        baseline = self.save(before)
+        self.assertEqual(scan(self.name, baseline, component=component),
+                         before.splitlines(keepends=True)[0] + "Resolved since " + baseline + ":\n")
+        self.edit()
+        after = scan(self.name, component=component)
+        delta = scan(self.name, baseline, component=component)
+        added, resolved = delta.split("Resolved since " + baseline + ":\n")
+        self.assertEqual(added.splitlines()[0], after.splitlines()[0])     # header
+        self.assertEqual(finding_set(added), finding_set(after) - finding_set(before))
+        self.assertEqual(finding_set(resolved), finding_set(before) - finding_set(after))
+        self.assertNotEqual(finding_set(added), set())
+        self.assertNotEqual(finding_set(resolved), set())
+        return baseline, resolved
+
+    def test_delta(self):
+        baseline, resolved = self.check_delta()
+
+        # acknowledged findings are not resolved, they are just not reported any more
+        line = resolved.splitlines()[0]
+        acked = scan(self.name, baseline, pairs=self.save(line + "\n", "ack.txt"))
+        self.assertEqual(finding_set(acked.split("Resolved")[1]), finding_set(resolved) - finding_set(line))
+
+    def test_component(self):
+        self.check_delta(component=True)
+
+    def test_chunks(self):
+        report = scan(self.name)
+        baseline = self.save(report)
+        keys = DamBaseline.DamBaseline(baseline, io.StringIO())._keys
+        chunk = DamBaseline.CHUNK
+        DamBaseline.CHUNK = 17
+        try:
+            self.assertEqual(DamBaseline.DamBaseline(baseline, io.StringIO())._keys, keys)
+        finally:
+            DamBaseline.CHUNK = chunk
+        self.assertEqual(len(keys), sum(len(DamBaseline.findings(l)[2]) for l in report.splitlines()))
+
+    def test_parts(self):
+        # DamCompare writes its lines in parts
+        out = io.StringIO()
+        delta = DamBaseline.DamBaseline(self.save("a (1)\t<>\tb (2)\tEvent, Place\n"), out)
+        delta.write("a (1)\t<>\tb (2)")
+        delta.write("\tPlace, Title\n")
+        delta.write("c (3)\t<>\t–\n")
+        delta.write_resolved()
+        self.assertEqual(out.getvalue(), "a (1)\t<>\tb (2)\tTitle\nc (3)\t<>\t–\n"
+                                         "Resolved since " + delta.filename + ":\na (1)\t<>\tb (2)\tEvent\n")
+        self.assertEqual((delta.added, delta.resolved), (2, 1))
+
+    def main(self, *options):
+        report = os.path.join(self.dir, "report.txt")
+        argv = sys.argv
+        sys.argv = ["DamScan.py", "-l", "-c", self.name, "-i", "-o", report] + list(options)
+        try:
+            self.assertEqual(DamScan.main(), 0)
+        finally:
+            sys.argv = argv
+        with open(report, encoding="utf-8") as f:
+            return f.read().splitlines()
+
+    def test_modes(self):
+        # the findings of a scan are not resolved by the reports of the other modes
+        baseline = self.save(scan(self.name))
+        for mode in [["--summary", "table"], ["--gps-outliers", "event"]]:
+            self.assertEqual(self.main(*mode, "--baseline", baseline)[1:], self.main(*mode)[1:])
+            self.assertIn("--baseline is ignored", sys.stderr.getvalue())
+        unlinked = self.main("--unlinked")
+        self.assertEqual(self.main("--unlinked", "--baseline", baseline)[1:],
+                         unlinked[1:] + ["Resolved since {}:".format(baseline)])
+        self.assertEqual(self.main("--unlinked", "--baseline", self.save("\n".join(unlinked) + "\n"))[1:],
+                         unlinked[1:2] + ["Resolved since {}:".format(os.path.join(self.dir, "baseline.txt"))])
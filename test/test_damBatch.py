@@ -0,0 +1,77 @@
+import io
+import os
+from Daminion.SessionParams import SessionParams
+from test.catalog_builder import CatalogTestCase, create_catalog, open_catalog
+import DamScan
+import DamBatch
+
+
+class TestDamBatch(CatalogTestCase):
+
+    def setUp(self):
+        CatalogTestCase.setUp(self)
+        self.names = []
+        for i, n in enumerate([80, 200, 120]):
+            name = os.path.join(self.dir, "cat{}.dmc".format(i))
+            create_catalog(name, n, seed=20 + i)
+            self.names.append(name)
+        self.pairs = os.path.join(self.dir, "pairs.txt")
+        with open(self.pairs, "w", encoding="utf-8") as f:
+            f.write("IMG_0001.NEF (1)\t>\tIMG_0001.jpg (2)\tKeywords\t'City'\n")
+        self.exfile = os.path.join(self.dir, "filter.ini")
+        with open(self.exfile, "w", encoding="utf-8") as f:
+            f.write("[Keywords]\nNature\n")
+        self.ini = os.path.join(self.dir, "scan.ini")
+        with open(self.ini, "w", encoding="utf-8") as f:
+            f.write("[Database]\nSQLite = True\nCatalog = {}\n\n[Session]\nGroup = True\n".format(self.names[0]))
+
+    def tearDown(self):
+        SessionParams.share_resources(False)
+        CatalogTestCase.tearDown(self)
+
+    def test_make_jobs(self):
+        jobs = DamBatch.make_jobs(self.names + [self.ini, "NetCatalog", self.names[0]], ["-i"], "out")
+        self.assertEqual([job[0] for job in jobs],
+                         ["NetCatalog", self.names[1], self.names[2], self.names[0], self.ini, self.names[0]])
+        self.assertEqual(jobs[0][1], ["-c", "NetCatalog", "-i", "-o", os.path.join("out", "NetCatalog.txt")])
+        self.assertEqual(jobs[1][1], ["-l", "-c", self.names[1], "-i", "-o", os.path.join("out", "cat1.txt")])
+        self.assertEqual(jobs[4][1], ["--ini", self.ini, "-i", "-o", os.path.join("out", "scan.txt")])
+        self.assertEqual(jobs[5][2], os.path.join("out", "cat0_2.txt"))
+
+    def test_shared(self):
+        SessionParams.share_resources()
+        session1 = SessionParams(filter_pairs=self.pairs, tagvaluefile=self.exfile)
+        session2 = SessionParams(filter_pairs=self.pairs, tagvaluefile=self.exfile)
+        self.assertIs(session1.filter_pairs, session2.filter_pairs)
+        self.assertIs(session1.filter_list, session2.filter_list)
+        self.assertIn(("Keywords", 1, 2, "City"), session1.filter_pairs)
+        self.assertIsNot(SessionParams(tagvaluefile=self.exfile, only_tags=True).filter_list,
+                         session1.filter_list)
+        SessionParams.share_resources(False)
+        self.assertIsNot(SessionParams(filter_pairs=self.pairs).filter_pairs, session1.filter_pairs)
+
+    def test_run_batch(self):
+        outdir = os.path.join(self.dir, "reports")
+        os.mkdir(outdir)
+        common = ["-i", "-a", self.pairs]
+        jobs = DamBatch.make_jobs(self.names + [self.ini], common, outdir)
+        out = io.StringIO()
+        shared = DamBatch.shared_files(DamScan.create_parser()[0].parse_args(common))
+        self.assertEqual(DamBatch.run_batch(jobs, 2, shared, out), 0)
+        self.assertEqual(len(out.getvalue().splitlines()), 4)
+        for name, group in [(self.names[0], False), (self.names[1], False), (self.names[2], False),
+                            (self.names[0], True)]:
+            report = os.path.join(outdir, "scan.txt" if group else os.path.basename(name)[:-4] + ".txt")
+            expected = io.StringIO()
+            DamScan.ScanCatalog(open_catalog(name), SessionParams(DamScan.alltags, print_id=True, group=group,
+                                                                  filter_pairs=self.pairs, outfile=expected))
+            with open(report, encoding="utf-8") as f:
+                lines = f.read().splitlines()
+            self.assertTrue(lines[0].startswith("DamScan.py "))
+            self.assertEqual(lines[1:], expected.getvalue().splitlines())
+
+    def test_failed(self):
+        out = io.StringIO()
+        jobs = DamBatch.make_jobs([os.path.join(self.dir, "missing.ini")], ["-l"], self.dir)
+        self.assertEqual(DamBatch.run_batch(jobs, 1, outfile=out), 1)
+        self.assertIn("FAILED", out.getvalue())
@@ -0,0 +1,118 @@
+import io
+import os
+import shutil
+import sqlite3
+from Daminion.SessionParams import SessionParams
+from Daminion.DamImage import DamImage, PlaceTable, INVALID_TIME
+from Daminion.DamColumns import DamColumns, ColumnImage
+from Daminion.DamIntegrity import DamIntegrity
+from test.catalog_builder import CatalogTestCase, create_catalog, open_catalog
+import DamScan
+import DamCompare
+
+
+def scan(catalog, **kw):
+    out = io.StringIO()
+    session = SessionParams(DamScan.alltags, print_id=True, outfile=out, **kw)
+    DamScan.ScanCatalog(catalog, session)
+    return out.getvalue()
+
+
+def compare(catalog1, catalog2, **kw):
+    out = io.StringIO()
+    session = SessionParams(None, print_id=True, outfile=out, **kw)
+    DamCompare.ScanCatalog(catalog1, catalog2, session)
+    return out.getvalue()
+
+
+class TestDamColumns(CatalogTestCase):
+
+    def setUp(self):
+        CatalogTestCase.setUp(self)
+        self.name1 = os.path.join(self.dir, "cat1.dmc")
+        self.name2 = os.path.join(self.dir, "cat2.dmc")
+        create_catalog(self.name1, 200, seed=3)
+        shutil.copy(self.name1, self.name2)
+        conn = sqlite3.connect(self.name2)
+        conn.execute("UPDATE subject SET title = 'Changed' WHERE id_mediaitem % 7 = 0")
+        conn.execute("DELETE FROM keywords_file WHERE id_mediaitem % 5 = 0")
+        conn.execute("UPDATE files SET relativepath = 'Moved' WHERE id_mediaitem % 11 = 0")
+        conn.execute("UPDATE image SET gpsaltitude = gpsaltitude + 1.0 WHERE id_mediaitem % 13 = 0")
+        conn.execute("UPDATE mediaitems SET creationdatetime = '2001-01-01 00:00:00' WHERE id % 17 = 0")
+        conn.execute("UPDATE mediaitems SET id_event = 3 WHERE id % 19 = 0")
+        conn.commit()
+        conn.close()
+
+    def test_csr(self):
+        cat = DamColumns(open_catalog(self.name1))
+        conn = sqlite3.connect(self.name1)
+        for img_id in [1, 2, 50, 199]:
+            r = cat.row(img_id)
+            rows = conn.execute("SELECT id_value FROM keywords_file WHERE id_mediaitem=? ORDER BY id_value",
+                                (img_id,)).fetchall()
+            self.assertEqual(list(cat.values("Keywords", r)), [v[0] for v in rows])
+        self.assertEqual(cat.row(100000), -1)
+        conn.close()
+
+    def test_scan(self):
+        expected = scan(open_catalog(self.name1))
+        self.assertNotEqual(expected.count("\n"), 1)
+        self.assertEqual(scan(DamColumns(open_catalog(self.name1))), expected)
+        self.assertEqual(scan(DamColumns(open_catalog(self.name1)), group=True, comp_name=['-', '_']),
+                         scan(open_catalog(self.name1), group=True, comp_name=['-', '_']))
+        self.assertEqual(scan(DamColumns(open_catalog(self.name1)), dist_tolerance=10.0, alt_tolerance=2.0),
+                         scan(open_catalog(self.name1), dist_tolerance=10.0, alt_tolerance=2.0))
+
+    def test_compare(self):
+        expected = compare(open_catalog(self.name1), open_catalog(self.name2))
+        self.assertNotEqual(expected.count("\n"), 1)
+        self.assertEqual(compare(DamColumns(open_catalog(self.name1)), DamColumns(open_catalog(self.name2))),
+                         expected)
+        self.assertEqual(compare(DamColumns(open_catalog(self.name2)), DamColumns(open_catalog(self.name1)),
+                                 exdir=["2019"]),
+                         compare(open_catalog(self.name2), open_catalog(self.name1), exdir=["2019"]))
+
+    def test_times(self):
+        conn = sqlite3.connect(self.name2)
+        conn.execute("UPDATE mediaitems SET creationdatetime = replace(creationdatetime, ' ', 'T') || '.250' "
+                     "WHERE id % 23 = 0")
+        conn.execute("UPDATE mediaitems SET creationdatetime = '2019-05' WHERE id IN (5, 6)")
+        conn.execute("UPDATE mediaitems SET deleted = 0 WHERE id IN (5, 6)")
+        conn.commit()
+        conn.close()
+        catalog = open_catalog(self.name2)
+        columns = DamColumns(catalog)
+        session = SessionParams(DamScan.alltags)
+        for img_id in [5, 6, 23, 46, 47, 51]:
+            self.assertEqual(DamImage(img_id, catalog, session).ctime, ColumnImage(img_id, columns, session).ctime)
+        self.assertEqual(DamImage(5, catalog, session).ctime, INVALID_TIME)
+        missing = ColumnImage(99999, columns, session)      # no row, not the time of the last item
+        self.assertEqual((missing.ctime, missing.creationtime), (INVALID_TIME, None))
+        found = dict((name, (items, sample)) for name, items, rows, sample in DamIntegrity(catalog).check())
+        self.assertEqual(found["Invalid creation time"][0], 2)
+        self.assertEqual([s[0] for s in found["Invalid creation time"][1]], [5, 6])
+        moved = set(i for i in range(23, 201, 23) if i % 17 != 0)
+        found = set(SessionParams._get_item_id(line) for line in compare(open_catalog(self.name1), catalog).splitlines()
+                    if "Creation Time" in line)
+        self.assertEqual(found & moved, set())
+        self.assertIn(5, found)
+
+    def test_places(self):
+        catalog1 = open_catalog(self.name1)
+        catalog2 = open_catalog(self.name2)
+        self.assertIsInstance(catalog1.PlaceList, PlaceTable)
+        columns = DamColumns(catalog2)
+        session = SessionParams(DamScan.alltags)
+        images = [DamImage(i, catalog1, session) for i in range(1, 201)]
+        images += [ColumnImage(i, columns, session) for i in range(1, 201)]
+        for a in images[::7]:
+            for b in images[::5]:
+                self.assertEqual(a.PlaceId == b.PlaceId, a.Place == b.Place)
+                self.assertEqual(a.PlaceId is b.PlaceId, a.Place == b.Place)      # the same interned string
+        info = catalog1.PlaceList.place.cache_info()
+        self.assertGreater(info.hits, info.misses)
+        self.assertEqual(len(set(img.Place for img in images)), len(set(img.PlaceId for img in images)))
+        places = PlaceTable(catalog1.PlaceList, size=2)
+        for ids in [(1, ), (2, ), (1, 2), (1, )]:
+            self.assertEqual(places.place(ids), catalog1.PlaceList.place(ids))
+        self.assertEqual(places.place.cache_info().currsize, 2)
@@ -0,0 +1,167 @@
+import io
+import os
+import sys
+import shutil
+import sqlite3
+import argparse
+import threading
+import time
+from Daminion.SessionParams import SessionParams
+from Daminion.DamColumns import DamColumns
+from test.catalog_builder import CatalogTestCase, create_catalog, open_catalog
+import DamCompare
+
+
+def make_pair(directory, items=200, seed=3):
+    name1 = os.path.join(directory, "cat1.dmc")
+    name2 = os.path.join(directory, "cat2.dmc")
+    create_catalog(name1, items, seed=seed)
+    shutil.copy(name1, name2)
+    conn = sqlite3.connect(name2)
+    conn.execute("UPDATE subject SET title = 'Changed' WHERE id_mediaitem % 7 = 0")
+    conn.execute("DELETE FROM keywords_file WHERE id_mediaitem % 5 = 0")
+    conn.execute("UPDATE files SET relativepath = 'Moved' WHERE id_mediaitem % 11 = 0")
+    conn.commit()
+    conn.close()
+    return name1, name2
+
+
+def compare(scan, catalog1, catalog2, **kw):
+    out = io.StringIO()
+    session = SessionParams(None, print_id=True, outfile=out, **kw)
+    scan(catalog1, catalog2, session)
+    return out.getvalue()
+
+
+class TestScanPipeline(CatalogTestCase):
+
+    def setUp(self):
+        CatalogTestCase.setUp(self)
+        self.name1, self.name2 = make_pair(self.dir)
+
+    def test_pipeline(self):
+        expected = compare(DamCompare.ScanCatalog, open_catalog(self.name1), open_catalog(self.name2))
+        self.assertEqual(compare(DamCompare.ScanPipeline, open_catalog(self.name1), open_catalog(self.name2)),
+                         expected)
+        self.assertEqual(compare(DamCompare.ScanPipeline, DamColumns(open_catalog(self.name1)),
+                                 DamColumns(open_catalog(self.name2)), onlydir=["2018"]),
+                         compare(DamCompare.ScanCatalog, open_catalog(self.name1), open_catalog(self.name2),
+                                 onlydir=["2018"]))
+
+    def test_pipeline_error(self):
+        catalog2 = open_catalog(self.name2)
+        catalog2.catalog.conn.execute("DROP TABLE files")
+        threads = threading.active_count()
+        with self.assertRaises(sqlite3.OperationalError):
+            DamCompare.ScanPipeline(open_catalog(self.name1), catalog2, SessionParams(None, outfile=io.StringIO()),
+                                    depth=2)
+        for i in range(50):         # the workers stop instead of waiting on the full queues
+            if threading.active_count() == threads:
+                break
+            time.sleep(0.1)
+        self.assertEqual(threading.active_count(), threads)
+
+    def test_open_catalog(self):
+        args = argparse.Namespace(server=None, port=None, sqlite=True, columnar=True, workers=0)
+        catalog = DamCompare.open_catalog(args, self.name1, None, None)
+        self.assertIsInstance(catalog, DamColumns)
+        self.assertEqual(catalog._dbname, self.name1)
+
+
+class TestMoves(CatalogTestCase):
+
+    def setUp(self):
+        CatalogTestCase.setUp(self)
+        self.name1, self.name2 = make_pair(self.dir)
+
+    def scan(self, scan, catalog1, catalog2, **kw):
+        out = io.StringIO()
+        scan(catalog1, catalog2, SessionParams(None, print_id=True, outfile=out), **kw)
+        return out.getvalue().splitlines()[1:]
+
+    def test_moves(self):
+        plain = self.scan(DamCompare.ScanCatalog, open_catalog(self.name1), open_catalog(self.name2))
+        lines = self.scan(DamCompare.ScanCatalog, open_catalog(self.name1), open_catalog(self.name2), moves=True)
+        moved = [line.split("\t") for line in lines if "\t->\t" in line]
+        self.assertGreater(len(moved), 10)
+        names = set(p[0] for p in moved)
+        self.assertEqual(sorted(line for line in lines if "\t->\t" not in line),
+                         sorted(line for line in plain if line.split("\t")[0] not in names))
+        for p in moved:
+            self.assertEqual(p[0], p[2])                # same item ids in the copied catalog
+            self.assertTrue(p[3].split(", ")[0].startswith("Moved ") and p[3].split(", ")[0].endswith(" -> Moved"))
+            img_id = int(p[0].split("(")[1][:-1])
+            self.assertEqual(img_id % 11, 0)
+            self.assertIn(p[0] + "\t<>\t–\tERROR: file missing", plain)
+            self.assertEqual("Title" in p[3], img_id % 7 == 0)
+        self.assertEqual(self.scan(DamCompare.ScanPipeline, open_catalog(self.name1), open_catalog(self.name2),
+                                   moves=True), lines)
+        self.assertEqual(self.scan(DamCompare.ScanCatalog, DamColumns(open_catalog(self.name1)),
+                                   DamColumns(open_catalog(self.name2)), moves=True), lines)
+
+    def test_size(self):
+        conn = sqlite3.connect(self.name2)
+        conn.execute("UPDATE files SET filesize = filesize + 1 WHERE id_mediaitem = 44")
+        conn.execute("UPDATE mediaitems SET creationdatetime = '2001-01-01 00:00:00' WHERE id = 55")
+        conn.commit()
+        conn.close()
+        report = "\n".join(self.scan(DamCompare.ScanCatalog, open_catalog(self.name1), open_catalog(self.name2),
+                                     moves=True))
+        self.assertIn("(44)\t->\t", report)
+        self.assertIn("(55)\t<>\t–", report)
+        sized = "\n".join(self.scan(DamCompare.ScanCatalog, open_catalog(self.name1), open_catalog(self.name2),
+                                    moves=True, move_size=True))
+        self.assertIn("(44)\t<>\t–", sized)
+        self.assertEqual(sized.count("\t->\t"), report.count("\t->\t") - 1)
+
+
+class TestScanMany(CatalogTestCase):
+
+    def setUp(self):
+        CatalogTestCase.setUp(self)
+        self.name1, self.name2 = make_pair(self.dir)
+        self.name3 = os.path.join(self.dir, "cat3.dmc")
+        shutil.copy(self.name1, self.name3)
+        conn = sqlite3.connect(self.name3)
+        conn.execute("UPDATE subject SET comments = 'Other' WHERE id_mediaitem % 4 = 0")
+        conn.commit()
+        conn.close()
+
+    def pairwise(self, name2):
+        # item name: tags of the two-catalog report
+        lines = compare(DamCompare.ScanCatalog, open_catalog(self.name1), open_catalog(name2)).splitlines()[1:]
+        return dict((line.split("\t")[0], line.split("\t")[3]) for line in lines)
+
+    def test_many(self):
+        out = io.StringIO()
+        others = [DamColumns(open_catalog(self.name2)), DamColumns(open_catalog(self.name3))]
+        DamCompare.ScanMany(open_catalog(self.name1), others, SessionParams(None, print_id=True, outfile=out))
+        lines = out.getvalue().splitlines()
+        self.assertEqual(lines[0], "{}\tDir\t{}, {}\tTags".format(self.name1, self.name2, self.name3))
+        found = {}
+        for line in lines[1:]:
+            name, sep, diffs = line.split("\t")
+            self.assertEqual(sep, "<>")
+            for diff in diffs.split("; "):
+                dbname, tags = diff.split(": ", 1)
+                found[(name, dbname)] = tags
+        expected = {}
+        for name2 in [self.name2, self.name3]:
+            for name, tags in self.pairwise(name2).items():
+                expected[(name, name2)] = tags
+        self.assertEqual(found, expected)
+        self.assertTrue(any(dbname == self.name3 for name, dbname in found))
+        self.assertTrue(any("missing" in tags for (name, dbname), tags in found.items() if dbname == self.name2))
+
+    def test_main(self):
+        report = os.path.join(self.dir, "report.txt")
+        argv = sys.argv
+        sys.argv = ["DamCompare.py", "-l", "-i", "-c1", self.name1, "-cn", self.name2, self.name3, "-o", report]
+        try:
+            self.assertEqual(DamCompare.main(), 0)
+        finally:
+            sys.argv = argv
+        with open(report, encoding="utf-8") as f:
+            lines = f.read().splitlines()
+        self.assertEqual(lines[1], "{}\tDir\t{}, {}\tTags".format(self.name1, self.name2, self.name3))
+        self.assertGreater(len(lines), 20)
@@ -0,0 +1,104 @@
+import io
+import os
+import sqlite3
+from Daminion.SessionParams import SessionParams
+from Daminion.DamGeo import DamGeo
+from test.catalog_builder import CatalogTestCase, open_catalog
+
+
+class TestDamGeo(CatalogTestCase):
+
+    ITEMS = 300
+    SEED = 17
+
+    def setUp(self):
+        CatalogTestCase.setUp(self)
+        # every item near its own Event's place, a few small offsets, and two misplaced items
+        conn = sqlite3.connect(self.name)
+        conn.execute("DELETE FROM image")
+        places = {1: (60.1699, 24.9384), 2: (41.9028, 12.4964), 3: (59.9139, 10.7522), 5: (48.8566, 2.3522)}
+        for img_id, event in conn.execute("SELECT id, id_event FROM mediaitems").fetchall():
+            if event not in places:
+                continue
+            lat, long = places[event]
+            conn.execute("INSERT INTO image VALUES (?, ?, ?, 0.0)",
+                         (img_id, lat + (img_id % 7) * 0.0005, long - (img_id % 5) * 0.0005))
+        self.valid = [row[0] for row in conn.execute(
+            "SELECT id FROM mediaitems WHERE deleted = 0 AND id_mediaformat IN (2, 3, 5) AND id_event = 2 ORDER BY id")]
+        self.misplaced = [self.valid[3], self.valid[10]]
+        conn.execute("UPDATE image SET gpslatitude = 35.6762, gpslongitude = 139.6503 WHERE id_mediaitem = ?",
+                     (self.misplaced[0], ))
+        conn.execute("UPDATE image SET gpslatitude = 41.95, gpslongitude = 12.4964 WHERE id_mediaitem = ?",
+                     (self.misplaced[1], ))       # about 5 km north
+        conn.commit()
+        conn.close()
+
+    def outliers(self, dist, by="event", group=False):
+        geo = DamGeo(open_catalog(self.name))
+        geo.read(by, group)
+        return list(geo.outliers(dist))
+
+    def test_latitude(self):
+        # at 60°N a degree of longitude is half as long, 5 items 2.2 km apart east-west are a denser block
+        # than 4 items at one point
+        geo = DamGeo(open_catalog(self.name))
+        for k, (lat, long) in enumerate([(60.0, 10.0 + 0.01 * k) for k in range(5)] + [(60.03, 10.02)] * 4):
+            geo.ids.append(k + 1)
+            geo.groups.append(1)
+            geo.lat.append(lat)
+            geo.long.append(long)
+        lat, long, n = geo.centres(1000.0)[1]
+        self.assertEqual(n, 5)
+        self.assertAlmostEqual(lat, 60.0, places=3)
+        self.assertAlmostEqual(long, 10.02, places=3)
+
+    def test_event(self):
+        found = self.outliers(1000.0)
+        self.assertEqual(sorted(o[0] for o in found), self.misplaced)
+        for img_id, key, d, centre, spread in found:
+            self.assertEqual(key, 2)
+            self.assertAlmostEqual(centre[0], 41.9028 + 0.0015, delta=0.002)
+            self.assertAlmostEqual(centre[1], 12.4964 - 0.001, delta=0.002)
+            self.assertLess(spread[0], 300.0)
+            self.assertEqual(spread[1], len(self.valid) - 2)
+        self.assertGreater(found[0][2], 5000.0)
+        self.assertEqual([o[0] for o in self.outliers(10000.0)], [self.misplaced[0]])
+
+    def test_component(self):
+        conn = sqlite3.connect(self.name)
+        geotagged = set(row[0] for row in conn.execute(
+            "SELECT i.id_mediaitem FROM image i JOIN mediaitems m ON m.id = i.id_mediaitem "
+            "WHERE m.deleted = 0 AND m.id_mediaformat IN (2, 3, 5)"))
+        clusters = {}
+        for a, b in conn.execute("SELECT id_frommediaitem, id_tomediaitem FROM mediaitems_link"):
+            clusters.setdefault(a, {a}).add(b)
+        first = min(a for a, members in clusters.items() if len(members & geotagged) >= 3 and a in geotagged and
+                    not members & set(self.misplaced))
+        moved = max(clusters[first] & geotagged)
+        conn.execute("UPDATE image SET gpslatitude = gpslatitude + 1.0 WHERE id_mediaitem = ?", (moved, ))
+        conn.commit()
+        conn.close()
+        found = self.outliers(1000.0, "component")
+        self.assertIn(moved, [o[0] for o in found])
+        for img_id, key, d, centre, spread in found:
+            self.assertTrue(img_id == moved or img_id in self.misplaced)
+            if img_id == moved:
+                self.assertEqual(key, first)
+                self.assertGreater(d, 100000.0)
+                self.assertEqual(spread[1], len(clusters[first] & geotagged) - 1)
+
+    def test_scan(self):
+        out = io.StringIO()
+        session = SessionParams(fullpath=True, print_id=True, outfile=out)
+        self.assertEqual(DamGeo(open_catalog(self.name)).ScanOutliers(session), 2)
+        lines = out.getvalue().splitlines()
+        self.assertEqual(lines[0], "Image\tGroup\tDistance\tCentre\tSpread")
+        p = lines[1].split("\t")
+        self.assertEqual(SessionParams._get_item_id(p[0]), self.misplaced[0])
+        self.assertEqual(p[1], "Travel|Rome 2017")
+        self.assertTrue(p[2].endswith(" m") and int(p[2][:-2]) > 9000000)
+        exfile = os.path.join(self.dir, "filter.ini")
+        with open(exfile, "w", encoding="utf-8") as f:
+            f.write("[Event]\nTravel|Rome 2017\n")
+        session = SessionParams(tagvaluefile=exfile, outfile=io.StringIO())
+        self.assertEqual(DamGeo(open_catalog(self.name)).ScanOutliers(session), 0)
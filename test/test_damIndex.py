@@ -0,0 +1,76 @@
+import io
+import os
+import sys
+import sqlite3
+from Daminion.SessionParams import SessionParams
+from Daminion.DamIndex import DamIndex, DamSelection, parse_terms
+from test.catalog_builder import CatalogTestCase, open_catalog
+import DamScan
+
+
+def scan(catalog):
+    out = io.StringIO()
+    DamScan.ScanCatalog(catalog, SessionParams(DamScan.alltags, print_id=True, outfile=out))
+    return out.getvalue().splitlines()[1:]
+
+
+class TestDamIndex(CatalogTestCase):
+
+    ITEMS = 300
+    SEED = 21
+
+    def tagged(self, sql):
+        conn = sqlite3.connect(self.name)
+        ids = sorted(set(row[0] for row in conn.execute(sql)))
+        conn.close()
+        return ids
+
+    def test_postings(self):
+        index = DamIndex(open_catalog(self.name)).build()
+        self.assertEqual(sorted(index.postings), ["Categories", "Collections", "Event", "Keywords", "People"])
+        self.assertEqual(list(index.postings["Keywords"][3]),
+                         self.tagged("SELECT id_mediaitem FROM keywords_file WHERE id_value = 3"))
+        self.assertEqual(list(index.postings["Event"][2]), self.tagged("SELECT id FROM mediaitems WHERE id_event = 2"))
+
+    def test_items(self):
+        index = DamIndex(open_catalog(self.name))
+        self.assertEqual(parse_terms(["Keywords=Animals|Birds|Gull", "Place=Rome", "Keywords", "Event=Travel|*"]),
+                         [("Keywords", "Animals|Birds|Gull"), ("Event", "Travel|*")])
+        self.assertEqual(index.value_ids("Keywords", "Animals|Birds|*"), [2, 3, 4])
+        self.assertEqual(index.items([("Keywords", "Animals|Birds|Gull")]),
+                         self.tagged("SELECT id_mediaitem FROM keywords_file WHERE id_value = 3"))
+        self.assertEqual(index.items([("Keywords", "Animals|Birds|*"), ("People", "Lintula|Anna")]),
+                         self.tagged("SELECT id_mediaitem FROM keywords_file WHERE id_value IN (2, 3, 4) UNION "
+                                     "SELECT id_mediaitem FROM people_file WHERE id_value = 3"))
+        self.assertEqual(index.items([("Event", "Travel|*")]),
+                         self.tagged("SELECT id FROM mediaitems WHERE id_event IN (1, 2, 3)"))
+        self.assertEqual(sorted(index.postings), ["Event", "Keywords", "People"])
+        self.assertEqual(index.items([("Keywords", "Animals|Dog")]), [])
+        self.assertIn("Animals|Dog", sys.stderr.getvalue())
+
+    def test_scan(self):
+        terms = [("Keywords", "Animals|Birds|Gull")]
+        selected = set(DamIndex(open_catalog(self.name)).items(terms))
+        selection = DamIndex(open_catalog(self.name)).select(terms)
+        self.assertIsInstance(selection, DamSelection)
+        self.assertTrue(selected < set(selection.ids))
+        full = scan(open_catalog(self.name))
+        found = scan(selection)
+        self.assertTrue(set(found) <= set(full))
+        involved = [line for line in full if SessionParams._get_item_id(line.split("\t")[0]) in selected or
+                    SessionParams._get_item_id(line.split("\t")[2]) in selected]
+        self.assertGreater(len(involved), 5)
+        self.assertTrue(set(involved) <= set(found))
+        self.assertLess(len(found), len(full))
+
+    def test_main(self):
+        report = os.path.join(self.dir, "report.txt")
+        argv = sys.argv
+        sys.argv = ["DamScan.py", "-l", "-i", "-c", self.name, "-o", report, "--values", "Keywords=Animals|Birds|Gull"]
+        try:
+            self.assertEqual(DamScan.main(), 0)
+        finally:
+            sys.argv = argv
+        with open(report, encoding="utf-8") as f:
+            lines = f.read().splitlines()
+        self.assertEqual(lines[2:], scan(DamIndex(open_catalog(self.name)).select([("Keywords", "Animals|Birds|Gull")])))
@@ -0,0 +1,87 @@
+import io
+import os
+import sys
+import sqlite3
+from Daminion.SessionParams import SessionParams
+from Daminion.DamImage import DamImage
+from Daminion.DamColumns import DamColumns, ColumnImage
+from Daminion.DamIntegrity import DamIntegrity, write_integrity
+from test.catalog_builder import CatalogTestCase, open_catalog
+import DamScan
+
+
+class TestDamIntegrity(CatalogTestCase):
+
+    ITEMS = 300
+    SEED = 12
+
+    def setUp(self):
+        CatalogTestCase.setUp(self)
+        conn = sqlite3.connect(self.name)
+        conn.execute("INSERT INTO keywords_file (id_mediaitem, id_value) "
+                     "SELECT id, 999 FROM mediaitems WHERE id % 19 = 0")
+        conn.execute("UPDATE mediaitems SET id_mediaformat = 77 WHERE id IN (3, 4)")
+        conn.execute("UPDATE mediaitems SET creationdatetime = 'x' WHERE id = 8")
+        conn.execute("INSERT INTO place_file (id_mediaitem, id_value) VALUES (4, 9999)")
+        conn.execute("UPDATE mediaitems SET deleted = 0 WHERE id IN (3, 4, 8)")
+        conn.commit()
+        conn.close()
+
+    def items(self):
+        conn = sqlite3.connect(self.name)
+        rows = conn.execute("SELECT id FROM mediaitems WHERE deleted = 0 ORDER BY id").fetchall()
+        conn.close()
+        return [row[0] for row in rows]
+
+    def test_check(self):
+        # the same errors as reading each item with DamImage
+        catalog = open_catalog(self.name)
+        session = SessionParams(DamScan.alltags)
+        expected = {"Invalid Media format": {3, 4}, "Invalid creation time": {8}, "Invalid Place": {4}}
+        for img_id in self.items():
+            img = DamImage(img_id, catalog, session)
+            if img._ImagePath == "<empty>":
+                expected.setdefault("No corresponding file entry", set()).add(img_id)
+            if img.Event == "–ERROR–":
+                expected.setdefault("Invalid Event", set()).add(img_id)
+            for tag in ["People", "Keywords", "Categories", "Collections"]:
+                if "–ERROR–" in getattr(img, tag):
+                    expected.setdefault("Invalid " + tag, set()).add(img_id)
+        self.assertEqual(sys.stderr.getvalue(), "")
+        self.assertGreater(len(expected["No corresponding file entry"]), 0)
+        self.assertGreater(len(expected["Invalid Event"]), 0)
+        found = DamIntegrity(catalog).check(samples=2)
+        self.assertEqual(sorted(name for name, items, rows, sample in found), sorted(expected))
+        for name, items, rows, sample in found:
+            self.assertEqual(items, len(expected[name]))
+            self.assertEqual([s[0] for s in sample], sorted(expected[name])[:2])
+        keywords = [sample for name, items, rows, sample in found if name == "Invalid Keywords"][0]
+        self.assertEqual([(img_id, v) for img_id, image, v in keywords], [(19, 999), (38, 999)])
+        out = io.StringIO()
+        write_integrity(found, out)
+        lines = out.getvalue().splitlines()
+        self.assertEqual(lines[0], "Check\tItems\tRows")
+        self.assertIn("Invalid Media format\t2\t2", lines)
+
+    def test_place(self):
+        # an invalid place id does not stop the scan
+        session = SessionParams(DamScan.alltags)
+        self.assertIn("–ERROR–", DamImage(4, open_catalog(self.name), session).Place)
+        self.assertIn("–ERROR–", ColumnImage(4, DamColumns(open_catalog(self.name)), session).Place)
+        DamScan.ScanCatalog(open_catalog(self.name), SessionParams(DamScan.alltags, outfile=io.StringIO()))
+
+    def test_main(self):
+        report = os.path.join(self.dir, "report.txt")
+        argv = sys.argv
+        sys.argv = ["DamScan.py", "-l", "-c", self.name, "-o", report, "--integrity", "1"]
+        try:
+            self.assertEqual(DamScan.main(), 0)
+        finally:
+            sys.argv = argv
+        with open(report, encoding="utf-8") as f:
+            lines = f.read().splitlines()
+        self.assertEqual(lines[1], "Check\tItems\tRows")
+        self.assertIn("Invalid Media format\t2\t2", lines)
+        img = DamImage(3, open_catalog(self.name), SessionParams(None))
+        n = lines.index("Invalid Media format:")
+        self.assertEqual(lines[n + 1:n + 3], ["3\t" + img._ImagePath + "\\" + img._ImageName + "\t77", "…"])
@@ -0,0 +1,82 @@
+import io
+import os
+import sys
+from Daminion.SessionParams import SessionParams
+from Daminion.DamColumns import DamColumns
+from Daminion.DamMemory import DamMemory, SUBSYSTEMS
+from test.catalog_builder import CatalogTestCase, create_catalog, open_catalog
+import DamScan
+import DamCompare
+
+# Recorded peak memory budgets per 100k items, in bytes, of the growth between a small and a large catalog.
+# The item by item scans grow by about 12 bytes per item, the columnar copy by about 310 bytes per item.
+# The merge join does not grow with the catalog size.
+SIZES = [200, 800]
+BUDGETS = {"scan": 2e6, "columnar": 40e6, "compare": 2e6, "merge": 2e6}
+
+
+class TestDamMemory(CatalogTestCase):
+
+    def setUp(self):
+        CatalogTestCase.setUp(self)
+        sys.stderr = open(os.devnull, "w")      # the error messages of the scans would be traced as output
+        self.names = []
+        for size in SIZES:
+            name = os.path.join(self.dir, "cat{}.dmc".format(size))
+            create_catalog(name, size, seed=5)
+            self.names.append(name)
+
+    def tearDown(self):
+        sys.stderr.close()
+        CatalogTestCase.tearDown(self)
+
+    def scan(self, mode, name):
+        with open(os.devnull, "w") as out:
+            if mode == "scan":
+                DamScan.ScanCatalog(open_catalog(name), SessionParams(DamScan.alltags, outfile=out))
+            elif mode == "columnar":
+                DamScan.ScanCatalog(DamColumns(open_catalog(name)), SessionParams(DamScan.alltags, outfile=out))
+            elif mode == "merge":       # more sort runs than are merged at a time
+                DamCompare.ScanMerge(open_catalog(name), open_catalog(name), SessionParams(None, outfile=out),
+                                     run_size=2)
+            else:
+                DamCompare.ScanCatalog(open_catalog(name), open_catalog(name), SessionParams(None, outfile=out))
+
+    def test_budget(self):
+        for mode, budget in BUDGETS.items():
+            peaks = []
+            for name in self.names:
+                memory = DamMemory(frames=1)
+                try:
+                    self.scan(mode, name)
+                    memory.checkpoint(mode)
+                finally:
+                    memory.stop()
+                peaks.append(memory.peak)
+            per_100k = (peaks[1] - peaks[0]) / (SIZES[1] - SIZES[0]) * 100000
+            self.assertLess(per_100k, budget, mode)
+
+    def test_subsystems(self):
+        memory = DamMemory()
+        try:
+            catalog = DamColumns(open_catalog(self.names[0]))
+            opened = memory.checkpoint("catalog")
+            out = io.StringIO()
+            session = SessionParams(DamScan.alltags, tagvaluefile="test/test_filter.ini",
+                                    filter_pairs="test/test_pairs.ini", outfile=out)
+            filters = memory.checkpoint("session")
+            DamScan.ScanCatalog(catalog, session)
+            scanned = memory.checkpoint("scan")
+        finally:
+            memory.stop()
+        self.assertGreater(opened["constants"], 1000)
+        self.assertGreater(opened["items"], 10000)
+        self.assertGreater(filters["filters"], opened["filters"])
+        self.assertGreater(scanned["output"], len(out.getvalue()))
+        self.assertEqual([c[0] for c in memory.checkpoints], ["catalog", "session", "scan"])
+        self.assertGreaterEqual(memory.peak, max(c[2] for c in memory.checkpoints))
+        report = io.StringIO()
+        memory.write(report)
+        lines = report.getvalue().splitlines()
+        self.assertEqual(lines[0].split("\t"), ["Memory (KiB)", "Peak", "Current"] + SUBSYSTEMS)
+        self.assertEqual(lines[3].split("\t")[0], "scan")
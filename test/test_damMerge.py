@@ -0,0 +1,90 @@
+import io
+import os
+import sys
+import random
+import shutil
+import sqlite3
+from Daminion.SessionParams import SessionParams
+from Daminion.DamMerge import external_sort, merge_join, items, files
+from test.catalog_builder import CatalogTestCase, create_catalog, open_catalog
+import DamCompare
+
+
+def compare(scan, name1, name2, **kw):
+    out = io.StringIO()
+    scan(open_catalog(name1), open_catalog(name2), SessionParams(None, print_id=True, outfile=out, **kw))
+    return out.getvalue()
+
+
+class TestDamMerge(CatalogTestCase):
+
+    def setUp(self):
+        CatalogTestCase.setUp(self)
+        self.name1 = os.path.join(self.dir, "cat1.dmc")
+        self.name2 = os.path.join(self.dir, "cat2.dmc")
+        create_catalog(self.name1, 300, seed=8)
+        shutil.copy(self.name1, self.name2)
+        conn = sqlite3.connect(self.name2)
+        conn.execute("UPDATE subject SET title = 'Changed' WHERE id_mediaitem % 7 = 0")
+        conn.execute("UPDATE files SET relativepath = 'Moved' WHERE id_mediaitem % 11 = 0")
+        conn.execute("UPDATE mediaitems SET deleted = 1 WHERE id % 13 = 0")
+        conn.execute("UPDATE files SET filename = 'IMG_0004.NEF' WHERE id_mediaitem = 40")     # two items, one file
+        conn.commit()
+        conn.close()
+        conn = sqlite3.connect(self.name1)
+        conn.execute("INSERT INTO files (id_mediaitem, filename, relativepath) "
+                     "SELECT id_mediaitem, filename, 'Ä' || relativepath FROM files WHERE id_mediaitem % 17 = 0")
+        conn.commit()
+        conn.close()
+
+    def test_external_sort(self):
+        rng = random.Random(3)
+        rows = [(rng.choice(["a", "b", "Ä", "ö"]), str(rng.random()), i) for i in range(5000)]
+        self.assertEqual(list(external_sort(rows, run_size=100, fanin=4)), sorted(rows))
+        self.assertEqual(list(external_sort(rows, run_size=10000)), sorted(rows))
+        self.assertEqual(list(external_sort([], run_size=10)), [])
+
+    def test_merge_join(self):
+        rows1 = [("a", "1", 1), ("a", "1", 1), ("a", "2", 2), ("b", "1", 3)]
+        rows2 = [("a", "0", 9), ("a", "2", 7), ("a", "2", 8), ("c", "1", 6)]
+        self.assertEqual(list(merge_join(rows1, rows2)),
+                         [("a", "1", 1, None), ("a", "2", 2, 7), ("b", "1", 3, None)])
+
+    def test_streams(self):
+        conn = sqlite3.connect(self.name2)
+        expected = conn.execute("SELECT relativepath, f.filename, id_mediaitem FROM files f JOIN mediaitems m "
+                                "ON m.id = id_mediaitem WHERE deleted = 0").fetchall()
+        unfiled = conn.execute("SELECT '<empty>', filename, id FROM mediaitems WHERE deleted = 0 AND id NOT IN "
+                               "(SELECT id_mediaitem FROM files)").fetchall()
+        conn.close()
+        self.assertGreater(len(unfiled), 0)
+        self.assertEqual(list(files(open_catalog(self.name2), run_size=16)), sorted(expected))
+        self.assertEqual(list(items(open_catalog(self.name2), run_size=16)), sorted(expected + unfiled))
+
+    def test_scan(self):
+        expected = compare(DamCompare.ScanCatalog, self.name1, self.name2)
+        self.assertGreater(expected.count("\n"), 20)
+        self.assertIn("–", expected)
+        for run_size in [10, 100000]:
+            scan = lambda c1, c2, session: DamCompare.ScanMerge(c1, c2, session, run_size=run_size)
+            self.assertEqual(compare(scan, self.name1, self.name2), expected)
+            self.assertEqual(compare(scan, self.name2, self.name1), compare(DamCompare.ScanCatalog, self.name2,
+                                                                            self.name1))
+            self.assertEqual(compare(scan, self.name1, self.name2, exdir=["2019"]),
+                             compare(DamCompare.ScanCatalog, self.name1, self.name2, exdir=["2019"]))
+
+    def test_main(self):
+        reports = [os.path.join(self.dir, name) for name in ["scan.txt", "merge.txt"]]
+        argv = sys.argv
+        try:
+            for report, args in zip(reports, [[], ["--merge"]]):
+                sys.argv = ["DamCompare.py", "-l", "-i", "-c1", self.name1, "-c2", self.name2, "-o", report] + args
+                self.assertEqual(DamCompare.main(), 0)
+        finally:
+            sys.argv = argv
+        lines = []
+        for report in reports:
+            with open(report, encoding="utf-8") as f:
+                lines.append(f.read().splitlines()[1:])
+        self.assertGreater(len(lines[0]), 20)
+        self.assertEqual(lines[1], lines[0])
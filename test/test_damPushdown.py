@@ -0,0 +1,77 @@
+import io
+import os
+import sqlite3
+from Daminion.SessionParams import SessionParams
+from Daminion.DamPushdown import DamPushdown
+from test.catalog_builder import CatalogTestCase, open_catalog
+import DamScan
+
+
+def multi_value_lines(report):
+    return sorted(l for l in report.splitlines()
+                  if len(l.split("\t")) > 3 and l.split("\t")[3] in ["People", "Keywords", "Categories",
+                                                                     "Collections"])
+
+
+class TestDamPushdown(CatalogTestCase):
+
+    ITEMS = 300
+    SEED = 7
+
+    def setUp(self):
+        CatalogTestCase.setUp(self)
+        self.exfile = os.path.join(self.dir, "filter.ini")
+        with open(self.exfile, "w", encoding="utf-8") as f:
+            f.write("[Keywords]\nNature\n\n[People]\nLintula|Juha\n")
+        self.pairs = os.path.join(self.dir, "pairs.txt")
+        with open(self.pairs, "w", encoding="utf-8") as f:
+            f.write("IMG_0001.NEF (1)\t>\tIMG_0001.jpg (2)\tKeywords\t'City'\n"
+                    "IMG_0005.jpg (6)\t<\tIMG_0005.NEF (5)\tPeople\t'Lintula|Anna'\n")
+
+    def run_both(self, **kw):
+        reports = []
+        for scan in [DamScan.ScanCatalog, DamScan.ScanPushdown]:
+            out = io.StringIO()
+            session = SessionParams(DamScan.alltags, print_id=True, outfile=out, **kw)
+            scan(open_catalog(self.name), session)
+            reports.append(out.getvalue())
+        return reports
+
+    def test_links(self):
+        full, pushdown = self.run_both()
+        self.assertNotEqual(multi_value_lines(full), [])
+        self.assertEqual(multi_value_lines(pushdown), multi_value_lines(full))
+        self.assertEqual(sorted(pushdown.splitlines()), sorted(full.splitlines()))
+        # the same lines, the multi-value tag lines after the others
+        lines = pushdown.splitlines()
+        n = len(lines) - len(multi_value_lines(pushdown))
+        self.assertEqual(lines[:n], [l for l in full.splitlines() if l not in multi_value_lines(full)])
+        self.assertEqual(sorted(lines[n:]), multi_value_lines(full))
+
+    def test_groups_and_filters(self):
+        for kw in [dict(group=True), dict(tagvaluefile=self.exfile), dict(tagvaluefile=self.exfile, only_tags=True),
+                   dict(filter_pairs=self.pairs, fullpath=True)]:
+            full, pushdown = self.run_both(**kw)
+            self.assertEqual(multi_value_lines(pushdown), multi_value_lines(full))
+
+    def test_query(self):
+        catalog = open_catalog(self.name)
+        pushdown = DamPushdown(catalog)
+        sql = pushdown.query("Keywords", SessionParams().filter_list, False)
+        self.assertIn("NOT EXISTS (SELECT 1 FROM keywords_file m", sql)
+        self.assertIn("mediaitems_link", sql)
+        self.assertIn("id_topmediaitemstack", pushdown.query("People", SessionParams().filter_list, True))
+
+    def test_missing_values(self):
+        # the values missing from the value table are all –ERROR–, different missing ids are not differences
+        conn = sqlite3.connect(self.name)
+        a, b = conn.execute("SELECT id_frommediaitem, id_tomediaitem FROM mediaitems_link ORDER BY 1").fetchone()
+        conn.execute("INSERT INTO keywords_file VALUES (?, 998)", (a, ))
+        conn.execute("INSERT INTO keywords_file VALUES (?, 999)", (b, ))
+        conn.commit()
+        conn.close()
+        full, pushdown = self.run_both()
+        self.assertEqual(multi_value_lines(pushdown), multi_value_lines(full))
+        pair = ["({})".format(a), "({})".format(b)]
+        self.assertEqual([l for l in multi_value_lines(pushdown) if "–ERROR–" in l and
+                          sorted(p.split(" ")[-1] for p in l.split("\t")[0:3:2]) == pair], [])
@@ -0,0 +1,95 @@
+import io
+import os
+import sqlite3
+from collections import Counter
+from Daminion.SessionParams import SessionParams
+from Daminion.DamSample import DamSample, wilson, write_estimates
+from test.catalog_builder import CatalogTestCase, create_catalog, open_catalog, counting_catalog
+import DamScan
+import DamCompare
+
+
+class TestDamSample(CatalogTestCase):
+
+    ITEMS = 300
+    SEED = 11
+
+    def setUp(self):
+        CatalogTestCase.setUp(self)
+        conn = sqlite3.connect(self.name)
+        conn.execute("UPDATE mediaitems SET deleted = 1 WHERE id % 10 = 3")
+        conn.execute("UPDATE mediaitems SET deleted = NULL WHERE id % 10 = 5")     # not deleted, as bool(None)
+        conn.commit()
+        conn.close()
+
+    def test_sample(self):
+        catalog = open_catalog(self.name)
+        valid = set(row[0] for row in catalog.catalog.fetchall("SELECT id FROM mediaitems WHERE deleted = 0 OR "
+                                                               "deleted IS NULL"))
+        sample = DamSample(catalog, 50, seed=7)
+        self.assertEqual(len(sample.ids), 50)
+        self.assertEqual(sample.ids, sorted(sample.ids))
+        self.assertTrue(set(sample.ids) <= valid)
+        self.assertEqual(sample.population, len(valid))
+        self.assertEqual(DamSample(catalog, 50, seed=7).ids, sample.ids)
+        self.assertNotEqual(DamSample(catalog, 50, seed=8).ids, sample.ids)
+        self.assertEqual(len(DamSample(catalog, fraction=0.1, seed=7).ids), round(0.1 * len(valid)))
+        self.assertEqual(DamSample(catalog, 10 * len(valid)).ids, sorted(valid))
+        self.assertEqual([img._id for img in sample.NextImage(sample, SessionParams())], sample.ids)
+        catalog = counting_catalog(self.name)
+        DamSample(catalog, 200, seed=7)
+        self.assertEqual(sum(catalog.catalog.conn.counts.values()), 1)     # the ids are read with one query
+
+    def test_wilson(self):
+        low, high = wilson(10, 100)
+        self.assertTrue(0.05 < low < 0.1 < high < 0.18)
+        self.assertEqual(wilson(0, 0), (0.0, 1.0))
+        self.assertAlmostEqual(wilson(0, 50)[0], 0.0)
+        self.assertAlmostEqual(wilson(50, 50)[1], 1.0)
+        self.assertEqual(wilson(10, 100, 100), (0.1, 0.1))
+        narrow = wilson(10, 100, 200)
+        self.assertTrue(low < narrow[0] < narrow[1] < high)
+
+    def test_scan(self):
+        # the whole catalog as the sample gives the exact rates of the full report
+        out = io.StringIO()
+        session = SessionParams(DamScan.alltags, print_id=True, outfile=out)
+        DamScan.ScanCatalog(open_catalog(self.name), session)
+        expected = Counter()
+        items = set()
+        for line in out.getvalue().splitlines()[1:]:
+            p = line.split("\t")
+            items.add((p[0], p[3]))
+        for item, tag in items:
+            expected[tag] += 1
+        sample = DamSample(open_catalog(self.name), 10000)
+        counts, checked = DamScan.ScanSample(sample, session)
+        self.assertEqual(counts, expected)
+        self.assertIs(session.outfile, out)
+        self.assertTrue(0 < checked < len(sample.ids))
+
+    def test_compare(self):
+        name2 = os.path.join(self.dir, "cat2.dmc")
+        create_catalog(name2, 300, seed=12)
+        out = io.StringIO()
+        session = SessionParams(outfile=out, print_id=True)
+        DamCompare.ScanCatalog(open_catalog(self.name), open_catalog(name2), session)
+        expected = Counter()
+        for line in out.getvalue().splitlines()[1:]:
+            p = line.split("\t")
+            expected.update(p[3].split(", ") if len(p) > 3 else [])
+        sample = DamSample(open_catalog(self.name), 10000)
+        counts, checked = DamCompare.CompareSample(sample, open_catalog(name2), session)
+        self.assertEqual(counts, expected)
+        catalog = open_catalog(self.name)
+        self.assertEqual(checked, sum(1 for img in catalog.NextImage(catalog, session) if img.isvalid))
+
+    def test_write(self):
+        sample = DamSample(open_catalog(self.name), 20, seed=3)
+        out = io.StringIO()
+        write_estimates(Counter({"Event": 2, "Name": 1}), 20, sample, out, ["Event", "Place"])
+        lines = out.getvalue().splitlines()
+        self.assertEqual(lines[0], "Sample of 20 items of {} (seed 3), 20 checked".format(sample.population))
+        self.assertEqual(lines[1], "Tag\tItems\tRate\t95% CI\tEstimated items")
+        self.assertEqual([line.split("\t")[:3] for line in lines[2:]],
+                         [["Event", "2", "10.00%"], ["Place", "0", "0.00%"], ["Name", "1", "5.00%"]])
@@ -0,0 +1,66 @@
+import io
+import sqlite3
+from Daminion.SessionParams import SessionParams
+from Daminion.DamColumns import DamColumns, ColumnImage
+from test.catalog_builder import CatalogTestCase, open_catalog
+import DamScan
+
+
+def scan_components(catalog, **kw):
+    out = io.StringIO()
+    session = SessionParams(DamScan.alltags, print_id=True, outfile=out, **kw)
+    DamScan.ScanComponents(catalog, session)
+    return out.getvalue()
+
+
+class TestScanComponents(CatalogTestCase):
+
+    ITEMS = 200
+    SEED = 5
+
+    def test_columnar(self):
+        expected = scan_components(open_catalog(self.name))
+        self.assertEqual(scan_components(DamColumns(open_catalog(self.name))), expected)
+        self.assertEqual(scan_components(DamColumns(open_catalog(self.name)), group=True),
+                         scan_components(open_catalog(self.name), group=True))
+
+    def test_missing_values(self):
+        # brute force: union of the values in each link component minus the values of the item
+        cat = DamColumns(open_catalog(self.name))
+        session = SessionParams()
+        valid = dict((i, ColumnImage(i, cat, session)) for i in cat.ids)
+        valid = dict((i, img) for i, img in valid.items() if img.isvalid)
+        parent = dict((i, i) for i in valid)
+
+        def find(i):
+            while parent[i] != i:
+                i = parent[i]
+            return i
+        conn = sqlite3.connect(self.name)
+        for a, b in conn.execute("SELECT id_frommediaitem, id_tomediaitem FROM mediaitems_link"):
+            if a in valid and b in valid:
+                parent[find(a)] = find(b)
+        conn.close()
+        components = {}
+        for i in valid:
+            components.setdefault(find(i), []).append(i)
+        expected = set()
+        for members in components.values():
+            if len(members) < 2:
+                continue
+            for tag in ["People", "Keywords", "Categories", "Collections"]:
+                union = set()
+                for i in members:
+                    union |= set(valid[i].GetTags(tag))
+                for i in members:
+                    for v in union - set(valid[i].GetTags(tag)):
+                        expected.add((i, min(members), tag, v))
+
+        found = set()
+        for line in scan_components(cat).splitlines():
+            p = line.split("\t")
+            if p[1] == "*":
+                for v in p[4].split(", "):
+                    found.add((SessionParams._get_item_id(p[0]), SessionParams._get_item_id(p[2]), p[3], v[1:-1]))
+        self.assertNotEqual(expected, set())
+        self.assertEqual(found, expected)
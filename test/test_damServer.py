@@ -0,0 +1,151 @@
+import io
+import json
+import time
+import sqlite3
+import threading
+import urllib.request
+import urllib.error
+from concurrent.futures import ThreadPoolExecutor
+from Daminion.SessionParams import SessionParams
+from Daminion.DamServer import DamServer, record
+from test.catalog_builder import CatalogTestCase, open_catalog
+import DamScan
+
+
+class TestDamServer(CatalogTestCase):
+
+    ITEMS = 300
+    SEED = 9
+
+    def setUp(self):
+        CatalogTestCase.setUp(self)
+        self.session = SessionParams(DamScan.alltags, print_id=True, tagvaluefile="test/test_filter.ini")
+        self.server = DamServer(open_catalog(self.name), self.session, DamScan.CheckImage)
+        self.port = self.server.start()
+        self.thread = threading.Thread(target=self.server.httpd.serve_forever, daemon=True)
+        self.thread.start()
+
+    def tearDown(self):
+        self.server.httpd.shutdown()
+        self.thread.join()
+        self.server.close()
+        CatalogTestCase.tearDown(self)
+
+    def get(self, request):
+        try:
+            with urllib.request.urlopen("http://127.0.0.1:{}{}".format(self.port, request)) as answer:
+                return answer.status, json.loads(answer.read().decode("utf-8"))
+        except urllib.error.HTTPError as error:
+            return error.code, json.loads(error.read().decode("utf-8"))
+
+    def expected(self, ids):
+        # the lines a scan of the whole catalog reports for the items
+        out = io.StringIO()
+        DamScan.ScanCatalog(open_catalog(self.name), SessionParams(DamScan.alltags, print_id=True,
+                                                                   tagvaluefile="test/test_filter.ini", outfile=out))
+        return [line for line in out.getvalue().splitlines()[1:] if SessionParams._get_item_id(line) in ids]
+
+    def linked_items(self):
+        conn = sqlite3.connect(self.name)
+        rows = conn.execute("SELECT DISTINCT id_frommediaitem FROM mediaitems_link JOIN mediaitems "
+                            "ON id_frommediaitem = mediaitems.id WHERE deleted = 0 ORDER BY 1").fetchall()
+        conn.close()
+        return [row[0] for row in rows]
+
+    def deleted_item(self):
+        conn = sqlite3.connect(self.name)
+        row = conn.execute("SELECT min(id) FROM mediaitems WHERE deleted = 1").fetchone()
+        conn.close()
+        return row[0]
+
+    def test_record(self):
+        self.assertEqual(record("a.jpg (1)\t<>\tb.jpg (2)\tEvent\t'x'\t<>\t'y'\n"),
+                         {"a": "a.jpg (1)", "a_id": 1, "dir": "<>", "b": "b.jpg (2)", "b_id": 2, "tag": "Event",
+                          "values": ["'x'", "<>", "'y'"]})
+        self.assertEqual(record("a.jpg (1)\t<>\tb.jpg (2)\tName")["values"], [])
+
+    def test_check(self):
+        ids = self.linked_items()[:20]
+        expected = self.expected(set(ids))
+        self.assertGreater(len(expected), 5)
+        found = []
+        for img_id in ids:
+            status, answer = self.get("/check?id={}".format(img_id))
+            self.assertEqual(status, 200)
+            self.assertEqual(answer["items"], [img_id])
+            self.assertTrue(all(r["a_id"] == img_id for r in answer["records"]))
+            found += [line for line in self.server.findings([img_id])]
+        self.assertEqual(found, expected)
+        status, answer = self.get("/check?id=x")
+        self.assertEqual(status, 400)
+        for img_id in [99999, self.deleted_item()]:
+            status, answer = self.get("/check?id={}".format(img_id))
+            self.assertEqual(status, 404)
+        status, answer = self.get("/health")
+        self.assertEqual((status, answer["items"]), (200, 300))
+
+    def test_component(self):
+        img_id = self.linked_items()[0]
+        status, answer = self.get("/component?id={}".format(img_id))
+        self.assertEqual(status, 200)
+        self.assertIn(img_id, answer["items"])
+        self.assertGreater(len(answer["items"]), 1)
+        self.assertEqual(["\t".join([r["a"], r["dir"], r["b"], r["tag"]] + r["values"]) for r in answer["records"]],
+                         self.server.findings([img_id] + [i for i in answer["items"] if i != img_id]))
+        self.assertEqual(sorted(set(r["a_id"] for r in answer["records"])),
+                         sorted(set(SessionParams._get_item_id(line) for line in self.expected(set(answer["items"])))))
+
+    def test_concurrent(self):
+        ids = self.linked_items()[:40]
+        serial = dict((i, self.get("/check?id={}".format(i))[1]["records"]) for i in ids)
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            answers = list(executor.map(lambda i: self.get("/check?id={}".format(i)), ids))
+        elapsed = time.perf_counter() - start
+        for img_id, (status, answer) in zip(ids, answers):
+            self.assertEqual(status, 200)
+            self.assertEqual(answer["records"], serial[img_id])
+        self.assertLess(elapsed / len(ids), 0.05)
+
+    def test_refresh(self):
+        img_id = self.linked_items()[0]
+        status, before = self.get("/check?id={}".format(img_id))
+        generation = self.get("/health")[1]["generation"]
+        conn = sqlite3.connect(self.name)
+        other = conn.execute("SELECT id_tomediaitem FROM mediaitems_link WHERE id_frommediaitem = ?",
+                             (img_id, )).fetchone()[0]
+        conn.execute("UPDATE mediaitems SET id_event = NULL WHERE id = ?", (other, ))
+        conn.execute("DELETE FROM mediaitems_link WHERE id_frommediaitem = ? AND id_tomediaitem <> ?",
+                     (img_id, other))
+        conn.commit()
+        conn.close()
+        status, after = self.get("/component?id={}".format(img_id))
+        self.assertEqual(self.get("/health")[1]["generation"], generation + 1)
+        self.assertNotEqual([r for r in after["records"] if r["a_id"] == img_id], before["records"])
+        self.assertEqual([r for r in after["records"] if r["a_id"] == img_id],
+                         [record(line) for line in self.expected({img_id})])
+
+    def test_background_refresh(self):
+        # a server catalog has no data_version: the index is read again in the background, not in a request
+        catalog = open_catalog(self.name)
+        catalog.catalog.data_version = lambda: None
+        server = DamServer(catalog, self.session, DamScan.CheckImage, max_age=0.1)
+        read_index = server._read_index
+
+        def slow_read():
+            time.sleep(0.5)
+            return read_index()
+
+        server._read_index = slow_read
+        server.start()
+        try:
+            img_id = self.linked_items()[0]
+            generation = server._generation
+            while server._generation < generation + 2:       # the requests do not wait for the rereads
+                start = time.perf_counter()
+                self.assertEqual(server.handle("/component", {"id": [str(img_id)]})[0], 200)
+                self.assertLess(time.perf_counter() - start, 0.25)
+                time.sleep(0.05)
+            self.assertEqual(server.handle("/health", {})[1]["items"], 300)
+        finally:
+            server.close()
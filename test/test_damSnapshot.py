@@ -0,0 +1,81 @@
+import io
+import os
+import sys
+import sqlite3
+from Daminion.SessionParams import SessionParams
+from Daminion.DamColumns import DamColumns
+from Daminion.DamSnapshot import DamSnapshot, StringTable
+from test.catalog_builder import CatalogTestCase, open_catalog
+import DamScan
+import DamCompare
+
+
+def scan(catalog):
+    out = io.StringIO()
+    DamScan.ScanCatalog(catalog, SessionParams(DamScan.alltags, print_id=True, outfile=out))
+    return out.getvalue()
+
+
+class TestDamSnapshot(CatalogTestCase):
+
+    ITEMS = 300
+    SEED = 11
+
+    def setUp(self):
+        CatalogTestCase.setUp(self)
+        conn = sqlite3.connect(self.name)
+        conn.execute("UPDATE subject SET title = 'Äänekoski ✓' WHERE id_mediaitem % 9 = 0")
+        conn.commit()
+        conn.close()
+        self.snapshot = os.path.join(self.dir, "cat.snap")
+        DamSnapshot.export(DamColumns(open_catalog(self.name)), self.snapshot)
+
+    def test_columns(self):
+        columns = DamColumns(open_catalog(self.name))
+        snapshot = DamSnapshot(self.snapshot)
+        self.assertTrue(DamSnapshot.is_snapshot(self.snapshot))
+        self.assertFalse(DamSnapshot.is_snapshot(self.name))
+        self.assertFalse(DamSnapshot.is_snapshot("NetCatalog"))
+        for attr in ["ids", "deleted", "event", "mediaformat", "ctime", "top", "path", "gps", "isimage"]:
+            self.assertEqual(list(getattr(snapshot, attr)), list(getattr(columns, attr)), attr)
+        for attr in ["names", "paths", "title", "description", "comments"]:
+            self.assertIsInstance(getattr(snapshot, attr), StringTable)
+            self.assertEqual([getattr(snapshot, attr)[i] for i in range(len(getattr(columns, attr)))],
+                             getattr(columns, attr), attr)
+        for tag in columns.tags:
+            self.assertEqual([list(a) for a in snapshot.tags[tag]], [list(a) for a in columns.tags[tag]], tag)
+        self.assertEqual([list(a) for a in snapshot.stack], [list(a) for a in columns.stack])
+        for c in ["MediaList", "EventList", "PlaceList", "PeopleList", "KeywordList", "CategoryList",
+                  "CollectionList"]:
+            self.assertEqual(getattr(snapshot, c), getattr(columns, c), c)
+        self.assertIn("Äänekoski ✓", [snapshot.title[i] for i in range(len(snapshot.ids))])
+        self.assertEqual(snapshot.title[-1], columns.title[-1])
+
+    def test_scan(self):
+        self.assertEqual(scan(DamSnapshot(self.snapshot)), scan(DamColumns(open_catalog(self.name))))
+        expected = io.StringIO()
+        DamCompare.ScanCatalog(DamColumns(open_catalog(self.name)), DamColumns(open_catalog(self.name)),
+                               SessionParams(None, print_id=True, outfile=expected))
+        found = io.StringIO()
+        DamCompare.ScanCatalog(DamSnapshot(self.snapshot), DamColumns(open_catalog(self.name)),
+                               SessionParams(None, print_id=True, outfile=found))
+        self.assertEqual(found.getvalue().splitlines()[1:], expected.getvalue().splitlines()[1:])
+
+    def test_main(self):
+        exported = os.path.join(self.dir, "main.snap")
+        reports = [os.path.join(self.dir, name) for name in ["db.txt", "snap.txt"]]
+        argv = sys.argv
+        try:
+            for args in [["-l", "-c", self.name, "--export-snapshot", exported],
+                         ["-l", "-i", "-m", "-c", self.name, "-o", reports[0]],
+                         ["-i", "-c", exported, "-o", reports[1]]]:
+                sys.argv = ["DamScan.py"] + args
+                self.assertEqual(DamScan.main(), 0)
+        finally:
+            sys.argv = argv
+        lines = []
+        for report in reports:
+            with open(report, encoding="utf-8") as f:
+                lines.append(f.read().splitlines()[1:])
+        self.assertGreater(len(lines[0]), 10)
+        self.assertEqual(lines[1], lines[0])
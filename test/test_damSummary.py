@@ -0,0 +1,74 @@
+import io
+import os
+import json
+from collections import Counter
+from Daminion.SessionParams import SessionParams
+from Daminion.DamColumns import DamColumns
+from Daminion.DamSummary import DamSummary, write_summary
+from test.catalog_builder import CatalogTestCase, create_catalog, open_catalog
+import DamScan
+import DamCompare
+
+
+def count_report(report, tagfield=3):
+    # (folder, tag) counts of a full report made with fullpath
+    counts = Counter()
+    for line in report.splitlines()[1:]:
+        p = line.split("\t")
+        folder = p[0].rsplit("\\", maxsplit=1)[0]
+        for tag in p[tagfield].split(", ") if len(p) > tagfield else [""]:
+            counts[(folder, tag)] += 1
+    return counts
+
+
+class TestDamSummary(CatalogTestCase):
+
+    ITEMS = 300
+    SEED = 9
+
+    def setUp(self):
+        CatalogTestCase.setUp(self)
+        self.exfile = os.path.join(self.dir, "filter.ini")
+        with open(self.exfile, "w", encoding="utf-8") as f:
+            f.write("[Keywords]\nNature\n\n[Event]\nTravel|Rome 2017\n\n[Title]\nOther\n")
+        self.pairs = os.path.join(self.dir, "pairs.txt")
+        with open(self.pairs, "w", encoding="utf-8") as f:
+            f.write("IMG_0001.NEF (1)\t>\tIMG_0001.jpg (2)\tKeywords\t'City'\n"
+                    "IMG_0001.NEF (1)\t<>\tIMG_0001.jpg (2)\tGPS\n")
+
+    def test_scan(self):
+        for kw in [dict(), dict(group=True), dict(tagvaluefile=self.exfile),
+                   dict(tagvaluefile=self.exfile, only_tags=True), dict(filter_pairs=self.pairs),
+                   dict(comp_name=["-", "_"]), dict(dist_tolerance=50.0, alt_tolerance=1.0)]:
+            out = io.StringIO()
+            session = SessionParams(DamScan.alltags, fullpath=True, print_id=True, outfile=out, **kw)
+            DamScan.ScanCatalog(open_catalog(self.name), session)
+            expected = count_report(out.getvalue())
+            self.assertNotEqual(expected, Counter())
+            self.assertEqual(DamSummary(open_catalog(self.name)).ScanSummary(session), expected, kw)
+        self.assertEqual(DamSummary(DamColumns(open_catalog(self.name))).ScanSummary(session), expected)
+
+    def test_compare(self):
+        name2 = os.path.join(self.dir, "cat2.dmc")
+        create_catalog(name2, 300, seed=10)
+        out = io.StringIO()
+        session = SessionParams(fullpath=True, outfile=out)
+        DamCompare.ScanCatalog(open_catalog(self.name), open_catalog(name2), session)
+        counts = DamCompare.CompareSummary(DamColumns(open_catalog(self.name)), DamColumns(open_catalog(name2)),
+                                           session)
+        self.assertEqual(counts, count_report(out.getvalue()))
+
+    def test_write(self):
+        counts = Counter({("2017\\Rome", "Event"): 2, ("2017\\Rome", "Keywords"): 3, ("2019", "Name"): 1})
+        out = io.StringIO()
+        write_summary(counts, out, ["Event", "Place", "Keywords"])
+        self.assertEqual(out.getvalue(), "Folder\tEvent\tKeywords\tName\tTotal\n"
+                                         "2017\\Rome\t2\t3\t0\t5\n"
+                                         "2019\t0\t0\t1\t1\n"
+                                         "Total\t2\t3\t1\t6\n")
+        out = io.StringIO()
+        write_summary(counts, out, ["Event", "Place", "Keywords"], "json")
+        self.assertEqual(json.loads(out.getvalue()),
+                         {"folders": {"2017\\Rome": {"Event": 2, "Keywords": 3, "Total": 5},
+                                      "2019": {"Name": 1, "Total": 1}},
+                          "total": {"Event": 2, "Keywords": 3, "Name": 1, "Total": 6}})
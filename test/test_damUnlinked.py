@@ -0,0 +1,132 @@
+import io
+import os
+import sqlite3
+from Daminion.SessionParams import SessionParams
+from Daminion.DamImage import DamImage
+from Daminion.DamColumns import DamColumns
+from Daminion.DamUnlinked import DamUnlinked
+from Daminion.DamBaseline import UNLINKED
+from test.catalog_builder import CatalogTestCase, open_catalog
+import DamScan
+
+
+class TestDamUnlinked(CatalogTestCase):
+
+    ITEMS = 400
+    SEED = 13
+
+    def setUp(self):
+        CatalogTestCase.setUp(self)
+        conn = sqlite3.connect(self.name)
+        conn.execute("DELETE FROM mediaitems_link WHERE id % 3 = 0")
+        conn.execute("UPDATE mediaitems SET id_topmediaitemstack = id WHERE id % 5 = 0")
+        conn.commit()
+        conn.close()
+        self.columns = DamColumns(open_catalog(self.name))
+
+    def connected(self, group):
+        # item id: ids of its component, by a breadth first search
+        db = self.columns
+        edges = {}
+        for r in range(len(db.ids)):
+            if group:
+                t = db.row(db.top[r])
+                others = [t] if t >= 0 else []
+            else:
+                offsets, rows = db.links_to
+                others = rows[offsets[r]:offsets[r + 1]]
+            for s in others:
+                edges.setdefault(r, set()).add(s)
+                edges.setdefault(s, set()).add(r)
+        component = {}
+        for r in range(len(db.ids)):
+            if r in component:
+                continue
+            members = {r}
+            todo = [r]
+            while todo:
+                for s in edges.get(todo.pop(), ()):
+                    if s not in members:
+                        members.add(s)
+                        todo.append(s)
+            for s in members:
+                component[s] = members
+        return component
+
+    def check(self, session, keys):
+        db = self.columns
+        where = {}
+        for g, parts in enumerate(DamUnlinked(db).groups(session, keys)):
+            for p, part in enumerate(parts):
+                for r in part:
+                    where[r] = (g, p)
+        component = self.connected(session.group)
+        valid = [r for r in range(len(db.ids)) if not db.deleted[r] and db.isimage[r] and db.path[r] >= 0]
+
+        def key(r):
+            k = (DamImage.base_name(db.names[r], session.comp_name), )
+            if "time" in keys:
+                k += (db.ctime[r], )
+            if "folder" in keys:
+                k += (db.path[r], )
+            return k
+
+        unlinked = set()
+        for i, a in enumerate(valid):
+            for b in valid[i + 1:]:
+                if key(a) != key(b):
+                    self.assertFalse(a in where and b in where and where[a][0] == where[b][0])
+                elif b in component[a]:
+                    self.assertEqual(where.get(a), where.get(b))
+                else:
+                    self.assertEqual(where[a][0], where[b][0])
+                    self.assertNotEqual(where[a][1], where[b][1])
+                    unlinked |= {a, b}
+        self.assertEqual(unlinked, set(where))
+        return len(unlinked)
+
+    def test_groups(self):
+        self.assertGreater(self.check(SessionParams(), ()), 10)
+        self.assertGreater(self.check(SessionParams(comp_name=["_", "-"]), ()), 10)
+        self.assertGreater(self.check(SessionParams(comp_name=["_", "-"], group=True), ("time", "folder")), 10)
+        self.check(SessionParams(), ("time", ))
+
+    def test_scan(self):
+        out = io.StringIO()
+        session = SessionParams(DamScan.alltags, print_id=True, comp_name=["_", "-"], outfile=out)
+        count = DamUnlinked(self.columns).ScanUnlinked(session)
+        lines = out.getvalue().splitlines()
+        self.assertEqual(lines[0], "Image\tDir\tUnlinked\tTag\tDifferences")
+        self.assertEqual(len(lines), count + 1)
+        p = lines[1].split("\t")
+        self.assertEqual(p[1:4:2], ["~", "Unlinked"])
+        a, b = SessionParams._get_item_id(p[0]), SessionParams._get_item_id(p[2])
+        img_a = DamImage(a, open_catalog(self.name), session)
+        img_b = DamImage(b, open_catalog(self.name), session)
+        self.assertEqual(img_a.basename, img_b.basename)
+        self.assertEqual(p[4], ", ".join(img_a.image_eq(img_b, 0.0, 0.0)[1]))
+
+        pairs = os.path.join(self.dir, "pairs.txt")
+        with open(pairs, "w", encoding="utf-8") as f:
+            f.write(lines[1] + "\n")
+        out = io.StringIO()
+        session = SessionParams(DamScan.alltags, print_id=True, comp_name=["_", "-"], outfile=out,
+                                filter_pairs=pairs)
+        self.assertEqual(DamUnlinked(self.columns).ScanUnlinked(session), count - 1)
+        self.assertNotIn(lines[1], out.getvalue())
+
+    def test_baseline(self):
+        # the suggestions of a previous run are not new, and the ones gone since are resolved
+        out = io.StringIO()
+        DamUnlinked(self.columns).ScanUnlinked(SessionParams(DamScan.alltags, print_id=True, outfile=out))
+        lines = out.getvalue().splitlines()
+        baseline = os.path.join(self.dir, "baseline.txt")
+        with open(baseline, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines[:1] + lines[2:] + ["x.jpg (99998)\t~\ty.jpg (99999)\tUnlinked\tTitle"]) + "\n")
+        out = io.StringIO()
+        session = SessionParams(DamScan.alltags, print_id=True, outfile=out, baseline=baseline,
+                                baseline_kinds=UNLINKED)
+        DamUnlinked(self.columns).ScanUnlinked(session)
+        session.outfile.write_resolved()
+        self.assertEqual(out.getvalue().splitlines(), [lines[0], lines[1], "Resolved since {}:".format(baseline),
+                                                       "x.jpg (99998)\t~\ty.jpg (99999)\tUnlinked\tTitle"])
@@ -0,0 +1,103 @@
+import io
+import sqlite3
+from Daminion.SessionParams import SessionParams
+from Daminion.DamWatch import DamWatch
+from test.catalog_builder import CatalogTestCase, open_catalog
+import DamScan
+
+
+def scan(name, **kw):
+    out = io.StringIO()
+    DamScan.ScanCatalog(open_catalog(name), SessionParams(DamScan.alltags, print_id=True, outfile=out, **kw))
+    return out.getvalue()
+
+
+class TestDamWatch(CatalogTestCase):
+
+    ITEMS = 200
+    SEED = 3
+
+    def setUp(self):
+        CatalogTestCase.setUp(self)
+        self.conn = sqlite3.connect(self.name)
+
+    def tearDown(self):
+        self.conn.close()
+        CatalogTestCase.tearDown(self)
+
+    def watch(self, **kw):
+        self.out = io.StringIO()
+        session = SessionParams(DamScan.alltags, print_id=True, outfile=self.out, **kw)
+        watch = DamWatch(open_catalog(self.name), session, DamScan.CheckImage)
+        watch.scan()
+        return watch
+
+    def linked_item(self):
+        return self.conn.execute("SELECT min(id_tomediaitem) FROM mediaitems_link").fetchone()[0]
+
+    def check_poll(self, watch, tables=None, **kw):
+        # the appended findings are the ones a new full scan has and the first scan did not have
+        before = self.out.getvalue()
+        if tables is None:
+            tables = watch.changed_tables(0)
+        ids = watch.update(tables)
+        count = watch.recheck(ids)
+        after = scan(self.name, **kw)
+        appended = self.out.getvalue()[len(before):].splitlines()
+        self.assertEqual(count, len(appended))
+        self.assertEqual(set(appended), set(after.splitlines()) - set(before.splitlines()))
+        return ids, appended
+
+    def test_scan(self):
+        watch = self.watch()
+        self.assertEqual(self.out.getvalue(), scan(self.name))
+        self.assertIsNotNone(watch._version)        # SQLite has data_version
+        self.assertEqual(watch.poll(0), 0)
+
+    def test_tag_change(self):
+        watch = self.watch()
+        item = self.linked_item()
+        self.conn.execute("INSERT INTO keywords_file VALUES (?, 1)", (item, ))
+        self.conn.commit()
+        ids, appended = self.check_poll(watch)
+        self.assertEqual(ids, sorted({item} | watch._links[item]))
+        self.assertTrue(any("Animals" in line for line in appended))
+        self.assertEqual(watch.poll(0), 0)
+
+    def test_link_and_stack_change(self):
+        watch = self.watch(group=True)
+        top = self.conn.execute("SELECT id_topmediaitemstack FROM mediaitems WHERE id_topmediaitemstack != id "
+                                "ORDER BY id").fetchone()[0]
+        self.conn.execute("UPDATE mediaitems SET id_topmediaitemstack = ? WHERE id = ?", (top, top + 100))
+        self.conn.commit()
+        self.check_poll(watch, group=True)
+
+        watch = self.watch()
+        self.conn.execute("INSERT INTO mediaitems_link (id_frommediaitem, id_tomediaitem) VALUES (?, ?)", (1, 150))
+        self.conn.commit()
+        self.assertIn(150, watch.update(["mediaitems_link"]))
+        self.assertIn(150, watch._links[1])
+
+    def test_value_change(self):
+        watch = self.watch()
+        self.conn.execute("UPDATE keywords_table SET value = 'Seagull' WHERE id = 3")
+        self.conn.commit()
+        self.assertEqual(len(watch.update(["keywords_table"])), len(watch._state["mediaitems"]))
+        self.assertEqual(watch.catalog.KeywordList[3], "Animals|Birds|Seagull")
+
+    def test_probes(self):
+        # a server catalog without data_version: the checksums find the changes, also the updates in place
+        watch = self.watch()
+        watch._version = None
+        watch._probe(list(watch._state))
+        self.assertEqual(watch.changed_tables(0), set())
+        self.conn.execute("DELETE FROM people_file WHERE id_mediaitem = ?", (self.linked_item(), ))
+        self.conn.commit()
+        self.assertEqual(watch.changed_tables(0), {"people_file"})
+        self.check_poll(watch, ["people_file"])
+        self.conn.execute("UPDATE subject SET title = 'Changed' WHERE id_mediaitem = ?", (self.linked_item(), ))
+        self.conn.execute("UPDATE keywords_file SET id_value = (SELECT max(id_value) FROM keywords_file) "
+                          "WHERE rowid = (SELECT min(rowid) FROM keywords_file)")
+        self.conn.commit()
+        self.assertEqual(watch.changed_tables(0), {"subject", "keywords_file"})
+        self.check_poll(watch, ["subject", "keywords_file"])
@@ -0,0 +1,83 @@
+import io
+import os
+import sys
+from Daminion.SessionParams import SessionParams
+from Daminion.DamColumns import DamColumns
+from test.catalog_builder import CatalogTestCase, create_catalog, counting_catalog
+import DamScan
+import DamCompare
+
+# Budgets of the item by item scans; an added per-item query shows up as a failure here. The columnar
+# scans read the catalog with a fixed number of bulk queries, whatever its size.
+SIZES = [100, 400]
+SCAN_QUERIES_PER_ITEM = 22
+COMPARE_QUERIES_PER_ITEM = 20    # both catalogs
+CALL_GROWTH = 1.25                # Python calls per item of the large catalog / calls per item of the small one
+
+
+def count_calls(scan, *args):
+    # number of Python function calls made by scan(*args)
+    calls = [0]
+
+    def profile(frame, event, arg):
+        if event == "call":
+            calls[0] += 1
+
+    sys.setprofile(profile)
+    try:
+        scan(*args)
+    finally:
+        sys.setprofile(None)
+    return calls[0]
+
+
+class TestQueryCount(CatalogTestCase):
+
+    def setUp(self):
+        CatalogTestCase.setUp(self)
+        self.names = []
+        for size in SIZES:
+            name = os.path.join(self.dir, "cat{}.dmc".format(size))
+            create_catalog(name, size, seed=5)
+            self.names.append(name)
+
+    def check_growth(self, runs, budget):
+        # runs: (items, queries by statement, calls) of each size
+        (n1, q1, c1), (n2, q2, c2) = runs
+        self.assertLessEqual(sum(q1.values()), budget * n1)
+        self.assertLessEqual(sum(q2.values()), budget * n2)
+        self.assertLessEqual(sum(q2.values()) - sum(q1.values()), budget * (n2 - n1))
+        self.assertEqual(set(q1), set(q2))         # no statements built per item
+        self.assertLess((c2 / n2) / (c1 / n1), CALL_GROWTH)
+
+    def test_scan(self):
+        runs = []
+        for name in self.names:
+            catalog = counting_catalog(name)
+            session = SessionParams(DamScan.alltags, outfile=io.StringIO())
+            calls = count_calls(DamScan.ScanCatalog, catalog, session)
+            runs.append((catalog._counter, catalog.catalog.conn.counts, calls))
+        self.check_growth(runs, SCAN_QUERIES_PER_ITEM)
+
+    def test_compare(self):
+        runs = []
+        for name in self.names:
+            catalog1, catalog2 = counting_catalog(name), counting_catalog(name)
+            session = SessionParams(None, outfile=io.StringIO())
+            calls = count_calls(DamCompare.ScanCatalog, catalog1, catalog2, session)
+            runs.append((catalog1._counter, catalog1.catalog.conn.counts + catalog2.catalog.conn.counts, calls))
+        self.check_growth(runs, COMPARE_QUERIES_PER_ITEM)
+
+    def test_columnar(self):
+        scans = []
+        compares = []
+        for name in self.names:
+            catalog = counting_catalog(name)
+            DamScan.ScanCatalog(DamColumns(catalog), SessionParams(DamScan.alltags, outfile=io.StringIO()))
+            scans.append(catalog.catalog.conn.counts)
+            catalog1, catalog2 = counting_catalog(name), counting_catalog(name)
+            DamCompare.ScanCatalog(DamColumns(catalog1), DamColumns(catalog2), SessionParams(None, outfile=io.StringIO()))
+            compares.append(catalog1.catalog.conn.counts + catalog2.catalog.conn.counts)
+        self.assertEqual(scans[0], scans[1])
+        self.assertEqual(compares[0], compares[1])
+        self.assertLess(sum(scans[0].values()), 20)
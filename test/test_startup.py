@@ -0,0 +1,90 @@
+from unittest import TestCase
+import os
+import sys
+import shutil
+import tempfile
+import subprocess
+from test.catalog_builder import create_catalog
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Startup budget of the entry points in seconds: the imports of --version/--help (-X importtime) on top of those
+# of a bare interpreter start. The scripts are launched hundreds of times a day from other scripts, so a
+# regression here (e.g. a module level import of a database driver or asyncio) should fail the tests. The import
+# time is less noisy than the wall-clock time of the whole process, and the budget is about three times the ~30 ms
+# the scripts take now.
+STARTUP_BUDGET = 0.1
+
+SCRIPTS = ["DamScan", "DamCompare", "DamBatch"]
+
+# modules that must not be loaded for --version/--help
+HEAVY = ["psycopg2", "sqlite3", "asyncio", "concurrent.futures", "Daminion.DamCatalog", "Daminion.DamBackend"]
+
+PROBE = """
+import sys
+sys.argv = {argv!r}
+import {script}
+try:
+    {script}.main()
+except SystemExit:
+    pass
+sys.stdout.flush()
+sys.stderr.write("\\nloaded:" + " ".join(m for m in {heavy!r} if m in sys.modules))
+"""
+
+
+def run(code, *options):
+    result = subprocess.run([sys.executable] + list(options) + ["-c", code], cwd=ROOT, stdout=subprocess.PIPE,
+                            stderr=subprocess.PIPE, universal_newlines=True)
+    return result.stderr.split("\nloaded:")
+
+
+def imports(stderr):
+    # module: cumulative import time in seconds of the top level imports of -X importtime
+    times = {}
+    for line in stderr.splitlines():
+        if line.startswith("import time:") and "|" in line:
+            self_us, cumulative, name = line[len("import time:"):].split("|")
+            if not name.startswith("  ") and cumulative.strip().isdigit():
+                times[name.strip()] = int(cumulative) / 1e6
+    return times
+
+
+def startup(script, opt):
+    # best of a few runs to even out the noise
+    bare = imports(run("pass", "-X", "importtime")[0])
+    best = None
+    for i in range(3):
+        times = imports(run(PROBE.format(argv=[script + ".py", opt], script=script, heavy=[]), "-X", "importtime")[0])
+        t = sum(t for name, t in times.items() if name not in bare)
+        if best is None or t < best:
+            best = t
+    return best
+
+
+class TestStartup(TestCase):
+
+    def test_no_drivers(self):
+        for script in SCRIPTS:
+            for opt in ["--version", "--help"]:
+                loaded = run(PROBE.format(argv=[script + ".py", opt], script=script, heavy=HEAVY))[-1].strip()
+                self.assertEqual(loaded, "", script + " " + opt)
+
+    def test_sqlite_only(self):
+        tmpdir = tempfile.mkdtemp()
+        try:
+            name = os.path.join(tmpdir, "cat.dmc")
+            create_catalog(name, 20)
+            loaded = run(PROBE.format(argv=["DamScan.py", "-l", "-c", name, "-o", os.path.join(tmpdir, "out.txt")],
+                                      script="DamScan", heavy=["psycopg2", "asyncio"]))[-1].strip()
+            self.assertEqual(loaded, "")
+            self.assertTrue(os.path.isfile(os.path.join(tmpdir, "out.txt")))
+        finally:
+            shutil.rmtree(tmpdir)
+
+    def test_budget(self):
+        for script in SCRIPTS:
+            for opt in ["--version", "--help"]:
+                t = startup(script, opt)
+                self.assertGreater(t, 0, script + " " + opt)
+                self.assertLess(t, STARTUP_BUDGET, "{} {} took {:.3f} s".format(script, opt, t))